@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_loginattempt_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="loginattempt",
+            name="login_user_attempted_idx",
+        ),
+        migrations.AddIndex(
+            model_name="loginattempt",
+            index=models.Index(fields=["user", "-attempted_at", "-id"], name="login_user_attempted_idx"),
+        ),
+    ]
@@ -57,6 +57,13 @@ class LoginAttempt(models.Model):
     success = models.BooleanField()
     attempted_at = models.DateTimeField(default=timezone.now)
     
+    class Meta:
+        indexes = [
+            # Registro de actividad (paginado por cursor) y últimos logins correctos del usuario
+            models.Index(fields=['user', '-attempted_at', '-id'], name='login_user_attempted_idx'),
+            models.Index(fields=['user', 'success', '-attempted_at'], name='login_user_success_idx'),
+        ]
+    
     def __str__(self):
         status = "exitoso" if self.success else "fallido"
         username = self.user.username if self.user else "usuario desconocido"
@@ -13,4 +13,5 @@ urlpatterns = [
     path('password-reset/<str:token>/', views.password_reset_confirm_view, name='password_reset_confirm'),
     path('delete-account/', views.delete_account_view, name='delete_account'),
     path('activity/', views.activity_log_view, name='activity_log'),
+    path('activity/api/', views.activity_log_api, name='activity_log_api'),
 ]
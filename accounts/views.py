@@ -13,6 +13,7 @@ from django.http import JsonResponse
 from datetime import timedelta
 import uuid
 
+from core.pagination import KeysetPaginator
 from .models import UserProfile, PasswordResetToken, LoginAttempt
 from .forms import LoginForm, UserRegistrationForm, UserProfileForm, PasswordResetRequestForm, PasswordResetForm
 
@@ -111,16 +112,14 @@ def profile_view(request):
         form = UserProfileForm(instance=profile, user=request.user)
     
     # Estadísticas del usuario
-    from music_processing.models import MidiFile
+    from music_processing.stats import get_user_stats
     
+    stats = get_user_stats(request.user)
     user_stats = {
-        'songs_uploaded': request.user.songs.count(),
-        'stems_generated': sum(song.stems.count() for song in request.user.songs.all()),
-        'midi_files': MidiFile.objects.filter(
-            stem__song__user=request.user, 
-            status='completed'
-        ).count(),
-        'tracks_generated': request.user.generated_tracks.count(),
+        'songs_uploaded': stats['total_songs'],
+        'stems_generated': stats['total_stems'],
+        'midi_files': stats['total_midi'],
+        'tracks_generated': stats['total_generated'],
         'member_since': request.user.date_joined,
     }
     
@@ -285,21 +284,47 @@ def get_client_ip(request):
     return ip
 
 
+ACTIVITY_PER_PAGE = 20
+
+
+def _activity_log_page(request):
+    """Intentos de login del usuario paginados por cursor, con total aproximado"""
+    login_attempts = LoginAttempt.objects.filter(user=request.user)
+    paginator = KeysetPaginator(
+        login_attempts, ACTIVITY_PER_PAGE, ('-attempted_at', '-id'), count_mode='approximate'
+    )
+    return paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+
 @login_required
 def activity_log_view(request):
     """Vista del registro de actividad del usuario"""
-    login_attempts = LoginAttempt.objects.filter(user=request.user).order_by('-attempted_at')
+    attempts_page = _activity_log_page(request)
     successful_logins_count = LoginAttempt.objects.filter(user=request.user, success=True).count()
     
-    # Paginación
-    from django.core.paginator import Paginator
-    paginator = Paginator(login_attempts, 20)
-    page_number = request.GET.get('page')
-    attempts_page = paginator.get_page(page_number)
-    
     context = {
         'login_attempts': attempts_page,
         'successful_logins_count': successful_logins_count,
     }
     
     return render(request, 'accounts/activity_log.html', context)
+
+
+@login_required
+def activity_log_api(request):
+    """Variante JSON del registro de actividad"""
+    attempts_page = _activity_log_page(request)
+    
+    return JsonResponse({
+        'results': [
+            {
+                'id': attempt.id,
+                'ip_address': attempt.ip_address,
+                'user_agent': attempt.user_agent,
+                'success': attempt.success,
+                'attempted_at': attempt.attempted_at.isoformat(),
+            }
+            for attempt in attempts_page
+        ],
+        **attempts_page.to_dict(),
+    })
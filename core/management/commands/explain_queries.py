@@ -0,0 +1,154 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from accounts.views import activity_log_view
+from core.views import dashboard
+from music_processing.stats import invalidate_user_stats
+from music_processing.views import song_list
+
+# Vistas cuyas consultas se analizan: (nombre, vista, parámetros GET)
+VIEWS = [
+    ('core.views.dashboard', dashboard, {}),
+    ('music_processing.views.song_list', song_list, {}),
+    ('music_processing.views.song_list (estado)', song_list, {'status': 'stems_completed'}),
+    ('music_processing.views.song_list (búsqueda)', song_list, {'search': 'verano'}),
+    ('accounts.views.activity_log_view', activity_log_view, {}),
+]
+
+# Tablas de sesión y autenticación: fuera del alcance del análisis
+IGNORED_TABLES = ('django_session', 'django_content_type', 'auth_permission')
+
+# Las subconsultas materializadas (p. ej. el conteo acotado de la paginación) ya vienen
+# limitadas y las tablas FTS5 consultadas con MATCH (M en el plan) usan su propio índice
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?!CONSTANT ROW|subquery|\()(\S+)(?!\S)(?! USING (?:COVERING |INTEGER PRIMARY )?(?:INDEX|KEY)| VIRTUAL TABLE INDEX \d+:\S*M)')
+POSTGRES_SCAN_RE = re.compile(r'Seq Scan on (\S+)')
+# Ordenaciones explícitas: el índice no sirve para el ORDER BY de la consulta
+SQLITE_SORT_RE = re.compile(r'^USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+POSTGRES_SORT_RE = re.compile(r'^(?:->\s*)?Sort\b')
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecutar EXPLAIN sobre las consultas del dashboard, la lista de canciones y el '
+        'registro de actividad, e informar de los recorridos secuenciales de tablas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Usuario con el que renderizar las vistas (por defecto, el que tiene más canciones)',
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Mostrar el plan completo de cada consulta',
+        )
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Terminar con error si alguna consulta recorre una tabla completa',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Motor de base de datos no soportado: {connection.vendor}')
+
+        user = self._get_user(options['user'])
+        self.stdout.write(f'Analizando consultas como "{user.username}" ({connection.vendor})\n')
+
+        factory = RequestFactory()
+        scans_found = 0
+        sorts_found = 0
+
+        for name, view, params in VIEWS:
+            # Sin estadísticas en caché para que el dashboard ejecute sus consultas
+            invalidate_user_stats(user.pk)
+            request = factory.get('/', params)
+            request.user = user
+
+            with CaptureQueriesContext(connection) as queries:
+                view(request)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: {len(queries)} consultas'))
+            for query in queries.captured_queries:
+                sql = query['sql']
+                # Las consultas al catálogo (p. ej. la comprobación de la tabla FTS5) no cuentan
+                if not sql.lstrip().upper().startswith('SELECT') or 'sqlite_master' in sql:
+                    continue
+                plan = self._explain(sql)
+                scans = [table for table in self._sequential_scans(plan) if table not in IGNORED_TABLES]
+                summary = self._summarize(sql)
+
+                sorts = self._sorts(plan)
+
+                if scans:
+                    scans_found += len(scans)
+                    self.stdout.write(self.style.WARNING(f'  ⚠️ recorrido secuencial de {", ".join(scans)}'))
+                    self.stdout.write(f'     {summary}')
+                elif sorts:
+                    sorts_found += sorts
+                    self.stdout.write('  ↕️ ordenación sin índice')
+                    self.stdout.write(f'     {summary}')
+                elif options['verbosity'] > 1:
+                    self.stdout.write(f'  ✅ {summary}')
+
+                if options['plans']:
+                    for line in plan:
+                        self.stdout.write(f'       {line}')
+
+        if sorts_found:
+            self.stdout.write(f'{sorts_found} ordenaciones sin índice')
+        if scans_found:
+            message = f'{scans_found} recorridos secuenciales encontrados'
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Ninguna consulta recorre tablas completas'))
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'El usuario "{username}" no existe')
+
+        user = User.objects.annotate(num_songs=Count('songs')).order_by('-num_songs').first()
+        if user is None:
+            raise CommandError('No hay usuarios en la base de datos')
+        return user
+
+    def _summarize(self, sql, width=140):
+        # La lista de columnas no aporta nada: se muestra desde el FROM
+        from_index = sql.find(' FROM ')
+        if from_index != -1:
+            sql = 'SELECT ...' + sql[from_index:]
+        return sql if len(sql) <= width else sql[:width - 3] + '...'
+
+    def _explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            # EXPLAIN QUERY PLAN devuelve (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        return [row[0] for row in rows]
+
+    def _sorts(self, plan):
+        pattern = SQLITE_SORT_RE if connection.vendor == 'sqlite' else POSTGRES_SORT_RE
+        return sum(1 for line in plan if pattern.search(line.strip()))
+
+    def _sequential_scans(self, plan):
+        pattern = SQLITE_SCAN_RE if connection.vendor == 'sqlite' else POSTGRES_SCAN_RE
+        tables = []
+        for line in plan:
+            match = pattern.search(line.strip())
+            if match:
+                tables.append(match.group(1).strip('"'))
+        return tables
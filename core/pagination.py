@@ -0,0 +1,211 @@
+# Paginación por cursor (keyset) para listados largos
+#
+# En lugar de COUNT(*) + OFFSET, cada página filtra por la posición de la última fila
+# vista en el orden del listado, p. ej. (uploaded_at, id): el coste de una página es el
+# de leer `per_page + 1` filas del índice, sea cual sea la página. El cursor es opaco
+# para el cliente (base64 de los valores de la fila frontera).
+#
+# El total es opcional: 'exact' hace COUNT(*), 'approximate' cuenta como mucho
+# `count_limit` filas (en PostgreSQL, si se supera, usa la estimación del planificador)
+# y None no cuenta.
+import base64
+import json
+from functools import cached_property
+
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(values):
+    data = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Cursor no válido: {cursor}') from e
+    if not isinstance(values, list):
+        raise InvalidCursor(f'Cursor no válido: {cursor}')
+    return values
+
+
+class KeysetPage:
+    """Página de resultados con los cursores de la anterior y la siguiente"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[0])
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+    @property
+    def count_is_exact(self):
+        return self.paginator.count_is_exact
+
+    def to_dict(self):
+        """Metadatos de paginación para las respuestas JSON"""
+        data = {
+            'has_next': self.has_next,
+            'has_previous': self.has_previous,
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+        }
+        if self.paginator.count_mode is not None:
+            data['count'] = self.count
+            data['count_is_exact'] = self.count_is_exact
+        return data
+
+
+class KeysetPaginator:
+    """Paginador por cursor sobre un queryset.
+
+    `ordering` son los campos del orden del listado (p. ej. ('-uploaded_at', '-id')) y
+    debe terminar en un campo único para que el orden sea total.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count_mode='exact', count_limit=1000):
+        if count_mode not in ('exact', 'approximate', None):
+            raise ValueError(f'Modo de conteo desconocido: {count_mode}')
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.count_mode = count_mode
+        self.count_limit = count_limit
+
+    def cursor_for(self, obj):
+        return encode_cursor([getattr(obj, field) for field in self.fields])
+
+    def _to_python(self, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor('El cursor no corresponde al orden del listado')
+        model = self.queryset.model
+        try:
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception as e:
+            raise InvalidCursor('El cursor no corresponde al orden del listado') from e
+
+    def _after(self, values, reverse=False):
+        """Filas posteriores a `values` en el orden del listado (anteriores si `reverse`)"""
+        clauses = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            clause = Q(**dict(zip(self.fields[:i], values[:i])))
+            clause &= Q(**{f'{self.fields[i]}__{lookup}': values[i]})
+            clauses |= clause
+
+        # Cota no estricta sobre el primer campo para que la base de datos pueda
+        # recorrer el índice por rango en vez de evaluar el OR fila a fila
+        first_lookup = 'lte' if self.ordering[0].startswith('-') != reverse else 'gte'
+        return Q(**{f'{self.fields[0]}__{first_lookup}': values[0]}) & clauses
+
+    def page(self, after=None, before=None):
+        """Página siguiente a `after`, anterior a `before` o la primera"""
+        queryset = self.queryset
+        if after:
+            values = self._to_python(decode_cursor(after))
+            queryset = queryset.filter(self._after(values)).order_by(*self.ordering)
+        elif before:
+            values = self._to_python(decode_cursor(before))
+            reversed_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+            queryset = queryset.filter(self._after(values, reverse=True)).order_by(*reversed_ordering)
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if before:
+            if not has_more:
+                # Se ha llegado al principio: la primera página completa
+                return self.page()
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more, has_previous=bool(after))
+
+    def get_page(self, after=None, before=None):
+        """Como page(), pero un cursor no válido devuelve la primera página"""
+        try:
+            return self.page(after=after, before=before)
+        except InvalidCursor:
+            return self.page()
+
+    # Total
+
+    @cached_property
+    def _count(self):
+        if self.count_mode is None:
+            return None, False
+        queryset = self.queryset.order_by()
+        if self.count_mode == 'exact':
+            return queryset.count(), True
+
+        counted = queryset[:self.count_limit + 1].count()
+        if counted <= self.count_limit:
+            return counted, True
+        return max(self._estimate(queryset), self.count_limit), False
+
+    def _estimate(self, queryset):
+        """Filas estimadas por el planificador de PostgreSQL (0 en otros motores)"""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return 0
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_is_exact(self):
+        return self._count[1]
@@ -1,11 +1,9 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Count, Q
-from django.utils import timezone
-from datetime import timedelta
 
-from music_processing.models import Song, Stem, MidiFile, GeneratedTrack, ProcessingTask
+from music_processing.models import Song, Stem, GeneratedTrack, ProcessingTask
+from music_processing.stats import get_user_stats
 
 
 @login_required
@@ -13,36 +11,15 @@ def dashboard(request):
     """Vista principal del dashboard"""
     user = request.user
     
-    # Estadísticas generales
+    # Estadísticas generales y actividad reciente (últimos 30 días), cacheadas por usuario
+    user_stats = get_user_stats(user)
     stats = {
-        'total_songs': Song.objects.filter(user=user).count(),
-        'total_stems': Stem.objects.filter(song__user=user).count(),
-        'total_midi': MidiFile.objects.filter(stem__song__user=user, status='completed').count(),
-        'total_generated': GeneratedTrack.objects.filter(user=user).count(),
-    }
-    
-    # Actividad reciente (últimos 30 días)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    
-    recent_activity = {
-        'songs_uploaded': Song.objects.filter(
-            user=user, 
-            uploaded_at__gte=thirty_days_ago
-        ).count(),
-        'stems_generated': Stem.objects.filter(
-            song__user=user, 
-            created_at__gte=thirty_days_ago
-        ).count(),
-        'midi_converted': MidiFile.objects.filter(
-            stem__song__user=user, 
-            status='completed',
-            completed_at__gte=thirty_days_ago
-        ).count(),
-        'tracks_generated': GeneratedTrack.objects.filter(
-            user=user, 
-            created_at__gte=thirty_days_ago
-        ).count(),
+        'total_songs': user_stats['total_songs'],
+        'total_stems': user_stats['total_stems'],
+        'total_midi': user_stats['total_midi'],
+        'total_generated': user_stats['total_generated'],
     }
+    recent_activity = user_stats['recent_activity']
     
     # Canciones recientes
     recent_songs = Song.objects.filter(user=user).order_by('-uploaded_at')[:5]
@@ -57,9 +34,7 @@ def dashboard(request):
     recent_tracks = GeneratedTrack.objects.filter(user=user).order_by('-created_at')[:5]
     
     # Estado de las canciones
-    song_status_counts = Song.objects.filter(user=user).values('status').annotate(
-        count=Count('status')
-    )
+    song_status_counts = user_stats['song_status_counts']
     
     context = {
         'stats': stats,
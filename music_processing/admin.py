@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Song, Stem, MidiFile, GeneratedTrack, ProcessingTask
+from django.utils import timezone
+from .models import Song, Stem, MidiFile, GeneratedTrack, ProcessingTask, StemCacheEntry, MidiCacheEntry, CacheCounter
 
 
 @admin.register(Song)
@@ -55,3 +56,30 @@ class ProcessingTaskAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user')
+
+
+@admin.register(StemCacheEntry)
+class StemCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['audio_hash', 'size_bytes', 'hit_count', 'created_at', 'last_used_at']
+    search_fields = ['audio_hash']
+    readonly_fields = ['audio_hash', 'files', 'size_bytes', 'hit_count', 'created_at', 'last_used_at']
+
+
+@admin.register(MidiCacheEntry)
+class MidiCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['stem_hash', 'size_bytes', 'hit_count', 'created_at', 'expires_at']
+    search_fields = ['stem_hash']
+    exclude = ['midi_data']
+    readonly_fields = ['stem_hash', 'size_bytes', 'hit_count', 'created_at', 'expires_at']
+    actions = ['purge_expired']
+    
+    @admin.action(description='Eliminar todas las entradas caducadas')
+    def purge_expired(self, request, queryset):
+        deleted, _ = MidiCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.message_user(request, f'{deleted} entradas caducadas eliminadas.')
+
+
+@admin.register(CacheCounter)
+class CacheCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'hits', 'misses', 'hit_ratio']
+    readonly_fields = ['name', 'hits', 'misses']
@@ -0,0 +1,348 @@
+# Lectura de cabeceras de audio sin decodificar el fichero
+#
+# Se obtienen duración, frecuencia de muestreo, canales y bitrate leyendo solo las
+# cabeceras: los chunks fmt/data de WAV, el bloque STREAMINFO de FLAC, la cabecera
+# Xing/Info/VBRI (o el recorrido de cabeceras de frame) en MP3, las cabeceras ADTS
+# de AAC y los átomos mvhd/stsd de M4A. El formato se detecta por el contenido, no
+# por la extensión.
+import os
+import struct
+
+# MP3: bitrates en kbps por (versión MPEG 1 o 2/2.5, capa)
+MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+ADTS_SAMPLE_RATES = [96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350]
+
+# Frames que se recorren en un MP3 sin cabecera Xing/VBRI antes de suponer bitrate constante
+MP3_CBR_PROBE_FRAMES = 50
+SYNC_SEARCH_BYTES = 64 * 1024
+MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+
+class AudioProbeError(Exception):
+    pass
+
+
+def _info(fmt, duration=None, sample_rate=None, channels=None, bitrate=None, bits_per_sample=None):
+    return {
+        'format': fmt,
+        'duration': round(duration, 3) if duration else None,
+        'sample_rate': sample_rate or None,
+        'channels': channels or None,
+        'bitrate': int(bitrate) if bitrate else None,
+        'bits_per_sample': bits_per_sample or None,
+    }
+
+
+def _id3v2_size(header):
+    """Tamaño de la etiqueta ID3v2 que empieza en `header` (0 si no hay)"""
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+# WAV
+
+def _probe_wav(f, file_size):
+    riff = f.read(12)
+    rf64 = riff[:4] == b'RF64'
+    fmt = None
+    data_size = None
+    ds64_data_size = None
+
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk_id, size = struct.unpack('<4sI', header)
+        start = f.tell()
+        if chunk_id == b'fmt ':
+            fmt = struct.unpack('<HHIIHH', f.read(16))
+        elif chunk_id == b'ds64':
+            _, ds64_data_size = struct.unpack('<QQ', f.read(16))
+        elif chunk_id == b'data':
+            data_size = ds64_data_size if rf64 and size == 0xFFFFFFFF else size
+            # Algunos grabadores dejan el tamaño a 0 o por encima del real
+            if not data_size or start + data_size > file_size:
+                data_size = file_size - start
+            if fmt is not None:
+                break
+        f.seek(start + size + (size & 1))
+
+    if fmt is None:
+        raise AudioProbeError('WAV sin chunk fmt')
+    _, channels, sample_rate, byte_rate, block_align, bits = fmt
+    byte_rate = byte_rate or sample_rate * block_align
+    duration = data_size / byte_rate if data_size and byte_rate else None
+    return _info('wav', duration, sample_rate, channels, byte_rate * 8, bits)
+
+
+# FLAC
+
+def _probe_flac(f, file_size, offset):
+    f.seek(offset + 4)
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            raise AudioProbeError('FLAC sin bloque STREAMINFO')
+        last, block_type = header[0] & 0x80, header[0] & 0x7F
+        length = int.from_bytes(header[1:4], 'big')
+        if block_type == 0:
+            block = f.read(length)
+            value = int.from_bytes(block[10:18], 'big')
+            sample_rate = value >> 44
+            channels = ((value >> 41) & 0x07) + 1
+            bits = ((value >> 36) & 0x1F) + 1
+            total_samples = value & 0xFFFFFFFFF
+            duration = total_samples / sample_rate if sample_rate and total_samples else None
+            bitrate = (file_size - offset) * 8 / duration if duration else None
+            return _info('flac', duration, sample_rate, channels, bitrate, bits)
+        if last:
+            raise AudioProbeError('FLAC sin bloque STREAMINFO')
+        f.seek(length, os.SEEK_CUR)
+
+
+# MP3
+
+def _parse_mp3_header(header):
+    """Datos de una cabecera de frame MPEG audio, o None si no es válida"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    version = 1 if version_bits == 3 else 2
+    layer = 4 - layer_bits
+    bitrate = MP3_BITRATES[(version, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version_bits][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    channels = 1 if header[3] >> 6 == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        'version': version,
+        'layer': layer,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'samples': samples,
+        'length': length,
+    }
+
+
+def _find_mp3_frame(f, offset):
+    """Primer frame MPEG válido desde `offset` (confirmado por el frame siguiente)"""
+    f.seek(offset)
+    data = f.read(SYNC_SEARCH_BYTES)
+    position = data.find(b'\xff')
+    while 0 <= position < len(data) - 4:
+        frame = _parse_mp3_header(data[position:position + 4])
+        if frame is not None:
+            f.seek(offset + position + frame['length'])
+            if _parse_mp3_header(f.read(4)) is not None:
+                return offset + position, frame
+        position = data.find(b'\xff', position + 1)
+    raise AudioProbeError('No se encontró ningún frame MPEG')
+
+
+def _mp3_vbr_frames(f, start, frame):
+    """Número de frames de la cabecera Xing/Info o VBRI del primer frame, si la tiene"""
+    if frame['version'] == 1:
+        side_info = 17 if frame['channels'] == 1 else 32
+    else:
+        side_info = 9 if frame['channels'] == 1 else 17
+
+    f.seek(start + 4 + side_info)
+    xing = f.read(12)
+    if xing[:4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', xing[4:8])[0]
+        if flags & 0x01:
+            return struct.unpack('>I', xing[8:12])[0]
+
+    f.seek(start + 36)
+    vbri = f.read(18)
+    if vbri[:4] == b'VBRI':
+        return struct.unpack('>I', vbri[14:18])[0]
+    return None
+
+
+def _probe_mp3(f, file_size, offset):
+    start, first = _find_mp3_frame(f, offset)
+    sample_rate = first['sample_rate']
+    channels = first['channels']
+    end = file_size
+    f.seek(max(file_size - 128, 0))
+    if f.read(3) == b'TAG':
+        end -= 128
+    audio_bytes = end - start
+
+    frames = _mp3_vbr_frames(f, start, first)
+    if frames:
+        duration = frames * first['samples'] / sample_rate
+        return _info('mp3', duration, sample_rate, channels, audio_bytes * 8 / duration)
+
+    # Sin cabecera VBR: se recorren las cabeceras de frame. Si los primeros frames
+    # tienen todos el mismo bitrate se da por constante y se calcula por el tamaño.
+    position, count, samples, bitrates = start, 0, 0, set()
+    while position + 4 <= end:
+        f.seek(position)
+        frame = _parse_mp3_header(f.read(4))
+        if frame is None:
+            break
+        count += 1
+        samples += frame['samples']
+        bitrates.add(frame['bitrate'])
+        position += frame['length']
+        if count == MP3_CBR_PROBE_FRAMES and len(bitrates) == 1:
+            duration = audio_bytes * 8 / first['bitrate']
+            return _info('mp3', duration, sample_rate, channels, first['bitrate'])
+
+    duration = samples / sample_rate if samples else None
+    bitrate = (position - start) * 8 / duration if duration else None
+    return _info('mp3', duration, sample_rate, channels, bitrate)
+
+
+# AAC (ADTS)
+
+def _parse_adts_header(header):
+    if len(header) < 7 or header[0] != 0xFF or (header[1] & 0xF6) != 0xF0:
+        return None
+    rate_index = (header[2] >> 2) & 0x0F
+    if rate_index >= len(ADTS_SAMPLE_RATES):
+        return None
+    length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+    if length < 7:
+        return None
+    return {
+        'sample_rate': ADTS_SAMPLE_RATES[rate_index],
+        'channels': ((header[2] & 0x01) << 2) | (header[3] >> 6),
+        'samples': ((header[6] & 0x03) + 1) * 1024,
+        'length': length,
+    }
+
+
+def _probe_adts(f, file_size, offset):
+    position, samples, first = offset, 0, None
+    while position + 7 <= file_size:
+        f.seek(position)
+        frame = _parse_adts_header(f.read(7))
+        if frame is None:
+            break
+        first = first or frame
+        samples += frame['samples']
+        position += frame['length']
+    if first is None:
+        raise AudioProbeError('AAC sin frames ADTS')
+    duration = samples / first['sample_rate']
+    bitrate = (position - offset) * 8 / duration if duration else None
+    return _info('aac', duration, first['sample_rate'], first['channels'], bitrate)
+
+
+# M4A / MP4
+
+def _mp4_atoms(f, start, end):
+    """Átomos (tipo, inicio del contenido, fin) entre `start` y `end`"""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, atom_type = struct.unpack('>I4s', f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header:
+            break
+        yield atom_type, position + header, position + size
+        position += size
+
+
+def _probe_mp4(f, file_size):
+    found = {}
+
+    def walk(start, end):
+        for atom_type, content, atom_end in _mp4_atoms(f, start, end):
+            if atom_type in MP4_CONTAINERS:
+                walk(content, atom_end)
+            elif atom_type == b'mvhd' and 'duration' not in found:
+                f.seek(content)
+                version = f.read(4)[0]
+                if version == 1:
+                    timescale, duration = struct.unpack('>16xIQ', f.read(28))
+                else:
+                    timescale, duration = struct.unpack('>8xII', f.read(16))
+                if timescale:
+                    found['duration'] = duration / timescale
+            elif atom_type == b'stsd' and 'sample_rate' not in found:
+                f.seek(content + 8)
+                entry = f.read(36)
+                if entry[4:8] in (b'mp4a', b'alac', b'samr', b'ac-3', b'ec-3', b'Opus', b'fLaC'):
+                    channels, bits = struct.unpack('>HH', entry[24:28])
+                    found['channels'] = channels
+                    found['bits_per_sample'] = bits
+                    found['sample_rate'] = struct.unpack('>I', entry[32:36])[0] >> 16
+
+    walk(0, file_size)
+    if 'duration' not in found:
+        raise AudioProbeError('MP4 sin átomo mvhd')
+    duration = found['duration']
+    return _info(
+        'm4a', duration, found.get('sample_rate'), found.get('channels'),
+        file_size * 8 / duration if duration else None, found.get('bits_per_sample'),
+    )
+
+
+def probe_file(f, file_size=None):
+    """Metadatos de un fichero de audio abierto en modo binario (con seek)"""
+    if file_size is None:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+    f.seek(0)
+    head = f.read(12)
+    if len(head) < 12:
+        raise AudioProbeError('Fichero demasiado pequeño')
+
+    if head[:4] in (b'RIFF', b'RF64') and head[8:12] == b'WAVE':
+        f.seek(0)
+        return _probe_wav(f, file_size)
+    if head[4:8] == b'ftyp':
+        return _probe_mp4(f, file_size)
+
+    offset = 0
+    if head[:3] == b'ID3':
+        f.seek(0)
+        offset = _id3v2_size(f.read(10))
+        f.seek(offset)
+        head = f.read(12)
+    if head[:4] == b'fLaC':
+        return _probe_flac(f, file_size, offset)
+    if _parse_adts_header(head[:7]) is not None:
+        return _probe_adts(f, file_size, offset)
+    return _probe_mp3(f, file_size, offset)
+
+
+def probe(path):
+    """Metadatos del fichero de audio en `path`"""
+    with open(path, 'rb') as f:
+        return probe_file(f, os.path.getsize(path))
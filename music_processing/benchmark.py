@@ -0,0 +1,245 @@
+# Benchmark del pipeline: subida → stems → MIDI → generación con varios usuarios a la vez
+#
+# Cada usuario simulado es un hilo (con su propia conexión a la base de datos) que sube
+# un audio y lo pasa por process_song_to_stems_sync, convert_stem_to_midi_sync (stem a
+# stem) y generate_new_track_sync, tantas veces como iteraciones se pidan. De cada
+# llamada se guarda el tiempo total y su reparto en temp_io, remote, storage y db (ver
+# profiling.py); 'other' es el resto (CPU, esperas de single-flight o de la cola del
+# Space). La muestra 'pipeline' cubre una iteración completa.
+#
+# Los ficheros se escriben en un MEDIA_ROOT temporal y al terminar se borran los
+# usuarios, canciones y entradas de caché creados. Con el audio sintético por defecto
+# cada subida es distinta, así que las cachés no se reutilizan entre usuarios.
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from . import midi_cache, stem_cache
+from .clients import DEFAULT_SPACES, get_space, get_space_concurrency
+from .fake_spaces import write_tone
+from .fileio import save_local_file
+from .ingest import ingest_song
+from .models import GeneratedTrack, MidiCacheEntry, MidiFile, Song, Stem, StemCacheEntry
+from .pipeline import get_generation_stems
+from .profiling import CATEGORIES, record
+from .tasks_sync import convert_stem_to_midi_sync, generate_new_track_sync, process_song_to_stems_sync
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('upload', 'stems', 'midi', 'generation', 'pipeline')
+COMPONENTS = ('total',) + CATEGORIES + ('other',)
+PERCENTILES = (50, 95, 99)
+
+
+class StageFailed(Exception):
+    """Una etapa falló: el resto de la iteración no se ejecuta"""
+
+
+def percentile(values, q):
+    """Percentil `q` (0-100) con interpolación lineal entre los valores ordenados"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(values):
+    summary = {f'p{q}': round(percentile(values, q), 4) for q in PERCENTILES} if values else {}
+    if values:
+        summary['mean'] = round(sum(values) / len(values), 4)
+        summary['max'] = round(max(values), 4)
+    return summary
+
+
+def peak_rss_bytes():
+    """Pico de memoria residente del proceso; None si la plataforma no lo ofrece"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux lo da en KB
+
+
+class Benchmark:
+    """Ejecución del benchmark; `run()` devuelve el informe como diccionario serializable"""
+
+    def __init__(self, users=4, iterations=1, audio=None, duration=30, generate=True,
+                 spaces_url=None, use_caches=True):
+        self.users = users
+        self.iterations = iterations
+        self.audio = audio
+        self.duration = duration
+        self.generate = generate
+        self.spaces_url = spaces_url
+        self.use_caches = use_caches
+
+        self.run_id = timezone.now().strftime('%Y%m%d-%H%M%S')
+        self.samples = []
+        self._lock = threading.Lock()
+        self._songs = []
+
+    def _settings(self, work_dir):
+        overrides = {'MEDIA_ROOT': os.path.join(work_dir, 'media')}
+        if self.spaces_url:
+            overrides['MUSIC_SPACES_URL'] = self.spaces_url
+        if not self.use_caches:
+            overrides.update(MUSIC_STEM_CACHE_ENABLED=False, MUSIC_MIDI_CACHE_ENABLED=False)
+        return overrides
+
+    def run(self):
+        started_at = timezone.now()
+        with tempfile.TemporaryDirectory(prefix='benchmark_') as work_dir, \
+                override_settings(**self._settings(work_dir)):
+            config = self._config()
+            threads = [
+                threading.Thread(target=self._run_user, args=(index, work_dir), name=f'benchmark-{index}')
+                for index in range(self.users)
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            self._cleanup()
+
+        return {
+            'run_id': self.run_id,
+            'started_at': started_at.isoformat(),
+            'duration': round(elapsed, 3),
+            'config': config,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'stages': self._stage_stats(),
+            'samples': self.samples,
+        }
+
+    def _config(self):
+        return {
+            'users': self.users,
+            'iterations': self.iterations,
+            'audio': self.audio or f'sintético ({self.duration}s)',
+            'generate': self.generate,
+            'spaces': {name: get_space(name) for name in DEFAULT_SPACES},
+            'space_concurrency': {name: get_space_concurrency(get_space(name)) for name in DEFAULT_SPACES},
+            'stem_cache': stem_cache.is_enabled(),
+            'midi_cache': midi_cache.is_enabled(),
+            'database': connection.vendor,
+        }
+
+    # Usuarios simulados
+
+    def _run_user(self, index, work_dir):
+        try:
+            user = User.objects.create_user(f'benchmark-{self.run_id}-{index}')
+            with record() as recorder:
+                for iteration in range(self.iterations):
+                    audio_path = self.audio or write_tone(
+                        os.path.join(work_dir, f'upload_{index}_{iteration}.wav'),
+                        220 + index * self.iterations + iteration,  # una frecuencia por subida: audios distintos
+                        self.duration,
+                    )
+                    try:
+                        self._measure(recorder, 'pipeline', index, self._run_iteration,
+                                      recorder, user, index, audio_path, f'{index}-{iteration}')
+                    except StageFailed:
+                        continue
+        except Exception:
+            logger.exception(f"❌ Benchmark: el usuario {index} no pudo continuar")
+        finally:
+            connection.close()
+
+    def _run_iteration(self, recorder, user, index, audio_path, label):
+        song = self._measure(recorder, 'upload', index, self._upload, user, audio_path, label)
+        self._measure(recorder, 'stems', index, process_song_to_stems_sync, song.id)
+        for stem_id in Stem.objects.filter(song=song).order_by('order').values_list('id', flat=True):
+            try:
+                self._measure(recorder, 'midi', index, convert_stem_to_midi_sync, stem_id)
+            except StageFailed:
+                continue  # la generación puede usar el MIDI de otro stem
+        if self.generate:
+            track = self._create_track(song)
+            self._measure(recorder, 'generation', index, generate_new_track_sync, track.id)
+
+    def _measure(self, recorder, stage, user_index, func, *args):
+        before = recorder.snapshot()
+        started = time.perf_counter()
+        error = None
+        try:
+            return func(*args)
+        except StageFailed as e:
+            error = str(e)
+            raise
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            raise StageFailed(error) from e
+        finally:
+            total = time.perf_counter() - started
+            after = recorder.snapshot()
+            sample = {'stage': stage, 'user': user_index, 'total': total, 'error': error}
+            for category in CATEGORIES:
+                sample[category] = after[category] - before[category]
+            sample['other'] = max(0.0, total - sum(sample[category] for category in CATEGORIES))
+            with self._lock:
+                self.samples.append({key: round(value, 4) if isinstance(value, float) else value
+                                     for key, value in sample.items()})
+
+    def _upload(self, user, audio_path, label):
+        """Lo mismo que la vista de subida: guardar el fichero y leer sus cabeceras"""
+        song = Song(user=user, title=f'Benchmark {label}')
+        save_local_file(song.original_file, os.path.basename(audio_path), audio_path, save=False)
+        song.save()
+        ingest_song(song)
+        with self._lock:
+            self._songs.append(song.pk)
+        return song
+
+    def _create_track(self, song):
+        """GeneratedTrack a partir del MIDI del stem preferido, como el pipeline completo"""
+        midi_files = {
+            midi_file.stem.stem_type: midi_file
+            for midi_file in MidiFile.objects.filter(stem__song=song, status='completed').select_related('stem')
+        }
+        for stem_type in get_generation_stems() + list(midi_files):
+            if stem_type in midi_files:
+                midi_file = midi_files[stem_type]
+                return GeneratedTrack.objects.create(
+                    user=song.user,
+                    midi_file=midi_file,
+                    title=f'{song.title} ({midi_file.stem.get_stem_type_display()})',
+                    status='processing',
+                )
+        raise StageFailed('Ningún stem se convirtió a MIDI')
+
+    def _cleanup(self):
+        """Borrar los datos creados (los ficheros se van con el MEDIA_ROOT temporal)"""
+        song_hashes = Song.objects.filter(pk__in=self._songs).exclude(content_hash='').values_list('content_hash', flat=True)
+        stem_hashes = Stem.objects.filter(song__in=self._songs).exclude(content_hash='').values_list('content_hash', flat=True)
+        StemCacheEntry.objects.filter(audio_hash__in=list(song_hashes)).delete()
+        MidiCacheEntry.objects.filter(stem_hash__in=list(stem_hashes)).delete()
+        User.objects.filter(username__startswith=f'benchmark-{self.run_id}-').delete()
+
+    # Informe
+
+    def _stage_stats(self):
+        stats = {}
+        for stage in STAGES:
+            samples = [sample for sample in self.samples if sample['stage'] == stage]
+            if not samples:
+                continue
+            succeeded = [sample for sample in samples if sample['error'] is None]
+            stats[stage] = {'count': len(samples), 'errors': len(samples) - len(succeeded)}
+            for component in COMPONENTS:
+                stats[stage][component] = summarize([sample[component] for sample in succeeded])
+        return stats
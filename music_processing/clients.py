@@ -0,0 +1,170 @@
+# Pool de clientes de Gradio reutilizables por Space
+#
+# Crear un `Client` descarga la configuración y la info de la API del Space en cada
+# llamada, lo que añade segundos de latencia y es donde aparecían los
+# JSONDecodeError de `_get_api_info`. El pool mantiene un cliente por Space y por
+# proceso, lo crea bajo demanda, comprueba periódicamente que el Space responde y
+# descarta los clientes que fallan para que la siguiente llamada cree uno nuevo.
+# Tanto la creación del cliente como `predict` pasan por resilience.call, que
+# reintenta los errores transitorios y corta las llamadas a un Space caído.
+import logging
+import threading
+import time
+import urllib.parse
+
+import httpx
+from django.conf import settings
+from gradio_client import Client
+
+from . import profiling, resilience
+
+logger = logging.getLogger(__name__)
+
+# Spaces de Hugging Face usados por el pipeline (sobrescribibles con MUSIC_SPACES)
+DEFAULT_SPACES = {
+    'stems': 'SouniQ/Modulo1',
+    'midi': 'SouniQ/Modulo2',
+    'orpheus': 'asigalov61/Orpheus-Music-Transformer',
+}
+
+
+def get_space(name):
+    """Nombre (o URL) del Space configurado para una etapa: 'stems', 'midi' u 'orpheus'"""
+    base_url = getattr(settings, 'MUSIC_SPACES_URL', '')
+    if base_url:
+        return f"{base_url.rstrip('/')}/{name}/"
+    spaces = {**DEFAULT_SPACES, **getattr(settings, 'MUSIC_SPACES', {})}
+    return spaces[name]
+
+
+# Llamadas simultáneas permitidas por Space en cada proceso (MUSIC_SPACE_CONCURRENCY)
+DEFAULT_SPACE_CONCURRENCY = {
+    'stems': 2,
+    'midi': 4,
+    'orpheus': 1,
+}
+
+
+def get_space_concurrency(space):
+    """Límite de llamadas concurrentes para un Space (por nombre de etapa o de Space)"""
+    limits = {**DEFAULT_SPACE_CONCURRENCY, **getattr(settings, 'MUSIC_SPACE_CONCURRENCY', {})}
+    for name in DEFAULT_SPACES:
+        if get_space(name) == space:
+            return limits.get(name, 1)
+    return limits.get(space, 1)
+
+
+class ClientPool:
+    """Clientes de Gradio compartidos por proceso, indexados por Space"""
+
+    def __init__(self, health_check_interval=None):
+        if health_check_interval is None:
+            health_check_interval = getattr(settings, 'MUSIC_CLIENT_HEALTH_CHECK_INTERVAL', 300)
+        self.health_check_interval = health_check_interval
+        self._clients = {}
+        self._last_checked = {}
+        self._lock = threading.Lock()
+        self._space_locks = {}
+        self._slots = {}
+
+    def _space_lock(self, space):
+        with self._lock:
+            return self._space_locks.setdefault(space, threading.Lock())
+
+    def _slot(self, space):
+        with self._lock:
+            if space not in self._slots:
+                self._slots[space] = threading.BoundedSemaphore(get_space_concurrency(space))
+            return self._slots[space]
+
+    def _create_client(self, space):
+        logger.info(f"🔗 Creando cliente de Gradio para {space}...")
+        started = time.monotonic()
+        client = Client(space, verbose=False)
+        logger.info(f"✅ Cliente para {space} listo en {time.monotonic() - started:.1f}s")
+        return client
+
+    def get(self, space):
+        """Devolver el cliente del Space, creándolo o renovándolo si hace falta"""
+        with profiling.timed('remote'):
+            return resilience.call(space, self._connect, space)
+
+    def _connect(self, space):
+        with self._space_lock(space):
+            client = self._clients.get(space)
+
+            if client is not None and self._needs_health_check(space):
+                if not self.is_healthy(client):
+                    logger.warning(f"⚠️ El cliente de {space} no responde, se descarta")
+                    self._discard(space)
+                    client = None
+                else:
+                    self._last_checked[space] = time.monotonic()
+
+            if client is None:
+                client = self._create_client(space)
+                self._clients[space] = client
+                self._last_checked[space] = time.monotonic()
+
+            return client
+
+    def _needs_health_check(self, space):
+        last_checked = self._last_checked.get(space, 0)
+        return time.monotonic() - last_checked > self.health_check_interval
+
+    def is_healthy(self, client):
+        """Comprobar con una petición ligera que el Space sigue sirviendo su configuración"""
+        try:
+            response = httpx.get(
+                urllib.parse.urljoin(client.src, 'config'),
+                headers=client.headers,
+                timeout=10,
+            )
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def evict(self, space):
+        """Descartar el cliente de un Space (p. ej. tras un error en la llamada)"""
+        with self._space_lock(space):
+            self._discard(space)
+
+    def _discard(self, space):
+        client = self._clients.pop(space, None)
+        self._last_checked.pop(space, None)
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def predict(self, space, *args, **kwargs):
+        """Ejecutar `predict` con el cliente del pool; si falla, el cliente se descarta.
+
+        Las llamadas al mismo Space desde varios hilos esperan turno según su límite
+        de concurrencia. Los errores transitorios se reintentan (ver resilience.py).
+        """
+        with profiling.timed('remote'):
+            return resilience.call(space, self._predict_once, space, args, kwargs)
+
+    def _predict_once(self, space, args, kwargs):
+        client = self._connect(space)
+        with self._slot(space):
+            try:
+                return client.predict(*args, **kwargs)
+            except Exception:
+                self.evict(space)
+                raise
+
+    def warm_up(self, spaces=None):
+        """Crear por adelantado los clientes (al arrancar un worker)"""
+        if spaces is None:
+            spaces = [get_space(name) for name in DEFAULT_SPACES]
+        for space in spaces:
+            try:
+                self.get(space)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo precalentar el cliente de {space}: {e}")
+
+
+client_pool = ClientPool()
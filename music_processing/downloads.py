@@ -0,0 +1,123 @@
+# Servido de ficheros de audio/MIDI con soporte de Range, ETag y peticiones condicionales
+#
+# Las respuestas completas usan FileResponse, que el servidor WSGI puede enviar con
+# sendfile sin pasar los bytes por Python. Las peticiones Range (las que hacen los
+# reproductores al buscar en la pista) devuelven 206 leyendo solo el tramo pedido.
+# Con MUSIC_SENDFILE_BACKEND el envío se delega al proxy (X-Sendfile / X-Accel-Redirect).
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _etag(size, mtime):
+    return f'"{size:x}-{int(mtime):x}"'
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _parse_range(header, size):
+    """Devolver (inicio, fin) inclusivos del rango pedido, None si no aplica o 'invalid'"""
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None  # multirango o sintaxis no soportada: se sirve el fichero completo
+    start, end = match.groups()
+    if start == '':
+        # Sufijo: los últimos N bytes
+        length = int(end)
+        if length == 0:
+            return 'invalid'
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _iter_range(field_file, start, length):
+    with field_file.open('rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(field_file):
+    # Los nombres llevan títulos de canciones (p. ej. "Canción"): sin codificar, Django
+    # enviaría la cabecera en MIME (=?utf-8?...?=) y el proxy no encontraría el fichero.
+    # nginx decodifica la URI de X-Accel-Redirect y mod_xsendfile la ruta de X-Sendfile
+    # (XSendFileUnescape, activo por defecto)
+    backend = getattr(settings, 'MUSIC_SENDFILE_BACKEND', None)
+    if backend == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = quote(field_file.path)
+        return response
+    if backend == 'x-accel-redirect':
+        prefix = getattr(settings, 'MUSIC_SENDFILE_URL_PREFIX', '/protected-media/')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(field_file.name)
+        return response
+    return None
+
+
+def serve_file(request, field_file, filename, content_type=None, as_attachment=True):
+    """Respuesta HTTP para el fichero de un FileField con Range, ETag y Last-Modified"""
+    storage = field_file.storage
+    size = field_file.size
+    mtime = storage.get_modified_time(field_file.name).timestamp()
+    etag = _etag(size, mtime)
+    if content_type is None:
+        content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+
+    if _not_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    response = _sendfile_response(field_file)
+    byte_range = None
+
+    if response is None:
+        range_header = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        if range_header and (if_range is None or if_range.strip() == etag):
+            byte_range = _parse_range(range_header, size)
+
+        if byte_range == 'invalid':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(_iter_range(field_file, start, length), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(field_file.open('rb'))
+            response['Content-Length'] = str(size)
+
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    return response
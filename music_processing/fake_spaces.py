@@ -0,0 +1,516 @@
+# Servidor local que imita los Spaces de Hugging Face para pruebas de carga sin cuota
+#
+# `python manage.py fake_spaces` sirve en un solo puerto tres apps compatibles con
+# gradio_client (protocolo sse_v3, el de Gradio 4 y 5):
+#   /stems/    SouniQ/Modulo1: /predict devuelve 7 WAV sintéticos con la duración de la entrada
+#   /midi/     SouniQ/Modulo2: /predict devuelve un MIDI
+#   /orpheus/  Orpheus: /generate_music_and_state devuelve varias versiones de audio
+# Con MUSIC_SPACES_URL apuntando al servidor, el pipeline lo usa en lugar de Hugging Face.
+#
+# Cada llamada espera la latencia de su Space (con jitter) y falla con la probabilidad
+# configurada imitando una caída (502), una cuota agotada o un error de la app. Como en
+# los Spaces reales, cada uno atiende `concurrency` llamadas a la vez y el resto espera
+# turno. Las salidas dependen del audio de entrada (los stems de una misma canción
+# coinciden entre llamadas y los de canciones distintas no, así las cachés se comportan
+# como con los Spaces reales), salvo las de Orpheus, que cambian en cada llamada.
+import email.parser
+import email.policy
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+import wave
+from array import array
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+GRADIO_VERSION = '5.0.0'
+API_PREFIX = 'gradio_api/'
+HEARTBEAT_INTERVAL = 15
+IDLE_CLOSE = 1.0  # segundos sin llamadas pendientes antes de cerrar el stream de una sesión
+FILE_TTL = 3600  # los ficheros subidos y generados se borran pasado este tiempo
+
+# Segundos por llamada de cada Space si no se indican otros
+DEFAULT_LATENCY = {
+    'stems': 20.0,
+    'midi': 3.0,
+    'orpheus': 30.0,
+}
+FAILURE_KINDS = ('unavailable', 'throttled', 'error')
+QUOTA_MESSAGE = 'You have exceeded your GPU quota (60s requested vs. 0s left). Retry in 0:00:05'
+
+DEFAULT_AUDIO = (30.0, 44100, 2)  # duración, frecuencia y canales si la entrada no es un WAV PCM
+STEM_COUNT = 7
+GENERATED_VERSIONS = 10
+GENERATED_SECONDS = 16
+MIDI_NOTES = 64
+REQUIRED = object()
+
+
+def _file_data(path):
+    return {
+        'path': path,
+        'url': None,
+        'size': os.path.getsize(path),
+        'orig_name': os.path.basename(path),
+        'mime_type': None,
+        'is_stream': False,
+        'meta': {'_type': 'gradio.FileData'},
+    }
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _wav_info(path):
+    """Duración, frecuencia de muestreo y canales del WAV; valores por defecto si no lo es"""
+    try:
+        with wave.open(path, 'rb') as source:
+            return source.getnframes() / source.getframerate(), source.getframerate(), source.getnchannels()
+    except (wave.Error, EOFError):
+        return DEFAULT_AUDIO
+
+
+def write_tone(path, frequency, seconds, rate=44100, channels=2, amplitude=0.3):
+    """WAV PCM de 16 bits con un tono senoidal (un segundo calculado y repetido)"""
+    peak = int(amplitude * 32767)
+    samples = array('h')
+    for i in range(rate):
+        value = int(peak * math.sin(2 * math.pi * frequency * i / rate))
+        samples.extend([value] * channels)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    block = samples.tobytes()
+
+    with wave.open(path, 'wb') as target:
+        target.setnchannels(channels)
+        target.setsampwidth(2)
+        target.setframerate(rate)
+        whole, rest = divmod(int(seconds * rate), rate)
+        for _ in range(whole):
+            target.writeframes(block)
+        target.writeframes(block[:rest * 2 * channels])
+    return path
+
+
+def _varlen(value):
+    """Entero en formato de longitud variable de MIDI"""
+    data = [value & 0x7F]
+    value >>= 7
+    while value:
+        data.insert(0, (value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(data)
+
+
+def write_midi(path, seed, notes=MIDI_NOTES):
+    """MIDI de una pista con notas pseudoaleatorias a partir de `seed`"""
+    rng = random.Random(seed)
+    events = bytearray()
+    for _ in range(notes):
+        pitch = rng.randint(36, 84)
+        velocity = rng.randint(60, 110)
+        events += _varlen(0) + bytes([0x90, pitch, velocity])
+        events += _varlen(rng.choice((120, 240, 480))) + bytes([0x80, pitch, 0])
+    events += b'\x00\xff\x2f\x00'
+    with open(path, 'wb') as f:
+        f.write(b'MThd' + struct.pack('>IHHH', 6, 0, 1, 480))
+        f.write(b'MTrk' + struct.pack('>I', len(events)) + bytes(events))
+    return path
+
+
+def separate(input_path, output_dir, *args):
+    """Modulo1: un tono distinto por stem, con la duración y el formato de la entrada"""
+    seconds, rate, channels = _wav_info(input_path)
+    digest = _sha256(input_path)
+    stems = []
+    for index, name in enumerate(('vocals', 'drums', 'bass', 'guitar', 'piano', 'other', 'instrumental')):
+        # Rangos de frecuencia disjuntos: los 7 stems nunca coinciden entre sí
+        frequency = 55 * (index + 1) + digest[index] % 50
+        path = os.path.join(output_dir, f'{name}.wav')
+        stems.append(_file_data(write_tone(path, frequency, seconds, rate, channels)))
+    return stems
+
+
+def transcribe(input_path, output_dir, *args):
+    """Modulo2: MIDI determinista por audio de entrada"""
+    path = os.path.join(output_dir, 'transcription.mid')
+    return [_file_data(write_midi(path, _sha256(input_path)))]
+
+
+def generate(input_path, output_dir, *args):
+    """Orpheus: versiones distintas en cada llamada, cada una con su audio y su gráfico"""
+    outputs = []
+    for number in range(1, GENERATED_VERSIONS + 1):
+        path = os.path.join(output_dir, f'Orpheus-Music-Transformer-Composition_{number}.wav')
+        write_tone(path, random.randint(110, 880), GENERATED_SECONDS, 44100, 1)
+        outputs += [_file_data(path), None]
+    return outputs + [None]  # estado de la app (el cliente lo omite)
+
+
+class Session:
+    """Mensajes pendientes de enviar y llamadas sin terminar de una sesión del cliente"""
+
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.pending = set()
+
+
+class FakeSpace:
+    """Una app de Gradio con un único endpoint"""
+
+    def __init__(self, title, api_name, parameters, outputs, handler):
+        self.title = title
+        self.api_name = api_name
+        self.parameters = parameters  # [(nombre, componente, valor por defecto o REQUIRED)]
+        self.outputs = outputs
+        self.handler = handler
+
+    def config(self):
+        components = [
+            {'id': index, 'type': component, 'props': {'label': name}}
+            for index, (name, component, _) in enumerate(self.parameters, start=1)
+        ]
+        first_output = len(components) + 1
+        components += [
+            {'id': index, 'type': component, 'props': {}}
+            for index, component in enumerate(self.outputs, start=first_output)
+        ]
+        return {
+            'version': GRADIO_VERSION,
+            'mode': 'blocks',
+            'title': self.title,
+            'protocol': 'sse_v3',
+            'api_prefix': '/' + API_PREFIX.rstrip('/'),
+            'max_file_size': None,
+            'components': components,
+            'dependencies': [{
+                'id': 0,
+                'targets': [],
+                'api_name': self.api_name,
+                'inputs': list(range(1, first_output)),
+                'outputs': list(range(first_output, len(components) + 1)),
+                'backend_fn': True,
+                'show_api': True,
+                'queue': True,
+                'cancels': [],
+                'types': {'generator': False, 'cancel': False},
+            }],
+        }
+
+    def info(self):
+        parameters = []
+        for name, component, default in self.parameters:
+            parameter = {
+                'label': name,
+                'parameter_name': name,
+                'parameter_has_default': default is not REQUIRED,
+                'component': component.capitalize(),
+                'type': {},
+                'python_type': {'type': 'filepath' if component in ('audio', 'file') else 'Any', 'description': ''},
+            }
+            if default is not REQUIRED:
+                parameter['parameter_default'] = default
+            parameters.append(parameter)
+        returns = [
+            {'label': component, 'component': component.capitalize(), 'type': {}, 'python_type': {'type': 'Any'}}
+            for component in self.outputs if component != 'state'
+        ]
+        return {
+            'named_endpoints': {f'/{self.api_name}': {'parameters': parameters, 'returns': returns, 'show_api': True}},
+            'unnamed_endpoints': {},
+        }
+
+
+SPACES = {
+    'stems': FakeSpace(
+        'SouniQ/Modulo1', 'predict',
+        [('input_wav_path', 'audio', REQUIRED)],
+        ['audio'] * STEM_COUNT,
+        separate,
+    ),
+    'midi': FakeSpace(
+        'SouniQ/Modulo2', 'predict',
+        [('input_wav_path', 'audio', REQUIRED)],
+        ['file'],
+        transcribe,
+    ),
+    'orpheus': FakeSpace(
+        'Orpheus-Music-Transformer', 'generate_music_and_state',
+        [
+            ('input_midi', 'file', REQUIRED),
+            ('apply_sustains', 'checkbox', True),
+            ('remove_duplicate_pitches', 'checkbox', True),
+            ('remove_overlapping_durations', 'checkbox', True),
+            ('prime_instruments', 'dropdown', []),
+            ('num_prime_tokens', 'slider', 6656),
+            ('num_gen_tokens', 'slider', 512),
+            ('model_temperature', 'slider', 0.9),
+            ('model_top_p', 'slider', 0.96),
+            ('add_drums', 'checkbox', False),
+            ('add_outro', 'checkbox', False),
+        ],
+        ['audio', 'plot'] * GENERATED_VERSIONS + ['state'],
+        generate,
+    ),
+}
+
+
+class FakeSpacesServer(ThreadingHTTPServer):
+    """Servidor HTTP con los tres Spaces falsos; cada petición y cada llamada en su hilo"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=None, jitter=0.2, failure_rate=0.0, failure_kind='unavailable',
+                 concurrency=1, on_call=None):
+        # Antes de abrir el socket: si falla, server_close ya borra la carpeta
+        self.files_dir = tempfile.mkdtemp(prefix='fake_spaces_')
+        super().__init__(address, FakeSpaceHandler)
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_kind = failure_kind
+        self.on_call = on_call
+        self.slots = {name: threading.BoundedSemaphore(max(1, concurrency)) for name in SPACES}
+        self.stats = {name: Counter() for name in SPACES}
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def server_close(self):
+        super().server_close()
+        shutil.rmtree(self.files_dir, ignore_errors=True)
+
+    def session(self, session_hash):
+        with self._lock:
+            return self._sessions.setdefault(session_hash, Session())
+
+    def close_session(self, session_hash, session, force=False):
+        """Olvidar la sesión si no le queda nada pendiente; True si se ha cerrado"""
+        with self._lock:
+            if not force and (session.pending or not session.messages.empty()):
+                return False
+            if self._sessions.get(session_hash) is session:
+                del self._sessions[session_hash]
+            return True
+
+    def _new_dir(self):
+        path = os.path.join(self.files_dir, uuid.uuid4().hex)
+        os.mkdir(path)
+        return path
+
+    def local_file(self, path):
+        """Ruta real de un fichero servido por este servidor; None si está fuera de su carpeta"""
+        path = os.path.realpath(path)
+        if os.path.commonpath([path, self.files_dir]) != self.files_dir or not os.path.isfile(path):
+            return None
+        return path
+
+    def purge_files(self):
+        limit = time.time() - FILE_TTL
+        for entry in os.scandir(self.files_dir):
+            if entry.stat().st_mtime < limit:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def save_uploads(self, content_type, body):
+        """Guardar los ficheros de un POST multipart a /upload; devuelve sus rutas"""
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + body
+        )
+        paths = []
+        for part in message.iter_parts():
+            filename = os.path.basename(part.get_filename() or 'upload')
+            path = os.path.join(self._new_dir(), filename)
+            with open(path, 'wb') as f:
+                f.write(part.get_payload(decode=True))
+            paths.append(path)
+        return paths
+
+    def join(self, name, payload):
+        """Encolar una llamada; devuelve el código HTTP y la respuesta de /queue/join"""
+        self.purge_files()
+        self.stats[name]['calls'] += 1
+        failure = self.failure_kind if random.random() < self.failure_rate else None
+        if failure == 'unavailable':
+            self.stats[name]['failures'] += 1
+            self._notify(name, 0, 'caída simulada (502)')
+            return 502, {'detail': 'Bad Gateway'}
+
+        event_id = uuid.uuid4().hex
+        session = self.session(payload.get('session_hash'))
+        with self._lock:
+            session.pending.add(event_id)
+        session.messages.put({'msg': 'estimation', 'event_id': event_id, 'rank': 0, 'queue_size': 1, 'rank_eta': None})
+        threading.Thread(
+            target=self._process,
+            args=(name, event_id, payload.get('data', []), session, failure),
+            daemon=True,
+        ).start()
+        return 200, {'event_id': event_id}
+
+    def _delay(self, name):
+        latency = self.latency[name]
+        return max(0.0, random.uniform(latency * (1 - self.jitter), latency * (1 + self.jitter)))
+
+    def _process(self, name, event_id, data, session, failure):
+        queued = time.monotonic()
+        with self.slots[name]:
+            started = time.monotonic()
+            session.messages.put({'msg': 'process_starts', 'event_id': event_id, 'eta': None})
+            time.sleep(self._delay(name))
+            success = False
+            if failure == 'throttled':
+                output, detail = {'error': QUOTA_MESSAGE}, 'cuota agotada simulada'
+            elif failure == 'error':
+                output, detail = {'error': f'Error simulado en {SPACES[name].title}'}, 'error simulado'
+            else:
+                try:
+                    output = {'data': self._run(name, data), 'is_generating': False}
+                    success, detail = True, 'ok'
+                except Exception as e:
+                    logger.exception(f"❌ Space falso {name}: la llamada falló")
+                    output, detail = {'error': str(e)}, f'error: {e}'
+            elapsed = time.monotonic() - started
+
+        self.stats[name]['completed' if success else 'failures'] += 1
+        with self._lock:
+            session.pending.discard(event_id)
+            session.messages.put({
+                'msg': 'process_completed', 'event_id': event_id, 'output': output, 'success': success,
+            })
+        self._notify(name, elapsed, detail, waited=started - queued)
+
+    def _run(self, name, data):
+        files = [item['path'] for item in data if isinstance(item, dict) and 'path' in item]
+        input_path = self.local_file(files[0]) if files else None
+        if input_path is None:
+            raise ValueError('Falta el fichero de entrada')
+        return SPACES[name].handler(input_path, self._new_dir(), *data[1:])
+
+    def _notify(self, name, elapsed, detail, waited=0.0):
+        if self.on_call is not None:
+            self.on_call(name, elapsed, waited, detail)
+
+
+class FakeSpaceHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeSpaces/1.0'
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _route(self):
+        """(nombre del Space, ruta dentro de la app, query) o (None, None, None)"""
+        parsed = urllib.parse.urlsplit(self.path)
+        name, _, route = parsed.path.lstrip('/').partition('/')
+        if name not in SPACES:
+            return None, None, None
+        if route.startswith(API_PREFIX):
+            route = route[len(API_PREFIX):]
+        return name, route, urllib.parse.parse_qs(parsed.query)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self._send_json({'detail': 'Not Found'}, 404)
+
+    def do_GET(self):
+        name, route, query = self._route()
+        if name is None:
+            return self._not_found()
+        space = SPACES[name]
+        if route == 'config':
+            return self._send_json(space.config())
+        if route == 'info':
+            return self._send_json(space.info())
+        if route == 'queue/data':
+            return self._stream_session(query.get('session_hash', [''])[0])
+        if route.startswith('heartbeat/'):
+            return self._stream_heartbeat()
+        if route.startswith('file='):
+            return self._send_file(urllib.parse.unquote(route[len('file='):]))
+        return self._not_found()
+
+    def do_POST(self):
+        name, route, _ = self._route()
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if name is None:
+            return self._not_found()
+        if route == 'upload':
+            return self._send_json(self.server.save_uploads(self.headers.get('Content-Type', ''), body))
+        if route == 'queue/join':
+            status, payload = self.server.join(name, json.loads(body or b'{}'))
+            return self._send_json(payload, status)
+        if route == 'cancel':
+            return self._send_json({'success': True})
+        return self._not_found()
+
+    def _send_file(self, path):
+        path = self.server.local_file(path)
+        if path is None:
+            return self._not_found()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def _start_stream(self):
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+    def _write_event(self, message):
+        self.wfile.write(f'data: {json.dumps(message)}\n\n'.encode())
+        self.wfile.flush()
+
+    def _stream_session(self, session_hash):
+        """Mensajes de todas las llamadas de la sesión; como Gradio, se cierra al quedar sin llamadas"""
+        session = self.server.session(session_hash)
+        self._start_stream()
+        try:
+            while True:
+                try:
+                    message = session.messages.get(timeout=HEARTBEAT_INTERVAL if session.pending else IDLE_CLOSE)
+                except queue.Empty:
+                    if self.server.close_session(session_hash, session):
+                        self._write_event({'msg': 'close_stream'})
+                        return
+                    message = {'msg': 'heartbeat'}
+                self._write_event(message)
+        except OSError:
+            self.server.close_session(session_hash, session, force=True)
+
+    def _stream_heartbeat(self):
+        self._start_stream()
+        try:
+            while True:
+                self._write_event({'msg': 'heartbeat'})
+                time.sleep(HEARTBEAT_INTERVAL)
+        except OSError:
+            pass
@@ -0,0 +1,108 @@
+# Utilidades de E/S de ficheros para el pipeline de procesamiento
+#
+# Los audios pueden pesar decenas de MB: todo se lee y escribe por bloques para que
+# la memoria de un worker no dependa del tamaño de los ficheros.
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .profiling import timed
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+COPY_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def sha256_field_file(field_file, chunk_size=HASH_CHUNK_SIZE):
+    """Calcular el sha256 de un FileField leyendo por bloques (sin cargarlo en memoria)"""
+    digest = hashlib.sha256()
+    with timed('temp_io'):
+        field_file.open('rb')
+        try:
+            for chunk in field_file.chunks(chunk_size):
+                digest.update(chunk)
+        finally:
+            field_file.close()
+    return digest.hexdigest()
+
+
+def sha256_path(path, chunk_size=HASH_CHUNK_SIZE):
+    """Calcular el sha256 de un fichero local leyendo por bloques"""
+    digest = hashlib.sha256()
+    with timed('temp_io'), open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _MovableFile(File):
+    """File que expone su ruta para que FileSystemStorage lo mueva en lugar de copiarlo"""
+
+    def __init__(self, file, path):
+        super().__init__(file)
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def _is_local(field_file):
+    try:
+        field_file.path
+        return True
+    except NotImplementedError:
+        return False
+
+
+@contextmanager
+def local_path(field_file, suffix=None):
+    """Ruta local del fichero de un FileField para pasarla a los clientes de inferencia.
+
+    Con almacenamiento local se reutiliza la ruta del propio storage (sin copia);
+    en otro caso se copia por bloques a un temporal que se elimina al salir.
+    """
+    if _is_local(field_file) and os.path.exists(field_file.path):
+        yield field_file.path
+        return
+
+    if suffix is None:
+        suffix = os.path.splitext(field_file.name)[1]
+    with timed('temp_io'), tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        field_file.open('rb')
+        try:
+            for chunk in field_file.chunks(COPY_CHUNK_SIZE):
+                temp_file.write(chunk)
+        finally:
+            field_file.close()
+        temp_path = temp_file.name
+
+    try:
+        yield temp_path
+    finally:
+        with timed('temp_io'):
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+
+def store_local_file(name, path, move=False, storage=None):
+    """Guardar un fichero local en el storage (por defecto default_storage); devuelve el nombre final"""
+    if storage is None:
+        storage = default_storage
+    with timed('storage'), open(path, 'rb') as f:
+        content = _MovableFile(f, path) if move else File(f)
+        return storage.save(name, content)
+
+
+def save_local_file(field_file, filename, path, move=False, save=True):
+    """Guardar un fichero local en un FileField sin cargarlo entero en memoria.
+
+    Con move=True y almacenamiento local el fichero se mueve/renombra al destino;
+    en otro caso el storage lo copia por bloques.
+    """
+    with timed('storage'), open(path, 'rb') as f:
+        content = _MovableFile(f, path) if move else File(f)
+        field_file.save(filename, content, save=save)
+    return field_file
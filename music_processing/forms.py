@@ -6,6 +6,13 @@ from .models import Song, GeneratedTrack
 class SongUploadForm(forms.ModelForm):
     """Formulario para subir canciones"""
     
+    run_pipeline = forms.BooleanField(
+        required=False,
+        label='Procesar automáticamente',
+        help_text='Separar stems, convertirlos a MIDI y generar una nueva canción al terminar la subida',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    
     class Meta:
         model = Song
         fields = ['title', 'original_file']
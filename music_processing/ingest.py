@@ -0,0 +1,70 @@
+# Ingesta de audio: metadatos de canciones y stems a partir de sus cabeceras
+#
+# Al subir una canción (y al guardar cada stem) se leen duración, frecuencia de
+# muestreo, canales y bitrate con audio_probe, sin decodificar el audio. La duración
+# permite a jobs.py estimar el coste de cada tarea y rechazar audios demasiado largos
+# antes de que consuman cuota de los Spaces de Hugging Face.
+import logging
+from struct import error as struct_error
+
+from django.utils import timezone
+
+from .audio_probe import AudioProbeError, probe_file
+from .models import StemMetadata
+
+logger = logging.getLogger(__name__)
+
+
+def probe_field_file(field_file):
+    """Metadatos del audio de un FileField; None si no se pueden leer"""
+    try:
+        field_file.open('rb')
+        try:
+            return probe_file(field_file.file, field_file.size)
+        finally:
+            field_file.close()
+    except (AudioProbeError, OSError, ValueError, IndexError, struct_error) as e:
+        logger.warning(f"⚠️ No se pudieron leer las cabeceras de {field_file.name}: {e}")
+        return None
+
+
+def ingest_song(song):
+    """Rellenar file_size, duración, frecuencia, canales y bitrate de una canción"""
+    if not song.original_file:
+        return None
+    info = probe_field_file(song.original_file)
+    song.file_size = song.original_file.size
+    update_fields = ['file_size']
+    if info is not None:
+        song.duration = info['duration']
+        song.sample_rate = info['sample_rate']
+        song.channels = info['channels']
+        song.bitrate = info['bitrate']
+        update_fields += ['duration', 'sample_rate', 'channels', 'bitrate']
+        logger.info(
+            f"🔎 '{song.title}': {info['format']}, {info['duration']}s, "
+            f"{info['sample_rate']} Hz, {info['channels']} canales"
+        )
+    song.save(update_fields=update_fields)
+    return info
+
+
+def ingest_stem(stem):
+    """Crear o actualizar el StemMetadata de un stem"""
+    if not stem.file:
+        return None
+    info = probe_field_file(stem.file) or {}
+    metadata, _ = StemMetadata.objects.update_or_create(
+        stem=stem,
+        defaults={
+            'file_size': stem.file.size,
+            'duration': info.get('duration'),
+            'sample_rate': info.get('sample_rate'),
+            'channels': info.get('channels'),
+            'bitrate': info.get('bitrate'),
+            'bits_per_sample': info.get('bits_per_sample'),
+            'audio_format': info.get('format') or '',
+            'probed_at': timezone.now(),
+        },
+    )
+    return metadata
@@ -0,0 +1,734 @@
+# Cola de trabajos local respaldada por la base de datos (ProcessingTask)
+#
+# Las vistas encolan un ProcessingTask en estado 'pending' y responden al instante.
+# Los workers arrancados con `python manage.py run_job_workers` reclaman las tareas
+# pendientes con un UPDATE condicional (seguro entre procesos) y ejecutan las
+# funciones de tasks_sync.py, informando del progreso en la propia fila.
+# Con MUSIC_JOB_BACKEND = 'celery' la tarea se reenvía a las tareas de tasks.py.
+#
+# Cada tarea guarda su coste estimado (segundos de audio a procesar, a partir de la
+# duración leída al subir) y las canciones que superan MUSIC_MAX_AUDIO_DURATION se
+# rechazan antes de encolarse para no gastar cuota de los Spaces.
+#
+# El reparto entre workers es justo: cada Space (stems, midi, orpheus) admite como
+# mucho MUSIC_SPACE_MAX_JOBS tareas en curso entre todos los procesos, las tareas
+# cortas (MIDI, formas de onda) tienen prioridad sobre las largas y, a igual
+# prioridad, los usuarios se turnan, así que quien encola 20 canciones no bloquea
+# a los demás. La prioridad de una tarea mejora con la espera para que ninguna se
+# quede sin turno.
+#
+# Mientras se ejecuta, el worker renueva la concesión de la tarea (heartbeat_at) cada
+# MUSIC_JOB_HEARTBEAT_INTERVAL segundos desde un hilo aparte. Si el proceso muere
+# (reinicio, OOM), la concesión caduca a los MUSIC_JOB_LEASE_TIMEOUT segundos y el
+# siguiente reparto devuelve la tarea a la cola, o la da por fallida cuando ya ha
+# agotado MUSIC_JOB_MAX_ATTEMPTS intentos.
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import progress as progress_channel
+from .models import GeneratedTrack, MidiFile, ProcessingTask, Song, Stem
+
+logger = logging.getLogger(__name__)
+
+
+def get_job_backend():
+    """Backend de ejecución configurado: 'local' (workers propios) o 'celery'"""
+    return getattr(settings, 'MUSIC_JOB_BACKEND', 'local')
+
+
+class JobRejected(Exception):
+    """La tarea no se puede encolar (p. ej. el audio es demasiado largo)"""
+
+
+def get_max_audio_duration():
+    return getattr(settings, 'MUSIC_MAX_AUDIO_DURATION', 900)
+
+
+def check_audio_duration(song):
+    """Rechazar canciones más largas que MUSIC_MAX_AUDIO_DURATION segundos"""
+    max_duration = get_max_audio_duration()
+    if max_duration and song.duration and song.duration > max_duration:
+        raise JobRejected(
+            f'"{song.title}" dura {int(song.duration // 60)}:{int(song.duration % 60):02d} min '
+            f'y el máximo permitido es {int(max_duration // 60)}:{int(max_duration % 60):02d} min'
+        )
+
+
+def estimate_cost(task_type, song=None, stem=None):
+    """Segundos de audio que procesará la tarea; None si no se conoce la duración"""
+    if task_type == 'stem_generation':
+        return song.duration
+    if task_type == 'full_pipeline':
+        # Separación de la canción + conversión a MIDI de cada stem
+        return song.duration * (1 + len(Stem.STEM_TYPES)) if song.duration else None
+    if task_type == 'midi_conversion':
+        # Sin StemMetadata el acceso lanza RelatedObjectDoesNotExist (un AttributeError)
+        metadata = getattr(stem, 'metadata', None)
+        if metadata is not None and metadata.duration:
+            return metadata.duration
+        return stem.song.duration
+    if task_type == 'song_midi_conversion':
+        durations = [
+            duration or song.duration
+            for duration in song.stems.values_list('metadata__duration', flat=True)
+        ]
+        if not durations or None in durations:
+            return None
+        return sum(durations)
+    return None
+
+
+# Space que ocupa cada tipo de tarea; las que no llaman a ninguno no tienen límite
+TASK_SPACES = {
+    'stem_generation': 'stems',
+    'full_pipeline': 'stems',
+    'midi_conversion': 'midi',
+    'song_midi_conversion': 'midi',
+    'track_generation': 'orpheus',
+}
+
+# Prioridad por defecto de cada tipo (menor = antes): las tareas cortas adelantan a las largas
+TASK_PRIORITIES = {
+    'waveform_generation': 0,
+    'midi_conversion': 1,
+    'preview_generation': 2,
+    'song_midi_conversion': 3,
+    'track_generation': 4,
+    'stem_generation': 5,
+    'full_pipeline': 6,
+}
+
+# Tareas en curso permitidas por Space entre todos los workers (MUSIC_SPACE_MAX_JOBS)
+DEFAULT_SPACE_MAX_JOBS = {
+    'stems': 2,
+    'midi': 4,
+    'orpheus': 1,
+}
+
+SCHEDULER_WINDOW = 200  # pendientes que se consideran en cada reparto
+
+
+def get_priority(task_type):
+    priorities = {**TASK_PRIORITIES, **getattr(settings, 'MUSIC_JOB_PRIORITIES', {})}
+    return priorities.get(task_type, 5)
+
+
+def get_space_max_jobs(space):
+    limits = {**DEFAULT_SPACE_MAX_JOBS, **getattr(settings, 'MUSIC_SPACE_MAX_JOBS', {})}
+    return limits.get(space)
+
+
+def get_priority_aging():
+    """Segundos de espera que adelantan una tarea un nivel de prioridad"""
+    return getattr(settings, 'MUSIC_JOB_PRIORITY_AGING', 300)
+
+
+def get_stale_after():
+    """Segundos tras los que una tarea en curso sin latido (p. ej. de Celery) se da por abandonada"""
+    return getattr(settings, 'MUSIC_JOB_STALE_AFTER', 2 * 3600)
+
+
+def get_lease_timeout():
+    """Segundos sin latido tras los que la tarea de un worker local se da por abandonada"""
+    return getattr(settings, 'MUSIC_JOB_LEASE_TIMEOUT', 120)
+
+
+def get_heartbeat_interval():
+    return getattr(settings, 'MUSIC_JOB_HEARTBEAT_INTERVAL', 30)
+
+
+def get_max_attempts():
+    """Veces que se ejecuta una tarea antes de darla por fallida si su worker muere"""
+    return getattr(settings, 'MUSIC_JOB_MAX_ATTEMPTS', 2)
+
+
+def expired_lease(now=None):
+    """Filtro de las tareas en curso cuyo worker dejó de dar señales de vida.
+
+    Las de los workers locales renuevan heartbeat_at; las que no tienen latido (las
+    de Celery) caducan MUSIC_JOB_STALE_AFTER segundos después de empezar.
+    """
+    now = now or timezone.now()
+    return Q(status='in_progress') & (
+        Q(heartbeat_at__lt=now - timedelta(seconds=get_lease_timeout()))
+        | Q(heartbeat_at__isnull=True, started_at__lt=now - timedelta(seconds=get_stale_after()))
+    )
+
+
+def active_task(task_type, song=None, stem=None, generated_track=None, statuses=('pending', 'in_progress')):
+    """Tarea pendiente o en curso (con la concesión vigente) de ese tipo para el objeto; None si no hay"""
+    return ProcessingTask.objects.filter(
+        task_type=task_type,
+        status__in=statuses,
+        song=song,
+        stem=stem,
+        generated_track=generated_track,
+    ).exclude(expired_lease()).first()
+
+
+def _lock(obj):
+    """Bloquear la fila de `obj` hasta el final de la transacción (SELECT ... FOR UPDATE)"""
+    list(type(obj).objects.select_for_update().filter(pk=obj.pk).values_list('pk', flat=True))
+
+
+def enqueue_task(user, task_type, song=None, stem=None, generated_track=None, estimated_cost=None,
+                 priority=None, reuse_running=True):
+    """Crear un ProcessingTask pendiente y despacharlo al backend configurado.
+
+    Si ya hay una tarea activa del mismo tipo para el mismo objeto (doble clic o dos
+    peticiones a la vez) se devuelve esa en lugar de crear otra; con `reuse_running=False`
+    solo se reutiliza una pendiente. Las peticiones del mismo objeto se serializan
+    bloqueando su fila (la restricción única de ProcessingTask no existe en MySQL) y la
+    comprobación se hace dentro de esa misma transacción. Si la que ocupa el hueco es de
+    un worker que murió, antes se recupera con reclaim_expired_tasks().
+    """
+    if priority is None:
+        priority = get_priority(task_type)
+    targets = {'song': song, 'stem': stem, 'generated_track': generated_track}
+    statuses = ('pending', 'in_progress') if reuse_running else ('pending',)
+    try:
+        with transaction.atomic():
+            for obj in targets.values():
+                if obj is not None:
+                    _lock(obj)
+
+            existing = active_task(task_type, statuses=statuses, **targets)
+            # La tarea abandonada vuelve a la cola (y se reutiliza) o se da por fallida (y se crea otra)
+            if existing is None and reclaim_expired_tasks(
+                ProcessingTask.objects.filter(task_type=task_type, **targets), fail_objects=False
+            ):
+                existing = active_task(task_type, statuses=statuses, **targets)
+            if existing is not None:
+                logger.info(f"🔗 {task_type} ya estaba en cola ({existing.celery_task_id}): se reutiliza")
+                return existing
+
+            created_at = timezone.now()
+            task = ProcessingTask.objects.create(
+                user=user,
+                task_type=task_type,
+                status='pending',
+                celery_task_id=str(uuid.uuid4()),
+                status_detail='En cola',
+                estimated_cost=estimated_cost,
+                priority=priority,
+                created_at=created_at,
+                queue_at=created_at + timedelta(seconds=priority * get_priority_aging()),
+                **targets,
+            )
+    except IntegrityError:
+        # Sin bloqueo de filas (SQLite) la restricción única frena a la segunda petición
+        existing = active_task(task_type, **targets)
+        if existing is None:
+            raise
+        logger.info(f"🔗 {task_type} ya estaba en cola ({existing.celery_task_id}): se reutiliza")
+        return existing
+    logger.info(f"📥 Tarea {task.celery_task_id} ({task_type}) encolada para {user.username}")
+    # Una tarea nueva puede adelantar a otras en la cola
+    transaction.on_commit(lambda: progress_channel.publish(queue=True))
+
+    if get_job_backend() == 'celery':
+        # Tras el commit: el worker de Celery tiene que encontrar la fila
+        transaction.on_commit(lambda: _dispatch_to_celery(task))
+
+    return task
+
+
+def enqueue_stem_generation(song):
+    """Encolar la separación en stems de una canción"""
+    check_audio_duration(song)
+    song.status = 'processing_stems'
+    song.save(update_fields=['status'])
+    return enqueue_task(song.user, 'stem_generation', song=song,
+                        estimated_cost=estimate_cost('stem_generation', song=song))
+
+
+def enqueue_midi_conversion(stem):
+    """Encolar la conversión a MIDI de un stem"""
+    return enqueue_task(stem.song.user, 'midi_conversion', stem=stem,
+                        estimated_cost=estimate_cost('midi_conversion', stem=stem))
+
+
+def enqueue_song_midi_conversion(song):
+    """Encolar la conversión a MIDI de todos los stems de una canción"""
+    check_audio_duration(song)
+    return enqueue_task(song.user, 'song_midi_conversion', song=song,
+                        estimated_cost=estimate_cost('song_midi_conversion', song=song))
+
+
+def enqueue_full_pipeline(song):
+    """Encolar el pipeline completo de una canción: stems, MIDI y generación"""
+    check_audio_duration(song)
+    if song.status == 'uploaded':
+        song.status = 'processing_stems'
+        song.save(update_fields=['status'])
+    return enqueue_task(song.user, 'full_pipeline', song=song,
+                        estimated_cost=estimate_cost('full_pipeline', song=song))
+
+
+def enqueue_track_generation(generated_track):
+    """Encolar la generación de un nuevo track"""
+    return enqueue_task(generated_track.user, 'track_generation', generated_track=generated_track)
+
+
+def enqueue_track_generation_from_midi(midi_file, user, **track_fields):
+    """Crear un GeneratedTrack a partir de un MIDI y encolar su generación.
+
+    Un doble envío se une a la generación en curso del mismo MIDI: las peticiones se
+    serializan bloqueando la fila del MidiFile y la comprobación se hace dentro de esa
+    transacción.
+    """
+    with transaction.atomic():
+        _lock(midi_file)
+        existing = ProcessingTask.objects.filter(
+            task_type='track_generation',
+            generated_track__midi_file=midi_file,
+            status__in=['pending', 'in_progress'],
+        ).exclude(expired_lease()).first()
+        if existing is not None:
+            logger.info(f"🔗 Generación a partir del MIDI {midi_file.pk} ya en cola ({existing.celery_task_id})")
+            return existing
+        generated_track = GeneratedTrack.objects.create(user=user, midi_file=midi_file, **track_fields)
+        return enqueue_track_generation(generated_track)
+
+
+def enqueue_waveform_generation(song):
+    """Encolar el cálculo de las formas de onda que falten de una canción y sus derivados.
+
+    Solo se reutiliza una tarea pendiente (que recogerá también los audios nuevos): una en
+    curso ya leyó la lista de audios al empezar y no vería los nuevos, así que se encola
+    otra. Esa segunda pasada salta los audios con picos (por hash) y solo calcula los nuevos.
+    """
+    return enqueue_task(song.user, 'waveform_generation', song=song, reuse_running=False)
+
+
+def enqueue_preview_generation(song):
+    """Encolar las versiones de escucha que falten de los stems y audios generados de una canción.
+
+    Como en enqueue_waveform_generation, una tarea en curso no se reutiliza (no vería los
+    audios nuevos); la pasada siguiente solo convierte los que aún no tienen rendición.
+    """
+    return enqueue_task(song.user, 'preview_generation', song=song, reuse_running=False)
+
+
+def _dispatch_to_celery(task):
+    """Reenviar la tarea a Celery reutilizando el id del ProcessingTask"""
+    from . import tasks
+
+    celery_tasks = {
+        'stem_generation': (tasks.process_song_to_stems, task.song_id),
+        'midi_conversion': (tasks.convert_stem_to_midi, task.stem_id),
+        'song_midi_conversion': (tasks.convert_song_stems_to_midi, task.song_id),
+        'full_pipeline': (tasks.run_full_pipeline, task.song_id),
+        'track_generation': (tasks.generate_new_track, task.generated_track_id),
+        'waveform_generation': (tasks.generate_waveforms, task.song_id),
+        'preview_generation': (tasks.generate_previews, task.song_id),
+    }
+    celery_task, object_id = celery_tasks[task.task_type]
+    celery_task.apply_async(args=[object_id], task_id=task.celery_task_id)
+
+
+def _worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'[:100]
+
+
+class Heartbeat:
+    """Hilo que renueva la concesión de una tarea mientras el worker la ejecuta"""
+
+    def __init__(self, task):
+        self.task = task
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'heartbeat-{task.pk}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        interval = get_heartbeat_interval()
+        try:
+            while not self._stop.wait(interval):
+                try:
+                    ProcessingTask.objects.filter(
+                        pk=self.task.pk, status='in_progress', worker_id=self.task.worker_id
+                    ).update(heartbeat_at=timezone.now())
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudo renovar la tarea {self.task.celery_task_id}: {e}")
+        finally:
+            connection.close()
+
+
+class TaskProgress:
+    """Callback de progreso que persiste porcentaje y mensaje en el ProcessingTask"""
+
+    def __init__(self, task):
+        self.task = task
+
+    def __call__(self, percentage, detail=''):
+        percentage = max(0, min(100, int(percentage)))
+        ProcessingTask.objects.filter(pk=self.task.pk).update(
+            progress_percentage=percentage,
+            status_detail=detail[:255],
+            heartbeat_at=timezone.now(),
+        )
+        self.task.progress_percentage = percentage
+        self.task.status_detail = detail[:255]
+        progress_channel.publish(self.task.celery_task_id)
+
+
+def _run_stem_generation(task, progress):
+    from .tasks_sync import process_song_to_stems_sync
+    return process_song_to_stems_sync(task.song_id, progress=progress)
+
+
+def _run_midi_conversion(task, progress):
+    from .tasks_sync import convert_stem_to_midi_sync
+    return convert_stem_to_midi_sync(task.stem_id, progress=progress)
+
+
+def _run_song_midi_conversion(task, progress):
+    from .tasks_sync import convert_song_stems_to_midi_sync
+    return convert_song_stems_to_midi_sync(task.song_id, progress=progress)
+
+
+def _run_full_pipeline(task, progress):
+    from .pipeline import run_full_pipeline
+    return run_full_pipeline(task.song_id, progress=progress, task_id=task.pk)
+
+
+def _run_track_generation(task, progress):
+    from .tasks_sync import generate_new_track_sync
+    return generate_new_track_sync(task.generated_track_id, progress=progress)
+
+
+def _run_waveform_generation(task, progress):
+    from .waveform import generate_song_waveforms
+    return generate_song_waveforms(task.song_id, progress=progress)
+
+
+def _run_preview_generation(task, progress):
+    from .previews import generate_song_previews
+    return generate_song_previews(task.song_id, progress=progress)
+
+
+TASK_HANDLERS = {
+    'stem_generation': _run_stem_generation,
+    'midi_conversion': _run_midi_conversion,
+    'song_midi_conversion': _run_song_midi_conversion,
+    'full_pipeline': _run_full_pipeline,
+    'track_generation': _run_track_generation,
+    'waveform_generation': _run_waveform_generation,
+    'preview_generation': _run_preview_generation,
+}
+
+
+def _active_tasks():
+    """Tareas en curso (con la concesión vigente) por Space y por usuario"""
+    rows = ProcessingTask.objects.filter(status='in_progress').exclude(expired_lease()).values_list(
+        'task_type', 'user_id'
+    )
+    by_space, by_user = Counter(), Counter()
+    for task_type, user_id in rows:
+        by_space[TASK_SPACES.get(task_type)] += 1
+        by_user[user_id] += 1
+    return by_space, by_user
+
+
+def _pending_window():
+    """Las SCHEDULER_WINDOW pendientes con mejor prioridad envejecida (ver ProcessingTask.queue_at).
+
+    Ordenar por prioridad almacenada dejaría fuera para siempre a las de baja prioridad
+    con la cola llena de tareas de prioridad alta; queue_at ya descuenta la espera.
+    """
+    return list(
+        ProcessingTask.objects.filter(status='pending')
+        .order_by(F('queue_at').asc(nulls_first=True), 'id')
+        .values('id', 'user_id', 'task_type', 'priority', 'created_at')[:SCHEDULER_WINDOW]
+    )
+
+
+def fair_order(candidates, active_by_user):
+    """Ordenar pendientes por prioridad (mejorada con la espera) y turno de cada usuario.
+
+    El turno de una tarea es cuántas tareas de su usuario hay en curso o delante de
+    ella en la cola: a igual prioridad se atiende primero a quien menos tiene.
+    """
+    now = timezone.now()
+    aging = get_priority_aging()
+    queued = Counter()
+    keyed = []
+    for candidate in candidates:
+        waited = (now - candidate['created_at']).total_seconds()
+        priority = candidate['priority'] - (int(waited // aging) if aging else 0)
+        turn = active_by_user[candidate['user_id']] + queued[candidate['user_id']]
+        queued[candidate['user_id']] += 1
+        keyed.append(((priority, turn, candidate['created_at'], candidate['id']), candidate))
+    keyed.sort(key=lambda item: item[0])
+    return [candidate for _, candidate in keyed]
+
+
+def _space_task_types(space):
+    return [task_type for task_type, task_space in TASK_SPACES.items() if task_space == space]
+
+
+def _over_limit(space):
+    limit = get_space_max_jobs(space)
+    if space is None or limit is None:
+        return False
+    running = ProcessingTask.objects.filter(
+        status='in_progress', task_type__in=_space_task_types(space)
+    ).exclude(expired_lease()).count()
+    return running > limit
+
+
+def _fail_abandoned(task, message):
+    """Marcar como error lo que la tarea abandonada dejó a medias"""
+    if task.task_type in ('stem_generation', 'full_pipeline'):
+        for song in Song.objects.filter(pk=task.song_id, status='processing_stems'):
+            song.status = 'error'
+            song.save(update_fields=['status'])
+    if task.task_type in ('midi_conversion', 'song_midi_conversion', 'full_pipeline'):
+        midi_files = MidiFile.objects.filter(status='processing')
+        if task.stem_id:
+            midi_files = midi_files.filter(stem_id=task.stem_id)
+        else:
+            midi_files = midi_files.filter(stem__song_id=task.song_id)
+        for midi_file in midi_files:
+            midi_file.status = 'error'
+            midi_file.error_message = message
+            midi_file.save(update_fields=['status', 'error_message'])
+    if task.task_type == 'track_generation':
+        for track in GeneratedTrack.objects.filter(pk=task.generated_track_id, status__in=['pending', 'processing']):
+            track.status = 'error'
+            track.error_message = message
+            track.save(update_fields=['status', 'error_message'])
+
+
+def reclaim_expired_tasks(tasks=None, fail_objects=True):
+    """Devolver a la cola las tareas de workers que murieron (o darlas por fallidas); devuelve cuántas.
+
+    `tasks` limita la búsqueda a un queryset; con `fail_objects=False` las fallidas no
+    marcan como error su canción, MIDI o track (quien llama va a volver a procesarlos).
+    """
+    now = timezone.now()
+    reclaimed = 0
+    tasks = ProcessingTask.objects.all() if tasks is None else tasks
+    for task in tasks.filter(expired_lease(now)):
+        # Sin workers locales (Celery) nadie recogería la tarea devuelta a la cola
+        retry = get_job_backend() == 'local' and task.attempts < get_max_attempts()
+        message = f'El worker {task.worker_id or "desconocido"} dejó de responder'
+        if retry:
+            fields = {
+                'status': 'pending', 'started_at': None, 'heartbeat_at': None, 'worker_id': '',
+                'progress_percentage': 0, 'status_detail': 'En cola (reintento)',
+            }
+        else:
+            fields = {
+                'status': 'failed', 'completed_at': now, 'error_message': message, 'status_detail': 'Error',
+            }
+        # Condicional: si el worker renovó la concesión o alguien la reclamó antes, no se toca
+        if not ProcessingTask.objects.filter(expired_lease(now), pk=task.pk).update(**fields):
+            continue
+
+        reclaimed += 1
+        progress_channel.publish(task.celery_task_id, queue=True)
+        if retry:
+            logger.warning(f"♻️ Tarea {task.celery_task_id} ({task.task_type}) abandonada: vuelve a la cola. {message}")
+        else:
+            logger.error(f"❌ Tarea {task.celery_task_id} ({task.task_type}) abandonada tras {task.attempts} intentos. {message}")
+            if fail_objects:
+                _fail_abandoned(task, message)
+    return reclaimed
+
+
+def claim_next_task():
+    """Reclamar la siguiente tarea según el reparto justo; None si no hay ninguna libre"""
+    reclaim_expired_tasks()
+    by_space, by_user = _active_tasks()
+    for candidate in fair_order(_pending_window(), by_user):
+        space = TASK_SPACES.get(candidate['task_type'])
+        limit = get_space_max_jobs(space) if space else None
+        if limit is not None and by_space[space] >= limit:
+            continue
+
+        # El UPDATE condicional garantiza que solo un worker gana cada tarea
+        now = timezone.now()
+        claimed = ProcessingTask.objects.filter(id=candidate['id'], status='pending').update(
+            status='in_progress',
+            started_at=now,
+            heartbeat_at=now,
+            worker_id=_worker_id(),
+            attempts=F('attempts') + 1,
+            status_detail='Iniciando...',
+        )
+        if not claimed:
+            continue
+        if _over_limit(space):
+            # Otro worker ocupó el último hueco del Space a la vez: la tarea vuelve a la cola
+            ProcessingTask.objects.filter(id=candidate['id']).update(
+                status='pending', started_at=None, heartbeat_at=None, worker_id='',
+                attempts=F('attempts') - 1, status_detail='En cola',
+            )
+            by_space[space] = limit
+            continue
+
+        task = ProcessingTask.objects.get(id=candidate['id'])
+        progress_channel.publish(task.celery_task_id, queue=True)
+        return task
+    return None
+
+
+def queue_positions(task_pks):
+    """Posición (1, 2, ...) de cada tarea pendiente entre las de su Space; {pk: None} si no está en cola"""
+    _, by_user = _active_tasks()
+    positions = dict.fromkeys(task_pks)
+    seen = Counter()
+    for candidate in fair_order(_pending_window(), by_user):
+        space = TASK_SPACES.get(candidate['task_type'])
+        seen[space] += 1
+        if candidate['id'] in positions:
+            positions[candidate['id']] = seen[space]
+    return positions
+
+
+def queue_position(task_pk):
+    """Posición (1, 2, ...) de una tarea pendiente entre las de su Space; None si no está en cola"""
+    return queue_positions([task_pk])[task_pk]
+
+
+def queue_stats():
+    """Profundidad de la cola, tareas en curso y esperas por Space ('local' sin Space)"""
+    now = timezone.now()
+    stats = {}
+    for space in list(DEFAULT_SPACE_MAX_JOBS) + [None]:
+        stats[space or 'local'] = {
+            'limit': get_space_max_jobs(space) if space else None,
+            'pending': 0,
+            'in_progress': 0,
+            'users_waiting': set(),
+            'oldest_wait': 0,
+            'waits': [],
+        }
+
+    rows = ProcessingTask.objects.filter(status__in=['pending', 'in_progress']).values_list(
+        'task_type', 'status', 'user_id', 'created_at'
+    )
+    for task_type, status, user_id, created_at in rows:
+        entry = stats[TASK_SPACES.get(task_type) or 'local']
+        entry[status] += 1
+        if status == 'pending':
+            entry['users_waiting'].add(user_id)
+            entry['oldest_wait'] = max(entry['oldest_wait'], (now - created_at).total_seconds())
+
+    # Espera media de las tareas que empezaron en la última hora
+    started = ProcessingTask.objects.filter(started_at__gte=now - timedelta(hours=1)).values_list(
+        'task_type', 'created_at', 'started_at'
+    )
+    for task_type, created_at, started_at in started:
+        stats[TASK_SPACES.get(task_type) or 'local']['waits'].append((started_at - created_at).total_seconds())
+
+    for entry in stats.values():
+        entry['users_waiting'] = len(entry['users_waiting'])
+        waits = entry.pop('waits')
+        entry['avg_wait'] = sum(waits) / len(waits) if waits else 0
+    return stats
+
+
+def _finish_task(task, **fields):
+    """Guardar el resultado de una tarea solo si el worker conserva su concesión.
+
+    Si la concesión caducó, la tarea ya se devolvió a la cola (o la tiene otro worker) y este
+    resultado no debe pisar el suyo: se registra y se descarta.
+    """
+    updated = ProcessingTask.objects.filter(
+        pk=task.pk, worker_id=task.worker_id, status='in_progress'
+    ).update(**fields)
+    if not updated:
+        logger.warning(
+            f"⚠️ [worker {os.getpid()}] La tarea {task.celery_task_id} ya no es de este worker "
+            f"(concesión caducada): se descarta su resultado ({fields['status']})"
+        )
+        return False
+    for field, value in fields.items():
+        setattr(task, field, value)
+    progress_channel.publish(task.celery_task_id, queue=True)
+    return True
+
+
+def run_task(task):
+    """Ejecutar una tarea ya reclamada y registrar su resultado"""
+    handler = TASK_HANDLERS.get(task.task_type)
+    progress = TaskProgress(task)
+
+    try:
+        if handler is None:
+            raise Exception(f"Tipo de tarea no soportado: {task.task_type}")
+
+        logger.info(f"⚙️ [worker {os.getpid()}] Ejecutando tarea {task.celery_task_id} ({task.task_type})")
+        with Heartbeat(task):
+            result = handler(task, progress)
+
+        if not _finish_task(
+            task,
+            status='completed',
+            completed_at=timezone.now(),
+            progress_percentage=100,
+            status_detail='Completado',
+        ):
+            return None
+        logger.info(f"✅ [worker {os.getpid()}] Tarea {task.celery_task_id} completada")
+        return result
+
+    except Exception as e:
+        logger.error(f"❌ [worker {os.getpid()}] Tarea {task.celery_task_id} fallida: {e}", exc_info=True)
+        _finish_task(
+            task,
+            status='failed',
+            completed_at=timezone.now(),
+            error_message=str(e),
+            status_detail='Error',
+        )
+        return None
+
+
+def run_worker(poll_interval=None, max_tasks=None, exit_when_idle=False, warm_up=False):
+    """Bucle principal de un worker: reclama y ejecuta tareas hasta que se detenga"""
+    if poll_interval is None:
+        poll_interval = getattr(settings, 'MUSIC_JOB_POLL_INTERVAL', 2.0)
+
+    if warm_up:
+        from .clients import client_pool
+        client_pool.warm_up()
+
+    processed = 0
+    logger.info(f"🚀 Worker {os.getpid()} iniciado (intervalo de sondeo: {poll_interval}s)")
+
+    while max_tasks is None or processed < max_tasks:
+        close_old_connections()
+        task = claim_next_task()
+
+        if task is None:
+            if exit_when_idle:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        run_task(task)
+        processed += 1
+
+    close_old_connections()
+    return processed
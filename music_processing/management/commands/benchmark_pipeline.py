@@ -0,0 +1,125 @@
+import json
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+
+from music_processing.benchmark import COMPONENTS, PERCENTILES, Benchmark
+from music_processing.fake_spaces import DEFAULT_LATENCY, FakeSpacesServer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de subida → stems → MIDI → generación con varios usuarios a la vez'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=4, help='Usuarios simultáneos')
+        parser.add_argument('--iterations', type=int, default=1, help='Canciones que procesa cada usuario')
+        parser.add_argument(
+            '--audio',
+            help='Audio a subir (por defecto un WAV sintético distinto por subida)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Duración en segundos del audio sintético',
+        )
+        parser.add_argument(
+            '--spaces-url',
+            help='Servidor con las apps /stems/, /midi/ y /orpheus/ (por defecto, MUSIC_SPACES_URL o Hugging Face)',
+        )
+        parser.add_argument(
+            '--fake',
+            action='store_true',
+            help='Arrancar los Spaces falsos de `fake_spaces` en un puerto libre y usarlos',
+        )
+        parser.add_argument(
+            '--fake-latency-scale',
+            type=float,
+            default=1.0,
+            help='Con --fake, factor sobre la latencia por defecto de cada Space',
+        )
+        parser.add_argument(
+            '--fake-concurrency',
+            type=int,
+            default=1,
+            help='Con --fake, llamadas que atiende cada Space a la vez',
+        )
+        parser.add_argument('--no-generation', action='store_true', help='No generar con Orpheus')
+        parser.add_argument('--no-cache', action='store_true', help='Desactivar las cachés de stems y MIDI')
+        parser.add_argument(
+            '--output',
+            help='Fichero JSON con el resultado (por defecto benchmark_pipeline_<fecha>.json)',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['iterations'] < 1:
+            raise CommandError('--users y --iterations deben ser al menos 1')
+
+        server = None
+        spaces_url = options['spaces_url']
+        if options['fake']:
+            scale = options['fake_latency_scale']
+            server = FakeSpacesServer(
+                ('127.0.0.1', 0),
+                latency={name: round(latency * scale, 3) for name, latency in DEFAULT_LATENCY.items()},
+                concurrency=options['fake_concurrency'],
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            spaces_url = f'http://127.0.0.1:{server.server_address[1]}'
+            self.stdout.write(f'🧪 Spaces falsos en {spaces_url}')
+
+        benchmark = Benchmark(
+            users=options['users'],
+            iterations=options['iterations'],
+            audio=options['audio'],
+            duration=options['duration'],
+            generate=not options['no_generation'],
+            spaces_url=spaces_url,
+            use_caches=not options['no_cache'],
+        )
+        self.stdout.write(
+            f"Benchmark {benchmark.run_id}: {options['users']} usuarios × {options['iterations']} canciones..."
+        )
+        try:
+            report = benchmark.run()
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        if server is not None:
+            report['config']['fake_spaces'] = {
+                'latency': server.latency,
+                'concurrency': options['fake_concurrency'],
+            }
+
+        output = options['output'] or f'benchmark_pipeline_{benchmark.run_id}.json'
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        self._write_report(report)
+        self.stdout.write(self.style.SUCCESS(f'Resultado guardado en {output}'))
+
+    def _write_report(self, report):
+        header = ''.join(f'{f"p{q}":>10}' for q in PERCENTILES)
+        for stage, stats in report['stages'].items():
+            self.stdout.write(f"\n{stage} ({stats['count']} llamadas, {stats['errors']} con error)")
+            if not stats['total']:
+                continue
+            self.stdout.write(f'  {"":<10}{header}')
+            for component in COMPONENTS:
+                values = ''.join(f"{stats[component][f'p{q}']:>10.3f}" for q in PERCENTILES)
+                self.stdout.write(f'  {component:<10}{values}')
+
+        if report['config']['database'] == 'sqlite' and report['config']['users'] > 1:
+            self.stdout.write(self.style.WARNING(
+                '⚠️ Con SQLite las escrituras de varios usuarios se serializan: los tiempos de db '
+                'y los errores "database is locked" no son representativos de producción'
+            ))
+
+        peak = report['peak_rss_bytes']
+        self.stdout.write(
+            f"\nDuración total: {report['duration']}s | "
+            f"pico de memoria (RSS): {filesizeformat(peak) if peak is not None else 'no disponible'}"
+        )
@@ -0,0 +1,79 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from music_processing.fake_spaces import DEFAULT_LATENCY, FAILURE_KINDS, SPACES, FakeSpacesServer
+
+
+class Command(BaseCommand):
+    help = 'Servidor local que imita los Spaces de Modulo1, Modulo2 y Orpheus (pruebas de carga sin cuota)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=7860)
+        for name in SPACES:
+            parser.add_argument(
+                f'--{name}-latency',
+                type=float,
+                default=DEFAULT_LATENCY[name],
+                help=f'Segundos por llamada al Space {name} (por defecto {DEFAULT_LATENCY[name]})',
+            )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0.2,
+            help='Variación aleatoria de la latencia, como fracción de ella',
+        )
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0.0,
+            help='Probabilidad de que una llamada falle (0-1)',
+        )
+        parser.add_argument(
+            '--failure-kind',
+            choices=FAILURE_KINDS,
+            default='unavailable',
+            help='Cómo fallan: caída del Space (502), cuota agotada o error de la app',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Llamadas que atiende cada Space a la vez; el resto espera turno',
+        )
+
+    def handle(self, *args, **options):
+        server = FakeSpacesServer(
+            (options['host'], options['port']),
+            latency={name: options[f'{name}_latency'] for name in SPACES},
+            jitter=options['jitter'],
+            failure_rate=options['failure_rate'],
+            failure_kind=options['failure_kind'],
+            concurrency=options['concurrency'],
+            on_call=self._log_call if options['verbosity'] > 1 else None,
+        )
+        url = f"http://{options['host']}:{server.server_address[1]}"
+        self.stdout.write(self.style.SUCCESS(f'🧪 Spaces falsos escuchando en {url}'))
+        for name, space in SPACES.items():
+            self.stdout.write(f'   {name:<8} {url}/{name}/  ({space.title}, /{space.api_name})')
+        self.stdout.write(f'Para usarlos: MUSIC_SPACES_URL={url}')
+
+        # serve_forever solo se puede parar desde otro hilo
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+        for name, stats in server.stats.items():
+            self.stdout.write(
+                f"{name:<8} llamadas: {stats['calls']} | completadas: {stats['completed']} | "
+                f"fallidas: {stats['failures']}"
+            )
+
+    def _log_call(self, name, elapsed, waited, detail):
+        self.stdout.write(f'{name:<8} {detail} en {elapsed:.1f}s (en cola {waited:.1f}s)')
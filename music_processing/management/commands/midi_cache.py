@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from music_processing import midi_cache
+from music_processing.models import MidiCacheEntry
+
+
+class Command(BaseCommand):
+    help = 'Inspeccionar o vaciar la caché de conversiones a MIDI'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Listar las entradas de la caché',
+        )
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Eliminar todas las entradas de la caché',
+        )
+        parser.add_argument(
+            '--expired',
+            action='store_true',
+            help='Con --purge, eliminar solo las entradas caducadas',
+        )
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            deleted = midi_cache.purge(expired_only=options['expired'])
+            self.stdout.write(self.style.SUCCESS(f'{deleted} entradas eliminadas de la caché MIDI'))
+
+        if options['list']:
+            for entry in MidiCacheEntry.objects.defer('midi_data'):
+                state = 'caducada' if entry.is_expired() else 'vigente'
+                self.stdout.write(
+                    f'{entry.stem_hash}  {filesizeformat(entry.size_bytes):>10}  '
+                    f'{entry.hit_count:>5} aciertos  expira {entry.expires_at:%Y-%m-%d %H:%M} ({state})'
+                )
+
+        stats = midi_cache.get_stats()
+        self.stdout.write(
+            f"Entradas vigentes: {stats['entries']} | caducadas: {stats['expired']} | "
+            f"tamaño: {filesizeformat(stats['size_bytes'])} | "
+            f"aciertos: {stats['hits']} | fallos: {stats['misses']}"
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from music_processing import search
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir los documentos de búsqueda de todas las canciones'
+
+    def handle(self, *args, **options):
+        backend = search.get_backend() or 'icontains (sin índice de texto completo)'
+        total = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'{total} canciones indexadas ({backend})'))
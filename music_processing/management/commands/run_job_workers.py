@@ -0,0 +1,76 @@
+import signal
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from music_processing.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Arranca los workers que procesan la cola de tareas (stems, MIDI y generación)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'MUSIC_JOB_WORKERS', 1),
+            help='Número de procesos worker a arrancar',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=getattr(settings, 'MUSIC_JOB_POLL_INTERVAL', 2.0),
+            help='Segundos de espera entre sondeos cuando la cola está vacía',
+        )
+        parser.add_argument(
+            '--warm-up',
+            action='store_true',
+            default=getattr(settings, 'MUSIC_CLIENT_WARMUP', False),
+            help='Crear los clientes de los Spaces de Hugging Face al arrancar cada worker',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesar las tareas pendientes y salir (útil como tarea programada)',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+
+        if workers == 1:
+            processed = run_worker(
+                poll_interval=options['poll_interval'],
+                exit_when_idle=options['once'],
+                warm_up=options['warm_up'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'Worker finalizado. Tareas procesadas: {processed}'))
+            return
+
+        # Cada worker es un proceso independiente con su propia conexión a la base de datos
+        command = [sys.executable, sys.argv[0], 'run_job_workers', '--workers', '1',
+                   '--poll-interval', str(options['poll_interval'])]
+        if options['once']:
+            command.append('--once')
+        if options['warm_up']:
+            command.append('--warm-up')
+
+        processes = [subprocess.Popen(command) for _ in range(workers)]
+        self.stdout.write(f'Arrancados {workers} workers: {", ".join(str(p.pid) for p in processes)}')
+
+        def stop_workers(signum, frame):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, stop_workers)
+
+        try:
+            for process in processes:
+                process.wait()
+        except KeyboardInterrupt:
+            stop_workers(None, None)
+            for process in processes:
+                process.wait()
+
+        self.stdout.write(self.style.SUCCESS('Todos los workers han finalizado'))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from music_processing import jobs, resilience
+from music_processing.clients import DEFAULT_SPACES, get_space
+
+CIRCUIT_LABELS = {
+    'closed': 'cerrado',
+    'open': 'abierto',
+    'half_open': 'semiabierto',
+    'disabled': 'desactivado (la caché no se comparte entre procesos)',
+}
+
+
+class Command(BaseCommand):
+    help = 'Estado del circuit breaker, contadores de llamadas y cola de tareas de cada Space de Hugging Face'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Cerrar los circuitos y poner a cero los contadores',
+        )
+
+    def handle(self, *args, **options):
+        queue = jobs.queue_stats()
+        for name in DEFAULT_SPACES:
+            space = get_space(name)
+            if options['reset']:
+                resilience.breaker.reset(space)
+                resilience.reset_metrics(space)
+
+            metrics = resilience.get_metrics(space)
+            circuit = CIRCUIT_LABELS[metrics['circuit']]
+            if metrics['circuit'] == 'open':
+                circuit += f" (prueba en {metrics['retry_in']}s)"
+            self.stdout.write(
+                f"{name:<8} {space}: circuito {circuit} | llamadas: {metrics['calls']} | "
+                f"intentos: {metrics['attempts']} | reintentos: {metrics['retries']} | "
+                f"éxitos: {metrics['successes']} | caídas: {metrics['unavailable']} | "
+                f"cuota/cola: {metrics['throttled']} | permanentes: {metrics['permanent']} | "
+                f"rechazadas: {metrics['rejected']}"
+            )
+            self._write_queue(queue[name])
+
+        self.stdout.write('local    (sin Space)')
+        self._write_queue(queue['local'])
+
+    def _write_queue(self, stats):
+        limit = stats['limit'] if stats['limit'] is not None else 'sin límite'
+        self.stdout.write(
+            f"         cola: {stats['pending']} pendientes de {stats['users_waiting']} usuarios | "
+            f"en curso: {stats['in_progress']}/{limit} | espera máxima: {int(stats['oldest_wait'])}s | "
+            f"espera media (última hora): {int(stats['avg_wait'])}s"
+        )
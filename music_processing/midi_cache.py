@@ -0,0 +1,83 @@
+# Caché persistente de conversiones a MIDI
+#
+# Guarda los bytes del .mid producido por SouniQ/Modulo2 bajo el sha256 del audio
+# del stem, con caducidad (MUSIC_MIDI_CACHE_TTL). Reconvertir un stem, o convertir
+# el mismo stem de una canción duplicada, se resuelve sin llamar al Space.
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import CacheCounter, MidiCacheEntry
+
+logger = logging.getLogger(__name__)
+
+COUNTER_NAME = 'midi_conversion'
+
+
+def is_enabled():
+    return getattr(settings, 'MUSIC_MIDI_CACHE_ENABLED', True)
+
+
+def get_ttl():
+    return timedelta(seconds=getattr(settings, 'MUSIC_MIDI_CACHE_TTL', 30 * 24 * 3600))
+
+
+def _record(hit):
+    counter, _ = CacheCounter.objects.get_or_create(name=COUNTER_NAME)
+    field = 'hits' if hit else 'misses'
+    CacheCounter.objects.filter(pk=counter.pk).update(**{field: F(field) + 1})
+
+
+def lookup(stem_hash):
+    """Devolver los bytes MIDI cacheados para un stem, o None si no hay o han caducado"""
+    entry = MidiCacheEntry.objects.filter(stem_hash=stem_hash, expires_at__gt=timezone.now()).first()
+    if entry is None:
+        _record(hit=False)
+        return None
+
+    MidiCacheEntry.objects.filter(pk=entry.pk).update(hit_count=F('hit_count') + 1)
+    _record(hit=True)
+    logger.info(f"♻️ MIDI encontrado en caché para el stem {stem_hash[:12]}")
+    return bytes(entry.midi_data)
+
+
+def store(stem_hash, midi_data):
+    """Guardar (o renovar) el MIDI de un stem"""
+    defaults = {
+        'midi_data': midi_data,
+        'size_bytes': len(midi_data),
+        'created_at': timezone.now(),
+        'expires_at': timezone.now() + get_ttl(),
+    }
+    try:
+        with transaction.atomic():
+            MidiCacheEntry.objects.update_or_create(stem_hash=stem_hash, defaults=defaults)
+    except IntegrityError:
+        # Otro worker guardó el mismo stem a la vez; su entrada es equivalente
+        pass
+
+
+def purge(expired_only=False):
+    """Eliminar entradas de la caché; devuelve cuántas se han borrado"""
+    entries = MidiCacheEntry.objects.all()
+    if expired_only:
+        entries = entries.filter(expires_at__lte=timezone.now())
+    deleted, _ = entries.delete()
+    return deleted
+
+
+def get_stats():
+    """Estado de la caché: entradas vigentes y caducadas, bytes y aciertos/fallos"""
+    now = timezone.now()
+    counter = CacheCounter.objects.filter(name=COUNTER_NAME).first()
+    return {
+        'entries': MidiCacheEntry.objects.filter(expires_at__gt=now).count(),
+        'expired': MidiCacheEntry.objects.filter(expires_at__lte=now).count(),
+        'size_bytes': MidiCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0,
+        'hits': counter.hits if counter else 0,
+        'misses': counter.misses if counter else 0,
+    }
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0005_generatedtrack_add_drums_generatedtrack_add_outro_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processingtask",
+            name="status_detail",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
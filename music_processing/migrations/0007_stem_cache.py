@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0006_processingtask_status_detail"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheCounter",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("hits", models.BigIntegerField(default=0)),
+                ("misses", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StemCacheEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("audio_hash", models.CharField(max_length=64, unique=True)),
+                ("files", models.JSONField(default=list)),
+                ("size_bytes", models.BigIntegerField(default=0)),
+                ("hit_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_used_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "ordering": ["-last_used_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="content_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0008_midi_cache"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="processingtask",
+            name="task_type",
+            field=models.CharField(choices=[("stem_generation", "Generación de Stems"), ("midi_conversion", "Conversión a MIDI"), ("song_midi_conversion", "Conversión a MIDI de la canción"), ("track_generation", "Generación de Track")], max_length=20),
+        ),
+    ]
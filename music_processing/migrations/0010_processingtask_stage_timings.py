@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0009_processingtask_song_midi_conversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processingtask",
+            name="stage_timings",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name="processingtask",
+            name="task_type",
+            field=models.CharField(choices=[("stem_generation", "Generación de Stems"), ("midi_conversion", "Conversión a MIDI"), ("song_midi_conversion", "Conversión a MIDI de la canción"), ("full_pipeline", "Pipeline completo"), ("track_generation", "Generación de Track")], max_length=20),
+        ),
+    ]
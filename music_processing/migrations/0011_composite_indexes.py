@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0010_processingtask_stage_timings"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="generatedtrack",
+            index=models.Index(fields=["user", "-created_at"], name="track_user_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="midifile",
+            index=models.Index(condition=models.Q(("status", "completed")), fields=["stem", "completed_at"], name="midi_completed_stem_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="processingtask",
+            index=models.Index(fields=["song", "task_type", "status"], name="task_song_type_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="processingtask",
+            index=models.Index(fields=["stem", "task_type", "status"], name="task_stem_type_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="processingtask",
+            index=models.Index(fields=["generated_track", "task_type", "status"], name="task_track_type_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="processingtask",
+            index=models.Index(condition=models.Q(("status__in", ["pending", "in_progress"])), fields=["user", "-created_at"], name="task_user_active_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="processingtask",
+            index=models.Index(condition=models.Q(("status", "pending")), fields=["created_at", "id"], name="task_pending_queue_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(fields=["user", "-uploaded_at"], name="song_user_uploaded_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(fields=["user", "status", "-uploaded_at"], name="song_user_status_idx"),
+        ),
+    ]
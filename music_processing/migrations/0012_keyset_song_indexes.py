@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0011_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="song",
+            name="song_user_uploaded_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="song",
+            name="song_user_status_idx",
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(fields=["user", "-uploaded_at", "-id"], name="song_user_uploaded_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(fields=["user", "status", "-uploaded_at", "-id"], name="song_user_status_idx"),
+        ),
+    ]
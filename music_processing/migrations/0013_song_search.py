@@ -0,0 +1,125 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:07
+
+import os
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.utils import OperationalError
+import django.db.models.deletion
+
+DOCUMENT_TABLE = "music_processing_songsearchdocument"
+FTS_TABLE = "music_processing_songsearch_fts"
+FIELDS = "title, filename, stems, tracks"
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {FIELDS}, content='{DOCUMENT_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {FIELDS}) VALUES (new.id, new.title, new.filename, new.stems, new.tracks);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FIELDS}) VALUES ('delete', old.id, old.title, old.filename, old.stems, old.tracks);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FIELDS}) VALUES ('delete', old.id, old.title, old.filename, old.stems, old.tracks);
+        INSERT INTO {FTS_TABLE}(rowid, {FIELDS}) VALUES (new.id, new.title, new.filename, new.stems, new.tracks);
+    END""",
+]
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_FORWARD = [
+    f"""ALTER TABLE {DOCUMENT_TABLE} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') ||
+        setweight(to_tsvector('simple', filename), 'B') ||
+        setweight(to_tsvector('simple', stems), 'C') ||
+        setweight(to_tsvector('simple', tracks), 'D')
+    ) STORED""",
+    f"CREATE INDEX music_processing_songsearch_gin ON {DOCUMENT_TABLE} USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS music_processing_songsearch_gin",
+    f"ALTER TABLE {DOCUMENT_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def normalize(text):
+    # Copia de search.normalize para no depender del código actual de la aplicación
+    text = unicodedata.normalize("NFKD", text or "").lower()
+    text = "".join(c if c.isalnum() else " " for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+    elif vendor == "sqlite":
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for sql in SQLITE_FORWARD:
+                    schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite compilado sin FTS5: la búsqueda recurre a icontains
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def build_documents(apps, schema_editor):
+    Song = apps.get_model("music_processing", "Song")
+    Stem = apps.get_model("music_processing", "Stem")
+    GeneratedTrack = apps.get_model("music_processing", "GeneratedTrack")
+    SongSearchDocument = apps.get_model("music_processing", "SongSearchDocument")
+    stem_names = dict(Stem._meta.get_field("stem_type").choices)
+
+    for song in Song.objects.all().iterator():
+        stems = Stem.objects.filter(song=song).values_list("stem_type", flat=True)
+        tracks = GeneratedTrack.objects.filter(midi_file__stem__song=song).values_list("title", flat=True)
+        SongSearchDocument.objects.create(
+            song=song,
+            user_id=song.user_id,
+            title=normalize(song.title),
+            filename=normalize(os.path.basename(song.original_file.name or "")),
+            stems=normalize(" ".join(f"{stem_type} {stem_names.get(stem_type, '')}" for stem_type in stems)),
+            tracks=normalize(" ".join(tracks)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("music_processing", "0012_keyset_song_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SongSearchDocument",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("title", models.TextField(blank=True)),
+                ("filename", models.TextField(blank=True)),
+                ("stems", models.TextField(blank=True)),
+                ("tracks", models.TextField(blank=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("song", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="search_document", to="music_processing.song")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("music_processing", "0013_song_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadSession",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("title", models.CharField(max_length=200)),
+                ("filename", models.CharField(max_length=255)),
+                ("total_size", models.BigIntegerField()),
+                ("offset", models.BigIntegerField(default=0)),
+                ("run_pipeline", models.BooleanField(default=False)),
+                ("status", models.CharField(choices=[("active", "En curso"), ("completed", "Completada")], default="active", max_length=20)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("expires_at", models.DateTimeField()),
+                ("song", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="music_processing.song")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="upload_sessions", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
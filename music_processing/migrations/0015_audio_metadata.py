@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0014_upload_session"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processingtask",
+            name="estimated_cost",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="bitrate",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="channels",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="sample_rate",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="StemMetadata",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("file_size", models.BigIntegerField(blank=True, null=True)),
+                ("duration", models.FloatField(blank=True, null=True)),
+                ("sample_rate", models.PositiveIntegerField(blank=True, null=True)),
+                ("channels", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("bitrate", models.PositiveIntegerField(blank=True, null=True)),
+                ("bits_per_sample", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("audio_format", models.CharField(blank=True, max_length=10)),
+                ("probed_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("stem", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="metadata", to="music_processing.stem")),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0015_audio_metadata"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WaveformPeaks",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("content_hash", models.CharField(max_length=64, unique=True)),
+                ("points", models.PositiveIntegerField()),
+                ("duration", models.FloatField(blank=True, null=True)),
+                ("data", models.BinaryField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="generatedtrack",
+            name="content_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="generatedversion",
+            name="content_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name="processingtask",
+            name="task_type",
+            field=models.CharField(choices=[("stem_generation", "Generación de Stems"), ("midi_conversion", "Conversión a MIDI"), ("song_midi_conversion", "Conversión a MIDI de la canción"), ("full_pipeline", "Pipeline completo"), ("track_generation", "Generación de Track"), ("waveform_generation", "Formas de onda")], max_length=20),
+        ),
+    ]
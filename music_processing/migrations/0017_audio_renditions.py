@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0016_waveform_peaks"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="processingtask",
+            name="task_type",
+            field=models.CharField(choices=[("stem_generation", "Generación de Stems"), ("midi_conversion", "Conversión a MIDI"), ("song_midi_conversion", "Conversión a MIDI de la canción"), ("full_pipeline", "Pipeline completo"), ("track_generation", "Generación de Track"), ("waveform_generation", "Formas de onda"), ("preview_generation", "Versiones de escucha")], max_length=20),
+        ),
+        migrations.CreateModel(
+            name="AudioRendition",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("content_hash", models.CharField(max_length=64)),
+                ("audio_format", models.CharField(choices=[("opus", "Opus (OGG)"), ("mp3", "MP3")], max_length=10)),
+                ("bitrate", models.PositiveIntegerField()),
+                ("file", models.FileField(upload_to="previews/")),
+                ("file_size", models.BigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_used_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "unique_together": {("content_hash", "audio_format")},
+            },
+        ),
+    ]
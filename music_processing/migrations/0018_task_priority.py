@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0017_audio_renditions"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="processingtask",
+            name="task_pending_queue_idx",
+        ),
+        migrations.AddField(
+            model_name="processingtask",
+            name="priority",
+            field=models.PositiveSmallIntegerField(default=5),
+        ),
+        migrations.AddIndex(
+            model_name="processingtask",
+            index=models.Index(condition=models.Q(("status", "pending")), fields=["priority", "created_at", "id"], name="task_pending_queue_idx"),
+        ),
+    ]
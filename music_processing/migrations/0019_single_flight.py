@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+EXCLUSIVE_TASK_TYPES = ["stem_generation", "midi_conversion", "song_midi_conversion", "full_pipeline", "track_generation"]
+
+
+def fail_duplicate_active_tasks(apps, schema_editor):
+    """Dejar solo la tarea activa más reciente por objeto y tipo antes de crear las restricciones"""
+    ProcessingTask = apps.get_model("music_processing", "ProcessingTask")
+    active = ProcessingTask.objects.filter(
+        status__in=["pending", "in_progress"], task_type__in=EXCLUSIVE_TASK_TYPES
+    ).order_by("-created_at", "-id")
+    seen = set()
+    duplicates = []
+    for task in active:
+        for field in ("song_id", "stem_id", "generated_track_id"):
+            object_id = getattr(task, field)
+            if object_id is None:
+                continue
+            key = (field, object_id, task.task_type)
+            if key in seen:
+                duplicates.append(task.pk)
+            seen.add(key)
+    ProcessingTask.objects.filter(pk__in=duplicates).update(
+        status="failed", error_message="Tarea duplicada", status_detail="Error"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0018_task_priority"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InflightCall",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("space", models.CharField(max_length=200)),
+                ("input_hash", models.CharField(max_length=64)),
+                ("status", models.CharField(choices=[("running", "En curso"), ("completed", "Completada"), ("failed", "Fallida")], default="running", max_length=20)),
+                ("owner", models.CharField(blank=True, max_length=100)),
+                ("waiters", models.IntegerField(default=0)),
+                ("error_message", models.TextField(blank=True)),
+                ("started_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(fail_duplicate_active_tasks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="processingtask",
+            constraint=models.UniqueConstraint(condition=models.Q(("status__in", ["pending", "in_progress"]), ("task_type__in", ["stem_generation", "midi_conversion", "song_midi_conversion", "full_pipeline", "track_generation"])), fields=("song", "task_type"), name="task_unique_active_song"),
+        ),
+        migrations.AddConstraint(
+            model_name="processingtask",
+            constraint=models.UniqueConstraint(condition=models.Q(("status__in", ["pending", "in_progress"]), ("task_type__in", ["stem_generation", "midi_conversion", "song_midi_conversion", "full_pipeline", "track_generation"])), fields=("stem", "task_type"), name="task_unique_active_stem"),
+        ),
+        migrations.AddConstraint(
+            model_name="processingtask",
+            constraint=models.UniqueConstraint(condition=models.Q(("status__in", ["pending", "in_progress"]), ("task_type__in", ["stem_generation", "midi_conversion", "song_midi_conversion", "full_pipeline", "track_generation"])), fields=("generated_track", "task_type"), name="task_unique_active_generated_track"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0019_single_flight"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processingtask",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="processingtask",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="processingtask",
+            name="worker_id",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
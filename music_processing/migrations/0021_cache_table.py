@@ -0,0 +1,20 @@
+# Tabla de la caché por defecto (DatabaseCache, ver CACHES en settings)
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """Crear las tablas de las cachés DatabaseCache configuradas (no hace nada con otros backends)"""
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0020_task_lease"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:02
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_queue_at(apps, schema_editor):
+    """queue_at de las tareas que ya estaban en cola"""
+    ProcessingTask = apps.get_model("music_processing", "ProcessingTask")
+    aging = getattr(settings, "MUSIC_JOB_PRIORITY_AGING", 300)
+    for task in ProcessingTask.objects.filter(status="pending").only("created_at", "priority"):
+        task.queue_at = task.created_at + timedelta(seconds=task.priority * aging)
+        task.save(update_fields=["queue_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music_processing", "0021_cache_table"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="processingtask",
+            name="task_pending_queue_idx",
+        ),
+        migrations.AddField(
+            model_name="processingtask",
+            name="queue_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_queue_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="processingtask",
+            index=models.Index(condition=models.Q(("status", "pending")), fields=["queue_at", "id"], name="task_pending_queue_idx"),
+        ),
+    ]
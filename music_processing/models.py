@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 import os
+import uuid
 
 
 class Song(models.Model):
@@ -21,9 +22,19 @@ class Song(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploaded')
     file_size = models.BigIntegerField(null=True, blank=True)
     duration = models.FloatField(null=True, blank=True)  # duración en segundos
+    sample_rate = models.PositiveIntegerField(null=True, blank=True)  # Hz
+    channels = models.PositiveSmallIntegerField(null=True, blank=True)
+    bitrate = models.PositiveIntegerField(null=True, blank=True)  # bits por segundo
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # sha256 del audio
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Biblioteca del usuario (con y sin filtro de estado), más recientes primero;
+            # el id desempata el orden de la paginación por cursor
+            models.Index(fields=['user', '-uploaded_at', '-id'], name='song_user_uploaded_idx'),
+            models.Index(fields=['user', 'status', '-uploaded_at', '-id'], name='song_user_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
@@ -51,6 +62,7 @@ class Stem(models.Model):
     file = models.FileField(upload_to='stems/')
     created_at = models.DateTimeField(default=timezone.now)
     order = models.IntegerField(default=0)  # orden de los stems (0-6)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # sha256 del audio
     
     class Meta:
         ordering = ['order']
@@ -60,6 +72,23 @@ class Stem(models.Model):
         return f"{self.song.title} - {self.get_stem_type_display()}"
 
 
+class StemMetadata(models.Model):
+    """Datos del audio de un stem leídos de sus cabeceras (ver ingest.py)"""
+    
+    stem = models.OneToOneField(Stem, on_delete=models.CASCADE, related_name='metadata')
+    file_size = models.BigIntegerField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)  # duración en segundos
+    sample_rate = models.PositiveIntegerField(null=True, blank=True)  # Hz
+    channels = models.PositiveSmallIntegerField(null=True, blank=True)
+    bitrate = models.PositiveIntegerField(null=True, blank=True)  # bits por segundo
+    bits_per_sample = models.PositiveSmallIntegerField(null=True, blank=True)
+    audio_format = models.CharField(max_length=10, blank=True)
+    probed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Metadatos de {self.stem}"
+
+
 class MidiFile(models.Model):
     """Modelo para los archivos MIDI generados a partir de los stems"""
     
@@ -77,6 +106,16 @@ class MidiFile(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
     
+    class Meta:
+        indexes = [
+            # MIDI completados de un usuario (se llega por stem → canción → usuario)
+            models.Index(
+                fields=['stem', 'completed_at'],
+                name='midi_completed_stem_idx',
+                condition=models.Q(status='completed'),
+            ),
+        ]
+    
     def __str__(self):
         return f"MIDI - {self.stem}"
 
@@ -116,6 +155,7 @@ class GeneratedTrack(models.Model):
     
     # Archivos resultado - deprecated, ahora usar GeneratedVersion
     generated_file = models.FileField(upload_to='generated_tracks/', null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # sha256 de generated_file
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(null=True, blank=True)
@@ -123,18 +163,25 @@ class GeneratedTrack(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='track_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
     
     @property
     def versions_count(self):
-        """Retorna el número de versiones generadas"""
+        """Retorna el número de versiones generadas (usa la anotación `num_versions` si existe)"""
+        if 'num_versions' in self.__dict__:
+            return self.num_versions
         return self.generated_versions.filter(file__isnull=False).count()
     
     @property
     def has_completed_versions(self):
         """Retorna True si tiene versiones completadas"""
+        if 'num_versions' in self.__dict__:
+            return self.num_versions > 0
         return self.generated_versions.filter(file__isnull=False).exists()
     
     @property
@@ -152,9 +199,10 @@ class GeneratedVersion(models.Model):
     """Modelo para almacenar las múltiples versiones generadas de un track"""
     
     track = models.ForeignKey(GeneratedTrack, on_delete=models.CASCADE, related_name='generated_versions')
-    version_number = models.IntegerField()  # 1-8 para las 8 versiones
+    version_number = models.IntegerField()  # 1..N en el orden devuelto por Orpheus
     file = models.FileField(upload_to='generated_tracks/', null=True, blank=True)
     file_size = models.BigIntegerField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # sha256 del audio
     created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
@@ -177,13 +225,23 @@ class GeneratedVersion(models.Model):
         return None
 
 
+# Tipos de tarea que admiten como mucho una tarea pendiente o en curso por objeto
+EXCLUSIVE_TASK_TYPES = [
+    'stem_generation', 'midi_conversion', 'song_midi_conversion', 'full_pipeline', 'track_generation',
+]
+
+
 class ProcessingTask(models.Model):
     """Modelo para rastrear tareas de procesamiento en background"""
     
     TASK_TYPES = [
         ('stem_generation', 'Generación de Stems'),
         ('midi_conversion', 'Conversión a MIDI'),
+        ('song_midi_conversion', 'Conversión a MIDI de la canción'),
+        ('full_pipeline', 'Pipeline completo'),
         ('track_generation', 'Generación de Track'),
+        ('waveform_generation', 'Formas de onda'),
+        ('preview_generation', 'Versiones de escucha'),
     ]
     
     STATUS_CHOICES = [
@@ -193,6 +251,8 @@ class ProcessingTask(models.Model):
         ('failed', 'Fallido'),
     ]
     
+    EXCLUSIVE_TASK_TYPES = EXCLUSIVE_TASK_TYPES
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     task_type = models.CharField(max_length=20, choices=TASK_TYPES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -208,6 +268,214 @@ class ProcessingTask(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
     progress_percentage = models.IntegerField(default=0)
+    status_detail = models.CharField(max_length=255, blank=True)  # mensaje de la etapa actual
+    stage_timings = models.JSONField(default=dict, blank=True)  # tiempos por etapa del pipeline
+    estimated_cost = models.FloatField(null=True, blank=True)  # segundos de audio a procesar
+    priority = models.PositiveSmallIntegerField(default=5)  # menor = antes (ver jobs.TASK_PRIORITIES)
+    # created_at + priority × MUSIC_JOB_PRIORITY_AGING: ordenar por él es ordenar por la
+    # prioridad mejorada con la espera, así que la ventana de la cola sale de la base de datos
+    queue_at = models.DateTimeField(null=True, blank=True)
+    # Concesión del worker que la ejecuta: si deja de renovarla (el proceso murió) otro la reclama
+    worker_id = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            # Tareas de un objeto por tipo y estado (comprobación de tareas activas)
+            models.Index(fields=['song', 'task_type', 'status'], name='task_song_type_status_idx'),
+            models.Index(fields=['stem', 'task_type', 'status'], name='task_stem_type_status_idx'),
+            models.Index(fields=['generated_track', 'task_type', 'status'], name='task_track_type_status_idx'),
+            # Tareas activas del usuario (dashboard) y cola de pendientes (workers)
+            models.Index(
+                fields=['user', '-created_at'],
+                name='task_user_active_idx',
+                condition=models.Q(status__in=['pending', 'in_progress']),
+            ),
+            models.Index(
+                fields=['queue_at', 'id'],
+                name='task_pending_queue_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+        # Un doble clic o dos peticiones simultáneas no pueden encolar la misma tarea dos veces
+        # (las de workers muertos las libera jobs.reclaim_expired_tasks). MySQL no admite
+        # restricciones condicionales: ahí basta el bloqueo de fila de jobs.enqueue_task
+        constraints = [
+            models.UniqueConstraint(
+                fields=[field, 'task_type'],
+                name=f'task_unique_active_{field}',
+                condition=models.Q(status__in=['pending', 'in_progress'], task_type__in=EXCLUSIVE_TASK_TYPES),
+            )
+            for field in ('song', 'stem', 'generated_track')
+        ]
     
     def __str__(self):
         return f"{self.get_task_type_display()} - {self.user.username} - {self.status}"
+
+
+class StemCacheEntry(models.Model):
+    """Resultado de una separación en stems, indexado por el hash del audio original"""
+    
+    audio_hash = models.CharField(max_length=64, unique=True)
+    # Lista de stems cacheados: [{'order': 0, 'stem_type': 'vocals', 'name': 'stem_cache/...'}]
+    files = models.JSONField(default=list)
+    size_bytes = models.BigIntegerField(default=0)
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-last_used_at']
+    
+    def __str__(self):
+        return f"Stems cacheados {self.audio_hash[:12]}"
+
+
+class MidiCacheEntry(models.Model):
+    """MIDI producido por SouniQ/Modulo2, indexado por el hash del audio del stem"""
+    
+    stem_hash = models.CharField(max_length=64, unique=True)
+    midi_data = models.BinaryField()
+    size_bytes = models.IntegerField(default=0)
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"MIDI cacheado {self.stem_hash[:12]}"
+    
+    def is_expired(self):
+        return timezone.now() > self.expires_at
+
+
+class InflightCall(models.Model):
+    """Llamada remota en curso, compartida entre procesos (ver singleflight.py)"""
+    
+    STATUS_CHOICES = [
+        ('running', 'En curso'),
+        ('completed', 'Completada'),
+        ('failed', 'Fallida'),
+    ]
+    
+    key = models.CharField(max_length=64, unique=True)  # sha256 de Space, hash de entrada y parámetros
+    space = models.CharField(max_length=200)
+    input_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    owner = models.CharField(max_length=100, blank=True)  # host:pid del proceso que hace la llamada
+    waiters = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.space} {self.input_hash[:12]} ({self.status})"
+
+
+class CacheCounter(models.Model):
+    """Contadores de aciertos y fallos de las cachés de resultados"""
+    
+    name = models.CharField(max_length=50, unique=True)
+    hits = models.BigIntegerField(default=0)
+    misses = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.hits} aciertos / {self.misses} fallos"
+    
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return round(self.hits / total, 3) if total else None
+
+
+class WaveformPeaks(models.Model):
+    """Picos (mínimo, máximo) de un audio para dibujar su forma de onda (ver waveform.py).
+    
+    `data` son `points` pares int8 intercalados: min0, max0, min1, max1...
+    """
+    
+    content_hash = models.CharField(max_length=64, unique=True)  # sha256 del audio
+    points = models.PositiveIntegerField()
+    duration = models.FloatField(null=True, blank=True)  # duración en segundos
+    data = models.BinaryField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Forma de onda {self.content_hash[:12]} ({self.points} puntos)"
+
+
+class AudioRendition(models.Model):
+    """Versión de escucha comprimida de un audio, indexada por su hash (ver previews.py)"""
+    
+    FORMAT_CHOICES = [
+        ('opus', 'Opus (OGG)'),
+        ('mp3', 'MP3'),
+    ]
+    
+    content_hash = models.CharField(max_length=64)  # sha256 del audio original
+    audio_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    bitrate = models.PositiveIntegerField()  # kbps
+    file = models.FileField(upload_to='previews/')
+    file_size = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['content_hash', 'audio_format']
+    
+    def __str__(self):
+        return f"Rendición {self.audio_format} {self.content_hash[:12]}"
+
+
+class SongSearchDocument(models.Model):
+    """Texto indexado de una canción para la búsqueda de la biblioteca (search.py).
+    
+    El índice de texto completo (FTS5 en SQLite, tsvector/GIN en PostgreSQL) se
+    mantiene desde la base de datos a partir de estas columnas.
+    """
+    
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, related_name='search_document')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    title = models.TextField(blank=True)
+    filename = models.TextField(blank=True)
+    stems = models.TextField(blank=True)
+    tracks = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Índice de búsqueda de la canción {self.song_id}"
+
+
+class UploadSession(models.Model):
+    """Subida por partes y reanudable de un audio (ver uploads.py)"""
+    
+    STATUS_CHOICES = [
+        ('active', 'En curso'),
+        ('completed', 'Completada'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    title = models.CharField(max_length=200)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)  # bytes recibidos y escritos en disco
+    run_pipeline = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    song = models.ForeignKey(Song, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Subida {self.filename} ({self.offset}/{self.total_size} bytes)"
+    
+    @property
+    def is_complete(self):
+        return self.offset >= self.total_size
@@ -0,0 +1,221 @@
+# Pipeline completo de una canción: subida → stems → MIDI → generación
+#
+# Las etapas forman un DAG: cada stem alimenta su conversión a MIDI y el MIDI del
+# stem preferido alimenta la generación con Orpheus. Cada etapa arranca en cuanto
+# existen sus entradas (la conversión del primer stem empieza mientras el resto se
+# sigue guardando), sin esperar a que termine la etapa anterior completa.
+#
+# Las llamadas a los Spaces se hacen en hilos; las escrituras en la base de datos
+# se hacen siempre desde el hilo del pipeline, a medida que llegan los resultados
+# (salvo la caché MIDI y la coordinación de single-flight, ver tasks_sync._convert_midi).
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .clients import get_space, get_space_concurrency
+from .models import GeneratedTrack, ProcessingTask, Song
+from .tasks_sync import (
+    _convert_midi,
+    _mark_generation_error,
+    _prepare_midi_conversion,
+    _report,
+    _request_generation,
+    _save_generated_audio,
+    _save_midi_file,
+    process_song_to_stems_sync,
+)
+
+logger = logging.getLogger(__name__)
+
+# Orden de preferencia del stem cuyo MIDI se usa para generar la nueva canción
+DEFAULT_GENERATION_STEMS = ['piano', 'guitar', 'other', 'vocals', 'bass', 'Clean', 'drums']
+
+
+def get_generation_stems():
+    return getattr(settings, 'MUSIC_PIPELINE_GENERATION_STEMS', DEFAULT_GENERATION_STEMS)
+
+
+class Pipeline:
+    """Ejecución del pipeline de una canción con registro de tiempos por etapa"""
+
+    def __init__(self, song, progress=None, task_id=None, generate=True):
+        self.song = song
+        self.progress = progress
+        self.task_id = task_id
+        self.generate = generate
+
+        self.timings = {}
+        self._started = None
+        self._stems_done = False
+        self._stems = {}          # stem_type -> Stem
+        self._midi = {}           # stem_type -> MidiFile completado
+        self._midi_failed = set()
+        self._futures = {}        # Future -> (etapa, contexto)
+        self._generated_track = None
+        self._executor = None
+
+    # Registro de etapas
+
+    def _start_stage(self, name):
+        self.timings[name] = {
+            'start': round(time.monotonic() - self._started, 3),
+            'status': 'running',
+        }
+        self._save_timings()
+
+    def _finish_stage(self, name, status='completed'):
+        stage = self.timings[name]
+        elapsed = time.monotonic() - self._started - stage['start']
+        stage['duration'] = round(elapsed, 3)
+        stage['status'] = status
+        self._save_timings()
+
+    def _save_timings(self):
+        if self.task_id is not None:
+            ProcessingTask.objects.filter(pk=self.task_id).update(stage_timings=self.timings)
+
+    def _report_progress(self, detail):
+        # 0-30 %: separación; 30-100 %: MIDI y generación según las etapas terminadas
+        expected = max(len(self._stems), 1) + (1 if self.generate else 0)
+        finished = len(self._midi) + len(self._midi_failed)
+        if self._generated_track is not None and self._generated_track.status in ('completed', 'error'):
+            finished += 1
+        _report(self.progress, 30 + 70 * finished // expected, detail)
+
+    # Etapas
+
+    def _on_stem(self, stem):
+        """Un stem guardado: lanzar su conversión a MIDI (o resolverla desde la caché)"""
+        self._stems[stem.stem_type] = stem
+        name = f'midi:{stem.stem_type}'
+        self._start_stage(name)
+
+        midi_file, midi_content = _prepare_midi_conversion(stem)
+        if midi_content is not None:
+            _save_midi_file(midi_file, stem, midi_content)
+            self._midi[stem.stem_type] = midi_file
+            self._finish_stage(name, 'cached')
+            return
+
+        future = self._executor.submit(_convert_midi, get_space('midi'), stem)
+        self._futures[future] = ('midi', (stem, midi_file))
+
+    def _run_stems(self):
+        self._start_stage('stems')
+        stems = list(self.song.stems.all())
+        if self.song.status == 'stems_completed' and stems:
+            # La canción ya tiene stems: el pipeline arranca desde la conversión a MIDI
+            for stem in stems:
+                self._on_stem(stem)
+            self._finish_stage('stems', 'skipped')
+        else:
+            def stems_progress(percentage, detail=''):
+                _report(self.progress, percentage * 30 // 100, detail)
+
+            process_song_to_stems_sync(self.song.id, progress=stems_progress, on_stem=self._on_stem)
+            self._finish_stage('stems')
+        self._stems_done = True
+
+    def _on_midi_result(self, future, stem, midi_file):
+        name = f'midi:{stem.stem_type}'
+        try:
+            midi_content = future.result()
+            _save_midi_file(midi_file, stem, midi_content)
+            self._midi[stem.stem_type] = midi_file
+            self._finish_stage(name)
+        except Exception as e:
+            logger.error(f"❌ [pipeline] Error convirtiendo stem {stem.id} a MIDI: {e}")
+            midi_file.status = 'error'
+            midi_file.error_message = str(e)
+            midi_file.save()
+            self._midi_failed.add(stem.stem_type)
+            self._finish_stage(name, 'error')
+        self._report_progress(f'MIDI de {stem.get_stem_type_display()} listo')
+
+    def _generation_source(self):
+        """Stem preferido para generar; None mientras su MIDI no esté listo"""
+        candidates = [stem_type for stem_type in get_generation_stems() if stem_type in self._stems]
+        candidates += [stem_type for stem_type in self._stems if stem_type not in candidates]
+        for stem_type in candidates:
+            if stem_type in self._midi_failed:
+                continue
+            return stem_type if stem_type in self._midi else None
+        return None
+
+    def _maybe_start_generation(self):
+        if not self.generate or not self._stems_done or self._generated_track is not None:
+            return
+        stem_type = self._generation_source()
+        if stem_type is None:
+            return
+
+        midi_file = self._midi[stem_type]
+        self._generated_track = GeneratedTrack.objects.create(
+            user=self.song.user,
+            midi_file=midi_file,
+            title=f"{self.song.title} ({midi_file.stem.get_stem_type_display()})",
+            status='processing',
+        )
+        self._start_stage('generation')
+        future = self._executor.submit(_request_generation, get_space('orpheus'), self._generated_track)
+        self._futures[future] = ('generation', self._generated_track)
+
+    def _on_generation_result(self, future, generated_track):
+        try:
+            _save_generated_audio(generated_track, future.result())
+            self._finish_stage('generation')
+        except Exception as e:
+            logger.error(f"❌ [pipeline] Error generando nueva canción: {e}")
+            _mark_generation_error(generated_track.id, e)
+            generated_track.status = 'error'
+            self._finish_stage('generation', 'error')
+        self._report_progress('Generación terminada')
+
+    def run(self):
+        self._started = time.monotonic()
+        workers = get_space_concurrency(get_space('midi')) + get_space_concurrency(get_space('orpheus'))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pipeline') as executor:
+            self._executor = executor
+            self._run_stems()
+            self._report_progress('Convirtiendo stems a MIDI...')
+            self._maybe_start_generation()
+
+            while self._futures:
+                done, _ = wait(list(self._futures), return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, context = self._futures.pop(future)
+                    if stage == 'midi':
+                        self._on_midi_result(future, *context)
+                    else:
+                        self._on_generation_result(future, context)
+                self._maybe_start_generation()
+
+        self.timings['total'] = {'start': 0, 'duration': round(time.monotonic() - self._started, 3), 'status': 'completed'}
+        self._save_timings()
+
+        if not self._midi:
+            raise Exception(f"No se pudo convertir ningún stem de la canción {self.song.title}")
+
+        generation_ok = not self.generate or (
+            self._generated_track is not None and self._generated_track.status == 'completed'
+        )
+        logger.info(
+            f"🏁 Pipeline de '{self.song.title}' terminado en {self.timings['total']['duration']}s: "
+            f"{len(self._midi)} MIDI, {len(self._midi_failed)} errores"
+        )
+        return {
+            'status': 'success' if generation_ok and not self._midi_failed else 'partial',
+            'midi_converted': len(self._midi),
+            'midi_failed': len(self._midi_failed),
+            'generated_track': self._generated_track.id if self._generated_track else None,
+            'stage_timings': self.timings,
+        }
+
+
+def run_full_pipeline(song_id, progress=None, task_id=None, generate=True):
+    """Ejecutar el pipeline completo de una canción"""
+    song = Song.objects.select_related('user').get(id=song_id)
+    return Pipeline(song, progress=progress, task_id=task_id, generate=generate).run()
@@ -0,0 +1,253 @@
+# Versiones de escucha comprimidas (Opus/OGG o MP3) de stems y audios generados
+#
+# Los stems y las versiones generadas se guardan en WAV sin pérdida; los reproductores
+# usan en su lugar una rendición de bajo bitrate y las descargas siguen sirviendo el
+# original. Las rendiciones se guardan una vez por sha256 del audio y formato, así que
+# los stems reutilizados desde la caché o las canciones duplicadas las comparten.
+#
+# Con MUSIC_PREVIEW_MODE = 'eager' una tarea preview_generation las crea en cuanto hay
+# audio nuevo; con 'lazy' la tarea se encola la primera vez que se piden y, mientras
+# tanto, se sirve el original (ffmpeg nunca corre en la petición web). Cada conversión es
+# un proceso de ffmpeg y se lanzan hasta MUSIC_PREVIEW_WORKERS a la vez. El tamaño total
+# se acota expulsando las rendiciones usadas hace más tiempo (LRU).
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .fileio import local_path, sha256_field_file, store_local_file
+from .models import AudioRendition, GeneratedTrack, GeneratedVersion, Stem
+from .waveform import audio_field
+
+logger = logging.getLogger(__name__)
+
+# formato -> (extensión, tipo MIME, códec de ffmpeg)
+FORMATS = {
+    'opus': ('ogg', 'audio/ogg', 'libopus'),
+    'mp3': ('mp3', 'audio/mpeg', 'libmp3lame'),
+}
+TRANSCODE_TIMEOUT = 600
+
+
+class PreviewError(Exception):
+    pass
+
+
+def get_format():
+    return getattr(settings, 'MUSIC_PREVIEW_FORMAT', 'opus')
+
+
+def get_bitrate():
+    return getattr(settings, 'MUSIC_PREVIEW_BITRATE', 64)  # kbps
+
+
+def get_mode():
+    return getattr(settings, 'MUSIC_PREVIEW_MODE', 'eager')
+
+
+def get_workers():
+    return getattr(settings, 'MUSIC_PREVIEW_WORKERS', 2)
+
+
+def get_ffmpeg():
+    return shutil.which(getattr(settings, 'MUSIC_FFMPEG_BINARY', 'ffmpeg'))
+
+
+def is_available():
+    return get_ffmpeg() is not None
+
+
+def transcode(source_path, output_path, fmt, bitrate):
+    """Convertir un fichero local con ffmpeg; devuelve el tamaño del resultado"""
+    ffmpeg = get_ffmpeg()
+    if ffmpeg is None:
+        raise PreviewError('ffmpeg no está disponible')
+    _, _, codec = FORMATS[fmt]
+    command = [
+        ffmpeg, '-nostdin', '-v', 'error', '-y', '-i', source_path,
+        '-vn', '-map_metadata', '-1', '-c:a', codec, '-b:a', f'{bitrate}k',
+    ]
+    if fmt == 'opus':
+        command += ['-f', 'ogg']
+    command.append(output_path)
+
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise PreviewError(f'ffmpeg superó {TRANSCODE_TIMEOUT}s convirtiendo {os.path.basename(source_path)}')
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors='replace').strip()
+        raise PreviewError(f'ffmpeg falló: {stderr[:200]}')
+    return os.path.getsize(output_path)
+
+
+def get_rendition(content_hash, fmt=None):
+    if not content_hash:
+        return None
+    return AudioRendition.objects.filter(content_hash=content_hash, audio_format=fmt or get_format()).first()
+
+
+def touch(rendition):
+    AudioRendition.objects.filter(pk=rendition.pk).update(last_used_at=timezone.now())
+
+
+def _content_hash(obj):
+    field_file = audio_field(obj)
+    if not obj.content_hash:
+        obj.content_hash = sha256_field_file(field_file)
+        obj.save(update_fields=['content_hash'])
+    return obj.content_hash
+
+
+def _render(field_file, content_hash, fmt, bitrate, temp_dir):
+    """Convertir el audio de un FileField a un fichero de `temp_dir` (sin tocar la base de datos)"""
+    extension, _, _ = FORMATS[fmt]
+    output_path = os.path.join(temp_dir, f'{content_hash}.{extension}')
+    with local_path(field_file) as source_path:
+        size = transcode(source_path, output_path, fmt, bitrate)
+    return output_path, size
+
+
+def _save_rendition(content_hash, fmt, bitrate, output_path, size):
+    """Mover la conversión al storage y registrarla en la caché de rendiciones"""
+    extension, _, _ = FORMATS[fmt]
+    name = store_local_file(f'previews/{content_hash[:2]}/{content_hash}.{extension}', output_path, move=True)
+    try:
+        with transaction.atomic():
+            # Una fila cuyo fichero desapareció del storage se sustituye
+            AudioRendition.objects.filter(content_hash=content_hash, audio_format=fmt).delete()
+            rendition = AudioRendition.objects.create(
+                content_hash=content_hash,
+                audio_format=fmt,
+                bitrate=bitrate,
+                file=name,
+                file_size=size,
+            )
+    except IntegrityError:
+        # Otro proceso convirtió el mismo audio a la vez: se conserva su fichero
+        rendition = AudioRendition.objects.get(content_hash=content_hash, audio_format=fmt)
+        if rendition.file.name != name:
+            default_storage.delete(name)
+    logger.info(f"🎧 Rendición {fmt} {bitrate}kbps de {content_hash[:12]}: {size // 1024} KB")
+    return rendition
+
+
+def create_rendition(field_file, content_hash, fmt=None):
+    """Rendición del audio con ese hash, convirtiéndolo si aún no existe"""
+    fmt = fmt or get_format()
+    rendition = get_rendition(content_hash, fmt)
+    if rendition is not None and rendition.file.storage.exists(rendition.file.name):
+        return rendition
+
+    bitrate = get_bitrate()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path, size = _render(field_file, content_hash, fmt, bitrate, temp_dir)
+        rendition = _save_rendition(content_hash, fmt, bitrate, output_path, size)
+    evict()
+    return rendition
+
+
+def ensure_preview(obj, fmt=None):
+    """Rendición del audio de `obj`; None si no tiene audio"""
+    field_file = audio_field(obj)
+    if not field_file or not field_file.storage.exists(field_file.name):
+        return None
+    return create_rendition(field_file, _content_hash(obj), fmt)
+
+
+def song_preview_objects(song_id):
+    """Stems, tracks generados y versiones con audio de una canción"""
+    objects = list(Stem.objects.filter(song_id=song_id).exclude(file=''))
+    objects += GeneratedTrack.objects.filter(midi_file__stem__song_id=song_id).exclude(generated_file='')
+    objects += GeneratedVersion.objects.filter(track__midi_file__stem__song_id=song_id).exclude(file='')
+    return objects
+
+
+def generate_song_previews(song_id, progress=None):
+    """Crear las rendiciones que falten de los stems y audios generados de una canción"""
+    fmt = get_format()
+    objects = song_preview_objects(song_id)
+    for obj in objects:
+        _content_hash(obj)
+    existing = set(
+        AudioRendition.objects.filter(
+            content_hash__in=[obj.content_hash for obj in objects], audio_format=fmt
+        ).values_list('content_hash', flat=True)
+    )
+
+    # Un audio por hash: los duplicados comparten rendición
+    pending = {}
+    for obj in objects:
+        if obj.content_hash not in existing:
+            pending.setdefault(obj.content_hash, obj)
+    if not pending:
+        return {'created': 0, 'failed': 0, 'total': len(objects)}
+
+    created, failed = 0, 0
+    bitrate = get_bitrate()
+    # Cada conversión es un proceso de ffmpeg: los hilos solo esperan a que termine y
+    # el guardado (storage y base de datos) se hace desde este hilo
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            ThreadPoolExecutor(max_workers=get_workers(), thread_name_prefix='preview') as executor:
+        futures = {
+            executor.submit(_render, audio_field(obj), content_hash, fmt, bitrate, temp_dir): (content_hash, obj)
+            for content_hash, obj in pending.items()
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            content_hash, obj = futures[future]
+            try:
+                output_path, size = future.result()
+                _save_rendition(content_hash, fmt, bitrate, output_path, size)
+                created += 1
+            except (PreviewError, OSError) as e:
+                logger.warning(f"⚠️ No se pudo crear la rendición de {obj}: {e}")
+                failed += 1
+            if progress is not None:
+                progress(int(i * 100 / len(futures)), f'Versiones de escucha: {i} de {len(futures)}')
+
+    evict()
+    return {'created': created, 'failed': failed, 'total': len(objects)}
+
+
+def _referenced_hashes(content_hashes):
+    """Hashes de la lista que aún usa algún stem, track o versión (una consulta por modelo)"""
+    referenced = set()
+    for model in (Stem, GeneratedTrack, GeneratedVersion):
+        referenced.update(
+            model.objects.filter(content_hash__in=content_hashes).order_by().values_list('content_hash', flat=True)
+        )
+    return referenced
+
+
+def evict(max_bytes=None):
+    """Expulsar rendiciones LRU hasta quedar por debajo del límite (primero las huérfanas)"""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'MUSIC_PREVIEW_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+
+    total = sum(AudioRendition.objects.values_list('file_size', flat=True))
+    if total <= max_bytes:
+        return 0
+
+    evicted = 0
+    renditions = list(AudioRendition.objects.order_by('last_used_at'))
+    # Las que ya no referencia ningún audio se expulsan antes que las de uso menos reciente
+    referenced = _referenced_hashes({rendition.content_hash for rendition in renditions})
+    renditions.sort(key=lambda rendition: rendition.content_hash in referenced)
+    for rendition in renditions:
+        if total <= max_bytes:
+            break
+        rendition.file.storage.delete(rendition.file.name)
+        total -= rendition.file_size
+        rendition.delete()
+        evicted += 1
+
+    if evicted:
+        logger.info(f"🧹 Rendiciones de escucha: {evicted} expulsadas")
+    return evicted
@@ -0,0 +1,102 @@
+# Tiempo por categoría dentro del pipeline (lo usa `python manage.py benchmark_pipeline`)
+#
+# El código del pipeline marca sus tramos con `timed('remote')` (llamadas a los Spaces),
+# `timed('storage')` (escrituras en el storage) y `timed('temp_io')` (copias a temporales
+# y lectura de ficheros para hashearlos); `record()` añade el tiempo de las consultas a
+# la base de datos ('db'). Fuera de `record()` no se mide nada y el coste es una lectura
+# de una variable del hilo.
+#
+# La cuenta es exclusiva: si un tramo contiene otro (p. ej. el guardado de un FileField
+# hace una consulta), el tiempo del interior solo cuenta en su categoría. Los pools de
+# hilos internos llevan el acumulador a sus hilos con `bind`; sus tiempos se suman, así
+# que en las etapas con trabajo en paralelo la suma puede superar el tiempo real.
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import connection
+
+CATEGORIES = ('temp_io', 'remote', 'storage', 'db')
+
+_local = threading.local()
+
+
+class Recorder:
+    """Segundos acumulados por categoría (compartible entre hilos)"""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(CATEGORIES, 0.0)
+        self._lock = threading.Lock()
+
+    def add(self, category, seconds):
+        with self._lock:
+            self.totals[category] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.totals)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        with timed('db'):
+            return execute(sql, params, many, context)
+
+
+def current():
+    return getattr(_local, 'recorder', None)
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def timed(category):
+    """Acumular en `category` el tiempo del bloque (sin el de los tramos anidados)"""
+    recorder = current()
+    if recorder is None:
+        yield
+        return
+
+    stack = _stack()
+    now = time.perf_counter()
+    if stack:
+        outer = stack[-1]
+        recorder.add(outer[0], now - outer[1])
+    stack.append([category, now])
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        _, started = stack.pop()
+        recorder.add(category, now - started)
+        if stack:
+            stack[-1][1] = now
+
+
+@contextmanager
+def record(recorder=None):
+    """Medir en `recorder` (o en uno nuevo) lo que se ejecute en este hilo dentro del bloque"""
+    recorder = recorder or Recorder()
+    previous = current()
+    _local.recorder = recorder
+    try:
+        with connection.execute_wrapper(recorder.db_wrapper):
+            yield recorder
+    finally:
+        _local.recorder = previous
+
+
+def bind(func):
+    """`func` acumulando en el Recorder de este hilo aunque se ejecute en otro (pools de hilos)"""
+    recorder = current()
+    if recorder is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with record(recorder):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,134 @@
+# Progreso de las tareas para el navegador: un stream SSE por página
+# (/music/api/tasks/events/?ids=...) y, si se corta, el sondeo agrupado
+# (/music/api/tasks/status/?ids=...)
+#
+# Los workers corren en otros procesos, así que avisan de cada cambio escribiendo una
+# marca por tarea en la caché de Django (compartida entre procesos, ver CACHES). El
+# stream solo comprueba esas marcas cada MUSIC_SSE_CHECK_INTERVAL segundos y relee las
+# filas de ProcessingTask cuando alguna cambia (o cada MUSIC_SSE_KEEPALIVE segundos, por
+# si la caché no es compartida). Cada stream dura como máximo MUSIC_SSE_MAX_DURATION
+# segundos para no retener un hilo del servidor; el navegador abre entonces otro.
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ProcessingTask
+
+logger = logging.getLogger(__name__)
+
+STATE_FIELDS = ('id', 'celery_task_id', 'status', 'progress_percentage', 'status_detail', 'error_message',
+                'completed_at', 'task_type')
+MAX_TASKS = 50  # tareas por petición
+FINAL_STATUSES = ('completed', 'failed')
+QUEUE_KEY = 'task_progress:queue'  # cambia cuando se mueve la cola (posiciones de las pendientes)
+VERSION_TTL = 3600
+
+
+def _version_key(task_id):
+    return f'task_progress:{task_id}'
+
+
+def publish(*task_ids, queue=False):
+    """Avisar a los streams abiertos, en cualquier proceso, de que esas tareas han cambiado.
+
+    Con `queue=True` avisa también de que la cola se ha movido.
+    """
+    keys = [_version_key(task_id) for task_id in task_ids if task_id]
+    if queue:
+        keys.append(QUEUE_KEY)
+    if not keys:
+        return
+    token = uuid.uuid4().hex
+    try:
+        cache.set_many({key: token for key in keys}, timeout=VERSION_TTL)
+    except Exception as e:
+        # El progreso ya está en la base de datos: el stream lo verá en la relectura periódica
+        logger.warning(f"⚠️ No se pudo publicar el progreso de {', '.join(task_ids) or 'la cola'}: {e}")
+
+
+def get_states(user, task_ids):
+    """Estado de las tareas del usuario con el mismo formato que la API de task_status.
+
+    Devuelve {celery_task_id: estado}; las que no existen o son de otro usuario no aparecen.
+    """
+    rows = list(
+        ProcessingTask.objects.filter(user=user, celery_task_id__in=list(task_ids)[:MAX_TASKS])
+        .values(*STATE_FIELDS)
+    )
+    pending = [row['id'] for row in rows if row['status'] == 'pending']
+    positions = {}
+    if pending:
+        from .jobs import queue_positions
+        positions = queue_positions(pending)
+
+    states = {}
+    for row in rows:
+        detailed_status = row['status_detail'] or None
+        if positions.get(row['id']):
+            detailed_status = f"En cola (posición {positions[row['id']]})"
+        states[row['celery_task_id']] = {
+            'status': row['status'],
+            'progress': row['progress_percentage'],
+            'error_message': row['error_message'],
+            'completed_at': row['completed_at'].isoformat() if row['completed_at'] else None,
+            'detailed_status': detailed_status,
+            'task_type': row['task_type'],
+        }
+    return states
+
+
+def _event(data, event='progress'):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_events(user, task_ids):
+    """Generador de eventos SSE con los cambios de estado de las tareas del usuario.
+
+    Emite 'progress' con las tareas que han cambiado, 'end' cuando todas han terminado
+    (o no existe ninguna) y 'timeout' al vencer la duración máxima.
+    """
+    check_interval = getattr(settings, 'MUSIC_SSE_CHECK_INTERVAL', 1.0)
+    keepalive = getattr(settings, 'MUSIC_SSE_KEEPALIVE', 15)
+    deadline = time.monotonic() + getattr(settings, 'MUSIC_SSE_MAX_DURATION', 300)
+
+    task_ids = list(task_ids)[:MAX_TASKS]
+    keys = [QUEUE_KEY]
+    last_states = {}
+    versions = None
+    refreshed_at = sent_at = time.monotonic()
+
+    while True:
+        now = time.monotonic()
+        current = cache.get_many(keys)
+        if not any(state['status'] == 'pending' for state in last_states.values()):
+            # Sin tareas en cola los movimientos de la cola no les afectan
+            current.pop(QUEUE_KEY, None)
+
+        if current != versions or now - refreshed_at >= keepalive:
+            versions = current
+            refreshed_at = now
+            states = get_states(user, task_ids)
+            # Solo se vigilan las marcas de las tareas que existen y son del usuario
+            keys = [_version_key(task_id) for task_id in states] + [QUEUE_KEY]
+            changed = {task_id: state for task_id, state in states.items() if last_states.get(task_id) != state}
+            if changed:
+                yield _event({'tasks': changed})
+                last_states.update(changed)
+                sent_at = now
+            if all(state['status'] in FINAL_STATUSES for state in states.values()):
+                yield _event({}, event='end')
+                return
+
+        if now - sent_at >= keepalive:
+            yield ": keepalive\n\n"
+            sent_at = now
+
+        remaining = deadline - now
+        if remaining <= 0:
+            yield _event({}, event='timeout')
+            return
+        time.sleep(min(check_interval, remaining))
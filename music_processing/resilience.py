@@ -0,0 +1,264 @@
+# Reintentos, backoff y circuit breaker para las llamadas a los Spaces de Hugging Face
+#
+# Todas las llamadas a Modulo1, Modulo2 y Orpheus pasan por `call` (desde el pool de
+# clientes). Cada error se clasifica:
+#   - 'unavailable': el Space no responde (timeouts, conexión, 5xx, config ilegible)
+#   - 'throttled': responde pero rechaza por cuota, cola llena o 429
+#   - 'permanent': la petición en sí es errónea; reintentarla no sirve
+# Los dos primeros se reintentan hasta MUSIC_HF_MAX_RETRIES veces con backoff
+# exponencial y jitter. Tras MUSIC_HF_CIRCUIT_THRESHOLD fallos 'unavailable' seguidos
+# el circuito del Space se abre y durante MUSIC_HF_CIRCUIT_RESET segundos las llamadas
+# fallan al instante con CircuitOpen; pasado ese tiempo una sola llamada de prueba
+# decide si se cierra o vuelve a abrirse.
+#
+# El estado del circuito y los contadores viven en la caché de Django, compartida entre
+# procesos (DatabaseCache por defecto, o Redis) para que todos vean el mismo estado. Con
+# una caché en memoria de cada proceso (LocMemCache) un circuito abierto en un worker no
+# protegería a los demás, así que el circuito se desactiva y solo quedan los reintentos.
+import json
+import logging
+import random
+import re
+import time
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from gradio_client.exceptions import AuthenticationError
+
+logger = logging.getLogger(__name__)
+
+UNAVAILABLE = 'unavailable'
+THROTTLED = 'throttled'
+PERMANENT = 'permanent'
+
+METRICS = ('calls', 'attempts', 'retries', 'successes', UNAVAILABLE, THROTTLED, PERMANENT, 'rejected')
+
+THROTTLED_MARKERS = ('quota', 'exceeded', 'queue is full', 'too many requests', 'rate limit')
+UNAVAILABLE_MARKERS = (
+    'timed out', 'timeout', 'connection', 'bad gateway', 'service unavailable', 'gateway time',
+    'could not fetch config', 'expecting value', 'space is sleeping', 'runtime error', 'aborted',
+)
+RETRY_IN_RE = re.compile(r'retry in (\d+):(\d{1,2}):(\d{1,2})')
+
+# Backends de caché que no se comparten entre procesos
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class CircuitOpen(Exception):
+    """El Space está marcado como caído: la llamada no se intenta"""
+
+    def __init__(self, space, retry_in):
+        super().__init__(f'{space} no está disponible; se volverá a probar en {int(retry_in) + 1}s')
+        self.space = space
+        self.retry_in = retry_in
+
+
+def get_max_retries():
+    return getattr(settings, 'MUSIC_HF_MAX_RETRIES', 3)
+
+
+def get_backoff_base():
+    return getattr(settings, 'MUSIC_HF_BACKOFF_BASE', 2.0)
+
+
+def get_backoff_max():
+    return getattr(settings, 'MUSIC_HF_BACKOFF_MAX', 60.0)
+
+
+def get_circuit_threshold():
+    return getattr(settings, 'MUSIC_HF_CIRCUIT_THRESHOLD', 5)
+
+
+def get_circuit_reset():
+    return getattr(settings, 'MUSIC_HF_CIRCUIT_RESET', 120)
+
+
+def circuit_enabled():
+    """El circuito solo funciona con una caché compartida entre procesos"""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+_warned_local_cache = False
+
+
+def _warn_local_cache():
+    global _warned_local_cache
+    if not _warned_local_cache:
+        _warned_local_cache = True
+        logger.warning(
+            f"⚠️ La caché ({settings.CACHES['default']['BACKEND']}) no se comparte entre procesos: "
+            f"circuit breaker desactivado, solo se aplican los reintentos"
+        )
+
+
+def classify(error):
+    """'unavailable', 'throttled' o 'permanent' según el error de una llamada"""
+    if isinstance(error, CircuitOpen):
+        return UNAVAILABLE
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        if status == 429:
+            return THROTTLED
+        return UNAVAILABLE if status >= 500 else PERMANENT
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError, json.JSONDecodeError)):
+        return UNAVAILABLE
+    if isinstance(error, AuthenticationError):
+        return PERMANENT
+
+    message = str(error).lower()
+    if any(marker in message for marker in THROTTLED_MARKERS):
+        return THROTTLED
+    if any(marker in message for marker in UNAVAILABLE_MARKERS):
+        return UNAVAILABLE
+    return PERMANENT
+
+
+def retry_hint(error):
+    """Segundos que pide esperar el mensaje de error (p. ej. 'Retry in 0:05:00' de ZeroGPU)"""
+    match = RETRY_IN_RE.search(str(error).lower())
+    if match is None:
+        return None
+    hours, minutes, seconds = (int(part) for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def backoff_delay(attempt, base=None, maximum=None):
+    """Espera antes del reintento `attempt` (0, 1, ...): exponencial con jitter completo"""
+    base = get_backoff_base() if base is None else base
+    maximum = get_backoff_max() if maximum is None else maximum
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+def _key(space, name):
+    return f'hf_resilience:{space}:{name}'
+
+
+def _incr(space, name):
+    key = _key(space, name)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # La clave expiró o se borró entre add e incr
+        cache.set(key, 1, timeout=None)
+
+
+class CircuitBreaker:
+    """Circuito por Space: cerrado → abierto tras varios fallos → semiabierto tras la espera"""
+
+    def state(self, space):
+        """'closed', 'open', 'half_open' o 'disabled', y segundos hasta la próxima prueba si está abierto"""
+        if not circuit_enabled():
+            return 'disabled', 0
+        opened_until = cache.get(_key(space, 'opened_until'))
+        if opened_until is None:
+            return 'closed', 0
+        remaining = opened_until - time.time()
+        if remaining > 0:
+            return 'open', remaining
+        return 'half_open', 0
+
+    def before_call(self, space):
+        """Comprobar que se puede llamar al Space; devuelve True si es la llamada de prueba"""
+        state, remaining = self.state(space)
+        if state == 'disabled':
+            _warn_local_cache()
+            return False
+        if state == 'closed':
+            return False
+        if state == 'half_open' and cache.add(_key(space, 'probe'), True, timeout=get_circuit_reset()):
+            logger.info(f"🔌 Probando de nuevo {space} tras abrirse el circuito")
+            return True
+        _incr(space, 'rejected')
+        raise CircuitOpen(space, remaining)
+
+    def record_success(self, space):
+        if cache.get(_key(space, 'opened_until')) is not None:
+            logger.info(f"✅ {space} vuelve a responder: circuito cerrado")
+        cache.delete_many([_key(space, 'failures'), _key(space, 'opened_until'), _key(space, 'probe')])
+
+    def record_failure(self, space, probing=False):
+        """Anotar una caída del Space; devuelve True si con ella se abre el circuito"""
+        if not circuit_enabled():
+            return False
+        _incr(space, 'failures')
+        failures = cache.get(_key(space, 'failures'), 0)
+        if probing or failures >= get_circuit_threshold():
+            reset = get_circuit_reset()
+            cache.set(_key(space, 'opened_until'), time.time() + reset, timeout=None)
+            cache.delete(_key(space, 'probe'))
+            logger.warning(f"🚫 {space}: {failures} fallos seguidos, circuito abierto durante {reset}s")
+            return True
+        return False
+
+    def release_probe(self, space):
+        cache.delete(_key(space, 'probe'))
+
+    def reset(self, space):
+        cache.delete_many([_key(space, name) for name in ('failures', 'opened_until', 'probe')])
+
+
+breaker = CircuitBreaker()
+
+
+def call(space, func, *args, **kwargs):
+    """Ejecutar `func(*args, **kwargs)` contra un Space con reintentos y circuit breaker"""
+    retries = get_max_retries()
+    _incr(space, 'calls')
+    for attempt in range(retries + 1):
+        probing = breaker.before_call(space)
+        _incr(space, 'attempts')
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            kind = classify(e)
+            _incr(space, kind)
+            opened = False
+            if kind == UNAVAILABLE:
+                opened = breaker.record_failure(space, probing)
+            elif kind == PERMANENT:
+                # El Space respondió: el error es de la petición, no de su disponibilidad
+                breaker.record_success(space)
+            elif probing:
+                breaker.release_probe(space)
+
+            if kind == PERMANENT or opened or attempt == retries:
+                raise
+            delay = backoff_delay(attempt)
+            if kind == THROTTLED:
+                hint = retry_hint(e)
+                if hint is not None:
+                    if hint > get_backoff_max():
+                        # La cuota tarda más en recuperarse de lo que se está dispuesto a esperar
+                        raise
+                    delay = max(delay, hint)
+            _incr(space, 'retries')
+            logger.warning(
+                f"🔁 {space}: intento {attempt + 1} de {retries + 1} fallido ({kind}: {e}); "
+                f"reintento en {delay:.1f}s"
+            )
+            time.sleep(delay)
+            continue
+
+        breaker.record_success(space)
+        _incr(space, 'successes')
+        return result
+
+
+def get_metrics(space):
+    """Contadores de llamadas y estado del circuito de un Space"""
+    values = cache.get_many([_key(space, name) for name in METRICS + ('failures',)])
+    metrics = {name: values.get(_key(space, name), 0) for name in METRICS}
+    state, remaining = breaker.state(space)
+    metrics['consecutive_failures'] = values.get(_key(space, 'failures'), 0)
+    metrics['circuit'] = state
+    metrics['retry_in'] = int(remaining)
+    return metrics
+
+
+def reset_metrics(space):
+    cache.delete_many([_key(space, name) for name in METRICS])
@@ -0,0 +1,170 @@
+# Búsqueda de texto completo en la biblioteca del usuario
+#
+# Cada canción tiene un SongSearchDocument con su título, nombre de archivo, tipos de
+# stem y títulos de los tracks generados. Sobre esa tabla la migración 0013 crea:
+#   - SQLite: una tabla virtual FTS5 de contenido externo, sincronizada por triggers
+#   - PostgreSQL: una columna tsvector generada, con pesos por campo, y un índice GIN
+# En otros motores (o con un SQLite sin FTS5) se recurre a icontains sobre los documentos.
+#
+# Cada palabra de la búsqueda se busca por prefijo y deben aparecer todas; los
+# resultados se ordenan con bm25 (SQLite) o ts_rank (PostgreSQL). Las señales de
+# signals.py reconstruyen el documento al confirmarse la transacción.
+import os
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import GeneratedTrack, Song, SongSearchDocument, Stem
+
+DOCUMENT_TABLE = 'music_processing_songsearchdocument'
+FTS_TABLE = 'music_processing_songsearch_fts'
+DOCUMENT_FIELDS = ('title', 'filename', 'stems', 'tracks')
+# Peso de cada campo en bm25, en el orden de DOCUMENT_FIELDS
+FTS_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+MAX_TERMS = 8
+
+_fts_tables = {}  # nombre de la base de datos -> existe la tabla FTS5
+
+
+def normalize(text):
+    """Minúsculas, sin acentos y con cualquier separador convertido en espacio"""
+    text = unicodedata.normalize('NFKD', text or '').lower()
+    text = ''.join(c if c.isalnum() else ' ' for c in text if not unicodedata.combining(c))
+    return ' '.join(text.split())
+
+
+def get_terms(query):
+    return normalize(query).split()[:MAX_TERMS]
+
+
+def get_backend():
+    """'sqlite', 'postgresql' o None si no hay índice de texto completo"""
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        name = connection.settings_dict['NAME']
+        if name not in _fts_tables:
+            _fts_tables[name] = FTS_TABLE in connection.introspection.table_names()
+        if _fts_tables[name]:
+            return 'sqlite'
+    return None
+
+
+def _match_sql(backend, terms):
+    """Condición de búsqueda por prefijo sobre el documento `d` y su parámetro"""
+    if backend == 'sqlite':
+        # Los términos solo contienen caracteres alfanuméricos: no hace falta escapar
+        return f'{FTS_TABLE} MATCH %s', ' '.join(f'"{term}"*' for term in terms)
+    return "d.search_vector @@ to_tsquery('simple', %s)", ' & '.join(f'{term}:*' for term in terms)
+
+
+def _from_sql(backend):
+    if backend == 'sqlite':
+        # CROSS JOIN fija el orden: primero las coincidencias del índice FTS5 y luego
+        # su documento por clave primaria, en vez de recorrer todos los del usuario
+        return f'{FTS_TABLE} CROSS JOIN {DOCUMENT_TABLE} d ON d.id = {FTS_TABLE}.rowid'
+    return f'{DOCUMENT_TABLE} d'
+
+
+def filter_songs(queryset, user, query):
+    """Canciones de `queryset` que coinciden con la búsqueda (sin cambiar el orden)"""
+    terms = get_terms(query)
+    if not terms:
+        return queryset.none()
+
+    backend = get_backend()
+    if backend is None:
+        for term in terms:
+            condition = Q()
+            for field in DOCUMENT_FIELDS:
+                condition |= Q(**{f'search_document__{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    match, param = _match_sql(backend, terms)
+    matching = RawSQL(
+        f'SELECT d.song_id FROM {_from_sql(backend)} WHERE {match} AND d.user_id = %s',
+        (param, user.pk),
+    )
+    return queryset.filter(id__in=matching)
+
+
+def search_songs(user, query, limit=20):
+    """Las `limit` canciones más relevantes, con la puntuación en `song.search_rank`"""
+    terms = get_terms(query)
+    if not terms:
+        return []
+
+    backend = get_backend()
+    if backend is None:
+        songs = list(filter_songs(Song.objects.filter(user=user), user, query)[:limit])
+        for song in songs:
+            song.search_rank = None
+        return songs
+
+    match, param = _match_sql(backend, terms)
+    if backend == 'sqlite':
+        # bm25 devuelve valores negativos: cuanto menor, más relevante
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        rank = f'-bm25({FTS_TABLE}, {weights})'
+    else:
+        rank = "ts_rank(d.search_vector, to_tsquery('simple', %s))"
+
+    sql = (
+        f'SELECT d.song_id, {rank} AS rank FROM {_from_sql(backend)} '
+        f'WHERE {match} AND d.user_id = %s ORDER BY rank DESC, d.song_id DESC LIMIT %s'
+    )
+    params = [param, user.pk, limit] if backend == 'sqlite' else [param, param, user.pk, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ranked = cursor.fetchall()
+
+    songs = Song.objects.in_bulk([song_id for song_id, _ in ranked])
+    results = []
+    for song_id, score in ranked:
+        if song_id in songs:
+            song = songs[song_id]
+            song.search_rank = round(score, 4)
+            results.append(song)
+    return results
+
+
+def build_document(song_id):
+    """Campos del documento de búsqueda de una canción; None si no existe"""
+    song = Song.objects.filter(pk=song_id).values('user_id', 'title', 'original_file').first()
+    if song is None:
+        return None
+
+    stem_names = dict(Stem.STEM_TYPES)
+    stems = Stem.objects.filter(song_id=song_id).values_list('stem_type', flat=True)
+    tracks = GeneratedTrack.objects.filter(midi_file__stem__song_id=song_id).values_list('title', flat=True)
+    return {
+        'user_id': song['user_id'],
+        'title': normalize(song['title']),
+        'filename': normalize(os.path.basename(song['original_file'] or '')),
+        'stems': normalize(' '.join(f'{stem_type} {stem_names.get(stem_type, "")}' for stem_type in stems)),
+        'tracks': normalize(' '.join(tracks)),
+    }
+
+
+def update_document(song_id):
+    """Reconstruir el documento de búsqueda de una canción"""
+    fields = build_document(song_id)
+    if fields is not None:
+        SongSearchDocument.objects.update_or_create(song_id=song_id, defaults=fields)
+
+
+def schedule_update(song_id):
+    """Reconstruir el documento cuando se confirme la transacción en curso"""
+    if song_id is not None:
+        transaction.on_commit(lambda: update_document(song_id))
+
+
+def rebuild_index():
+    """Reconstruir todos los documentos (p. ej. tras cargas masivas sin señales)"""
+    song_ids = list(Song.objects.values_list('id', flat=True))
+    for song_id in song_ids:
+        update_document(song_id)
+    return len(song_ids)
@@ -0,0 +1,313 @@
+# Separación en stems, entera o por segmentos solapados
+#
+# SouniQ/Modulo1 procesa la canción completa en una sola llamada, así que una pista
+# larga es una petición de muchos minutos que puede agotar el tiempo de espera. Con
+# MUSIC_SEGMENTED_SEPARATION las canciones de más de MUSIC_SEGMENT_MIN_DURATION
+# segundos se cortan en ventanas de MUSIC_SEGMENT_SECONDS que se solapan
+# MUSIC_SEGMENT_OVERLAP segundos; las ventanas se separan en paralelo (dentro del
+# límite de concurrencia del Space), cada una con sus propios reintentos, y cada stem
+# se recompone uniendo los segmentos con un fundido cruzado en las zonas solapadas.
+#
+# Los cortes se leen con el módulo wave (o con ffmpeg si la entrada no es un WAV PCM)
+# y al recomponer solo se decodifican las zonas de solape; el resto se copia tal cual.
+import logging
+import os
+import shutil
+import subprocess
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from gradio_client import handle_file
+
+from .clients import client_pool, get_space_concurrency
+from .profiling import bind, timed
+
+logger = logging.getLogger(__name__)
+
+STEM_COUNT = 7  # vocals, drums, bass, guitar, piano, other, instrumental
+COPY_FRAMES = 65536
+
+
+class SeparationError(Exception):
+    pass
+
+
+def is_segmented_enabled():
+    return getattr(settings, 'MUSIC_SEGMENTED_SEPARATION', False)
+
+
+def get_segment_seconds():
+    return getattr(settings, 'MUSIC_SEGMENT_SECONDS', 120)
+
+
+def get_overlap_seconds():
+    return getattr(settings, 'MUSIC_SEGMENT_OVERLAP', 2.0)
+
+
+def get_min_duration():
+    return getattr(settings, 'MUSIC_SEGMENT_MIN_DURATION', 240)
+
+
+def get_segment_retries():
+    return getattr(settings, 'MUSIC_SEGMENT_RETRIES', 2)
+
+
+def get_params():
+    """Ajustes que cambian el resultado de la separación (parte de la clave de single-flight)"""
+    if not is_segmented_enabled():
+        return {}
+    return {
+        'segment_seconds': get_segment_seconds(),
+        'overlap': get_overlap_seconds(),
+        'min_duration': get_min_duration(),
+    }
+
+
+def _report(progress, percentage, detail=''):
+    if progress is not None:
+        progress(percentage, detail)
+
+
+def predict_whole(space, input_path):
+    """Separar el fichero completo en una sola llamada"""
+    return client_pool.predict(space, input_wav_path=handle_file(input_path), api_name="/predict")
+
+
+def plan_segments(duration, segment_seconds=None, overlap_seconds=None):
+    """Ventanas (inicio, duración) en segundos que cubren `duration` solapándose"""
+    segment_seconds = segment_seconds or get_segment_seconds()
+    overlap_seconds = get_overlap_seconds() if overlap_seconds is None else overlap_seconds
+    if overlap_seconds * 2 >= segment_seconds:
+        raise SeparationError('El solape debe ser menor que la mitad del segmento')
+
+    hop = segment_seconds - overlap_seconds
+    segments = []
+    start = 0.0
+    while True:
+        length = min(segment_seconds, duration - start)
+        segments.append((start, length))
+        if start + length >= duration:
+            break
+        start += hop
+    # Un último trozo muy corto no compensa una llamada más: se alarga el anterior
+    if len(segments) > 1 and segments[-1][1] < max(segment_seconds / 4, overlap_seconds * 2):
+        segments.pop()
+        start, _ = segments[-1]
+        segments[-1] = (start, duration - start)
+    return segments
+
+
+def _is_pcm_wav(path):
+    try:
+        with wave.open(path, 'rb'):
+            return True
+    except (wave.Error, EOFError):
+        return False
+
+
+def _ffmpeg():
+    return shutil.which(getattr(settings, 'MUSIC_FFMPEG_BINARY', 'ffmpeg'))
+
+
+def _run_ffmpeg(args):
+    ffmpeg = _ffmpeg()
+    if ffmpeg is None:
+        raise SeparationError('ffmpeg no está disponible')
+    result = subprocess.run([ffmpeg, '-nostdin', '-v', 'error', '-y', *args], capture_output=True)
+    if result.returncode != 0:
+        raise SeparationError(f"ffmpeg falló: {result.stderr.decode(errors='replace').strip()[:200]}")
+
+
+def cut_segment(input_path, output_path, start, length):
+    """Escribir en `output_path` un WAV con el tramo [start, start + length) de la entrada"""
+    if not _is_pcm_wav(input_path):
+        _run_ffmpeg(['-ss', f'{start:.3f}', '-t', f'{length:.3f}', '-i', input_path,
+                     '-vn', '-c:a', 'pcm_s16le', output_path])
+        return output_path
+
+    with wave.open(input_path, 'rb') as source, wave.open(output_path, 'wb') as target:
+        rate = source.getframerate()
+        target.setparams(source.getparams())
+        first = int(round(start * rate))
+        remaining = min(int(round(length * rate)), source.getnframes() - first)
+        source.setpos(first)
+        while remaining > 0:
+            raw = source.readframes(min(COPY_FRAMES, remaining))
+            if not raw:
+                break
+            target.writeframes(raw)
+            remaining -= len(raw) // (source.getsampwidth() * source.getnchannels())
+    return output_path
+
+
+def _decode(raw, width, channels, np):
+    """Bytes PCM little-endian a un array float32 (frames, canales)"""
+    if width == 1:
+        samples = np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32)
+    elif width == 3:
+        data = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = (data[:, 0] | (data[:, 1] << 8) | (data[:, 2] << 16))
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples).astype(np.float32)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32)
+    else:
+        raise SeparationError(f'Ancho de muestra no soportado: {width} bytes')
+    return samples.reshape(-1, channels)
+
+
+def _encode(samples, width, np):
+    """Array float (frames, canales) a bytes PCM little-endian"""
+    bits = 8 * width
+    low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    samples = np.clip(np.rint(samples), low, high).astype(np.int32).reshape(-1)
+    if width == 1:
+        return (samples + 128).astype(np.uint8).tobytes()
+    if width == 2:
+        return samples.astype('<i2').tobytes()
+    if width == 3:
+        return samples.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return samples.astype('<i4').tobytes()
+
+
+def _as_pcm(path, work_dir):
+    """Ruta de un WAV PCM legible por wave (convierte con ffmpeg si hace falta)"""
+    if _is_pcm_wav(path):
+        return path
+    converted = os.path.join(work_dir, f'pcm_{os.path.basename(path)}.wav')
+    _run_ffmpeg(['-i', path, '-c:a', 'pcm_s16le', converted])
+    return converted
+
+
+def stitch(paths, output_path, overlap_seconds):
+    """Unir los segmentos de un stem con fundidos cruzados lineales en los solapes"""
+    import numpy as np
+
+    readers = [wave.open(path, 'rb') for path in paths]
+    try:
+        params = readers[0].getparams()
+        width, channels, rate = params.sampwidth, params.nchannels, params.framerate
+        for reader in readers[1:]:
+            if (reader.getsampwidth(), reader.getnchannels(), reader.getframerate()) != (width, channels, rate):
+                raise SeparationError('Los segmentos de un stem tienen formatos distintos')
+
+        overlap = int(round(overlap_seconds * rate))
+        frame_size = width * channels
+        with wave.open(output_path, 'wb') as target:
+            target.setnchannels(channels)
+            target.setsampwidth(width)
+            target.setframerate(rate)
+
+            tail = None  # últimos frames del segmento anterior, pendientes del fundido
+            for index, reader in enumerate(readers):
+                frames = reader.getnframes()
+                head_frames = min(overlap, frames) if tail is not None else 0
+                is_last = index == len(readers) - 1
+                keep_tail = 0 if is_last else min(overlap, frames - head_frames)
+
+                if head_frames:
+                    head = _decode(reader.readframes(head_frames), width, channels, np)
+                    previous = _decode(tail, width, channels, np)
+                    length = min(len(head), len(previous))
+                    fade = np.linspace(0.0, 1.0, length, dtype=np.float32)[:, None]
+                    mixed = previous[:length] * (1.0 - fade) + head[:length] * fade
+                    target.writeframes(_encode(mixed, width, np))
+                    # Si los solapes no miden lo mismo, el sobrante del segmento nuevo se conserva
+                    target.writeframes(_encode(head[length:], width, np))
+
+                remaining = frames - head_frames - keep_tail
+                while remaining > 0:
+                    raw = reader.readframes(min(COPY_FRAMES, remaining))
+                    if not raw:
+                        break
+                    target.writeframes(raw)
+                    remaining -= len(raw) // frame_size
+                tail = reader.readframes(keep_tail) if keep_tail else None
+    finally:
+        for reader in readers:
+            reader.close()
+    return output_path
+
+
+def _predict_segment(space, segment_path, index, retries):
+    """Separar un segmento; si el Space devuelve un resultado incompleto se repite.
+
+    Los errores de red, cuota o cola ya los reintenta el pool de clientes, así que
+    aquí no se vuelven a reintentar.
+    """
+    for attempt in range(retries + 1):
+        try:
+            result = predict_whole(space, segment_path)
+        except Exception as e:
+            raise SeparationError(f'El segmento {index + 1} falló: {e}') from e
+        if result and len(result) >= STEM_COUNT:
+            return result
+        if attempt == retries:
+            raise SeparationError(f'Resultado incompleto del segmento {index + 1} tras {retries + 1} intentos')
+        delay = 2 ** attempt
+        logger.warning(f"⚠️ Segmento {index + 1}: resultado incompleto; reintento en {delay}s")
+        time.sleep(delay)
+
+
+def predict_segmented(space, input_path, work_dir, duration, progress=None):
+    """Separar por segmentos solapados; devuelve una ruta por stem como la llamada entera"""
+    segments = plan_segments(duration)
+    overlap = get_overlap_seconds()
+    retries = get_segment_retries()
+    logger.info(f"✂️ Separación en {len(segments)} segmentos de {get_segment_seconds()}s (solape {overlap}s)")
+
+    results = [None] * len(segments)
+    workers = min(len(segments), get_space_concurrency(space))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='segment') as executor:
+        futures = {}
+        for index, (start, length) in enumerate(segments):
+            with timed('temp_io'):
+                segment_path = cut_segment(input_path, os.path.join(work_dir, f'segment_{index}.wav'), start, length)
+            futures[executor.submit(bind(_predict_segment), space, segment_path, index, retries)] = (index, segment_path)
+
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                index, segment_path = futures[future]
+                results[index] = future.result()
+                os.unlink(segment_path)
+                _report(progress, 30 + int(done * 35 / len(segments)), f'Segmento {done} de {len(segments)} separado')
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+    _report(progress, 66, 'Uniendo segmentos...')
+    stems = []
+    for stem_index in range(STEM_COUNT):
+        paths = [result[stem_index] for result in results]
+        if not all(path and os.path.exists(path) for path in paths):
+            logger.warning(f"⚠️ Stem {stem_index}: falta en algún segmento, se omite")
+            stems.append(None)
+            continue
+        with timed('temp_io'):
+            paths = [_as_pcm(path, work_dir) for path in paths]
+            stems.append(stitch(paths, os.path.join(work_dir, f'stem_{stem_index}.wav'), overlap))
+    return stems
+
+
+def _duration(input_path, duration):
+    if duration:
+        return duration
+    if _is_pcm_wav(input_path):
+        with wave.open(input_path, 'rb') as source:
+            return source.getnframes() / source.getframerate()
+    return None
+
+
+def separate(space, input_path, work_dir, duration=None, progress=None):
+    """Separar en stems una canción; por segmentos si está activado y la canción es larga"""
+    if is_segmented_enabled():
+        duration = _duration(input_path, duration)
+        if duration and duration > get_min_duration():
+            if _is_pcm_wav(input_path) or _ffmpeg() is not None:
+                return predict_segmented(space, input_path, work_dir, duration, progress)
+            logger.warning("⚠️ Sin ffmpeg no se puede segmentar este formato: se separa entera")
+    return predict_whole(space, input_path)
@@ -0,0 +1,55 @@
+# Mantenimiento de datos derivados al cambiar los datos del usuario:
+# estadísticas en caché (stats.py) y documentos de búsqueda (search.py)
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import GeneratedTrack, MidiFile, Song, Stem
+from .search import schedule_update
+from .stats import invalidate_user_stats
+
+# Campos de Song que forman parte del documento de búsqueda
+SEARCH_SONG_FIELDS = {'title', 'original_file'}
+
+
+@receiver([post_save, post_delete], sender=Song)
+@receiver([post_save, post_delete], sender=GeneratedTrack)
+def song_or_track_changed(sender, instance, **kwargs):
+    invalidate_user_stats(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Stem)
+def stem_changed(sender, instance, **kwargs):
+    user_id = Song.objects.filter(pk=instance.song_id).values_list('user_id', flat=True).first()
+    invalidate_user_stats(user_id)
+
+
+@receiver([post_save, post_delete], sender=MidiFile)
+def midi_file_changed(sender, instance, **kwargs):
+    user_id = Song.objects.filter(stems__pk=instance.stem_id).values_list('user_id', flat=True).first()
+    invalidate_user_stats(user_id)
+
+
+@receiver(post_save, sender=Song)
+def index_song(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or SEARCH_SONG_FIELDS & set(update_fields):
+        schedule_update(instance.pk)
+
+
+@receiver(post_save, sender=Stem)
+def index_stem(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'stem_type' in update_fields:
+        schedule_update(instance.song_id)
+
+
+@receiver(post_delete, sender=Stem)
+def unindex_stem(sender, instance, **kwargs):
+    schedule_update(instance.song_id)
+
+
+@receiver([post_save, post_delete], sender=GeneratedTrack)
+def index_track(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('created') is False and update_fields is not None and 'title' not in update_fields:
+        return
+    song_id = MidiFile.objects.filter(pk=instance.midi_file_id).values_list('stem__song_id', flat=True).first()
+    schedule_update(song_id)
@@ -0,0 +1,133 @@
+# Una sola llamada remota por Space, audio y parámetros aunque la pidan varios procesos
+#
+# Si dos usuarios suben el mismo audio a la vez (o dos workers convierten el mismo
+# stem), la primera petición inserta una fila InflightCall con la clave
+# sha256(Space, hash de entrada, parámetros) y hace la llamada; el resto encuentra la
+# fila (restricción unique) y espera a que termine. El resultado no viaja por la fila:
+# quien llama lo guarda en su caché direccionada por contenido (stem_cache, midi_cache)
+# antes de salir del bloque y los que esperaban lo leen de ahí. Si la llamada falla,
+# los que esperaban reciben el mismo error.
+#
+# Las filas se reutilizan: una terminada, o una 'running' más antigua que
+# MUSIC_SINGLEFLIGHT_TIMEOUT (su proceso murió), la reclama la siguiente petición con
+# un UPDATE condicional.
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import InflightCall
+
+logger = logging.getLogger(__name__)
+
+FINISHED_RETENTION = timedelta(days=1)  # las filas terminadas se borran pasado este tiempo
+
+
+class InflightCallFailed(Exception):
+    """La llamada a la que se esperaba terminó con error"""
+
+
+def get_timeout():
+    return getattr(settings, 'MUSIC_SINGLEFLIGHT_TIMEOUT', 1800)
+
+
+def get_poll_interval():
+    return getattr(settings, 'MUSIC_SINGLEFLIGHT_POLL_INTERVAL', 2.0)
+
+
+def flight_key(space, input_hash, params=None):
+    payload = json.dumps([space, input_hash, params or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _owner():
+    return f'{socket.gethostname()}:{os.getpid()}'[:100]
+
+
+def _try_lead(key, space, input_hash):
+    """Intentar ser quien hace la llamada; True si se consigue"""
+    try:
+        with transaction.atomic():
+            InflightCall.objects.create(key=key, space=space, input_hash=input_hash, owner=_owner())
+        purge_finished()
+        return True
+    except IntegrityError:
+        pass
+
+    # La fila existe: se reclama si la llamada anterior ya terminó o su proceso murió
+    now = timezone.now()
+    reclaimable = Q(status__in=['completed', 'failed']) | Q(
+        status='running', started_at__lt=now - timedelta(seconds=get_timeout())
+    )
+    claimed = InflightCall.objects.filter(reclaimable, key=key).update(
+        status='running', owner=_owner(), waiters=0, error_message='', started_at=now, finished_at=None,
+    )
+    return bool(claimed)
+
+
+def _finish(key, status, error_message=''):
+    InflightCall.objects.filter(key=key, owner=_owner()).update(
+        status=status, error_message=error_message[:1000], finished_at=timezone.now(),
+    )
+
+
+def _wait(key, space, input_hash):
+    """Esperar a la llamada en vuelo; True si al final toca hacerla a este proceso"""
+    InflightCall.objects.filter(key=key).update(waiters=F('waiters') + 1)
+    logger.info(f"⏳ Ya hay una llamada a {space} para {input_hash[:12]}: esperando su resultado")
+    poll_interval = get_poll_interval()
+    while True:
+        row = InflightCall.objects.filter(key=key).values('status', 'error_message', 'started_at').first()
+        if row is None:
+            if _try_lead(key, space, input_hash):
+                return True
+        elif row['status'] == 'completed':
+            return False
+        elif row['status'] == 'failed':
+            raise InflightCallFailed(row['error_message'] or f'La llamada a {space} falló')
+        elif row['started_at'] < timezone.now() - timedelta(seconds=get_timeout()):
+            if _try_lead(key, space, input_hash):
+                logger.warning(f"⚠️ La llamada a {space} para {input_hash[:12]} caducó: se repite")
+                return True
+        time.sleep(poll_interval)
+
+
+@contextmanager
+def single_flight(space, input_hash, params=None, enabled=True):
+    """Entrar con True si este proceso debe hacer la llamada; con False si otro acaba de hacerla.
+
+    Quien entra con True debe dejar el resultado en su caché antes de salir del bloque.
+    Sin `input_hash` (o con enabled=False) siempre se entra con True y no se coordina nada.
+    """
+    if not enabled or not input_hash:
+        yield True
+        return
+
+    key = flight_key(space, input_hash, params)
+    if not _try_lead(key, space, input_hash) and not _wait(key, space, input_hash):
+        yield False
+        return
+
+    try:
+        yield True
+    except BaseException as e:
+        _finish(key, 'failed', str(e))
+        raise
+    _finish(key, 'completed')
+
+
+def purge_finished():
+    """Borrar las filas de llamadas terminadas hace más de un día; devuelve cuántas"""
+    deleted, _ = InflightCall.objects.filter(
+        status__in=['completed', 'failed'], finished_at__lt=timezone.now() - FINISHED_RETENTION
+    ).delete()
+    return deleted
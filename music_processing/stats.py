@@ -0,0 +1,91 @@
+# Estadísticas por usuario para el dashboard y el perfil
+#
+# Todos los contadores salen de dos consultas: una agregación condicional sobre las
+# canciones del usuario y una fila de User con subconsultas para stems, MIDI y tracks.
+# El resultado se guarda en la caché por usuario y las señales de signals.py lo
+# invalidan cuando cambian sus canciones, stems, MIDI o tracks.
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import GeneratedTrack, MidiFile, Song, Stem
+
+RECENT_DAYS = 30
+
+
+def _cache_key(user_id):
+    return f'user_stats:{user_id}'
+
+
+def _count(queryset, user_lookup):
+    """Subconsulta con el número de filas de `queryset` del usuario de la fila externa"""
+    counts = (
+        queryset.filter(**{user_lookup: OuterRef('pk')})
+        .order_by()
+        .values(user_lookup)
+        .annotate(n=Count('pk'))
+        .values('n')[:1]
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def compute_user_stats(user_id):
+    """Calcular las estadísticas del usuario sin pasar por la caché"""
+    since = timezone.now() - timedelta(days=RECENT_DAYS)
+
+    song_aggregates = {
+        'total_songs': Count('pk'),
+        'songs_recent': Count('pk', filter=Q(uploaded_at__gte=since)),
+    }
+    for status, _ in Song.STATUS_CHOICES:
+        song_aggregates[f'status_{status}'] = Count('pk', filter=Q(status=status))
+    songs = Song.objects.filter(user_id=user_id).aggregate(**song_aggregates)
+
+    completed_midi = MidiFile.objects.filter(status='completed')
+    others = User.objects.filter(pk=user_id).values(
+        total_stems=_count(Stem.objects.all(), 'song__user'),
+        stems_recent=_count(Stem.objects.filter(created_at__gte=since), 'song__user'),
+        total_midi=_count(completed_midi, 'stem__song__user'),
+        midi_recent=_count(completed_midi.filter(completed_at__gte=since), 'stem__song__user'),
+        total_generated=_count(GeneratedTrack.objects.all(), 'user'),
+        tracks_recent=_count(GeneratedTrack.objects.filter(created_at__gte=since), 'user'),
+    ).first() or {}
+
+    return {
+        'total_songs': songs['total_songs'],
+        'total_stems': others.get('total_stems', 0),
+        'total_midi': others.get('total_midi', 0),
+        'total_generated': others.get('total_generated', 0),
+        'recent_activity': {
+            'songs_uploaded': songs['songs_recent'],
+            'stems_generated': others.get('stems_recent', 0),
+            'midi_converted': others.get('midi_recent', 0),
+            'tracks_generated': others.get('tracks_recent', 0),
+        },
+        'song_status_counts': [
+            {'status': status, 'count': songs[f'status_{status}']}
+            for status, _ in Song.STATUS_CHOICES
+            if songs[f'status_{status}']
+        ],
+    }
+
+
+def get_user_stats(user):
+    """Estadísticas del usuario, desde la caché si están disponibles"""
+    key = _cache_key(user.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_user_stats(user.pk)
+        cache.set(key, stats, getattr(settings, 'MUSIC_STATS_CACHE_TTL', 300))
+    return stats
+
+
+def invalidate_user_stats(user_id):
+    """Descartar las estadísticas en caché de un usuario"""
+    if user_id is not None:
+        cache.delete(_cache_key(user_id))
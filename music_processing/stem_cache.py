@@ -0,0 +1,152 @@
+# Caché direccionada por contenido para la separación en stems
+#
+# Cada entrada guarda, bajo el sha256 del audio original, los siete ficheros que
+# devolvió SouniQ/Modulo1. Los Stem de cualquier canción con el mismo audio apuntan
+# directamente a esos ficheros, así que una segunda subida no llama al Space ni
+# duplica almacenamiento. El tamaño total se acota expulsando las entradas usadas
+# hace más tiempo (LRU) que ya no referencia ningún Stem.
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .fileio import sha256_path, store_local_file
+from .models import CacheCounter, Stem, StemCacheEntry
+
+logger = logging.getLogger(__name__)
+
+COUNTER_NAME = 'stem_separation'
+
+
+def is_enabled():
+    return getattr(settings, 'MUSIC_STEM_CACHE_ENABLED', True)
+
+
+def _record(hit):
+    counter, _ = CacheCounter.objects.get_or_create(name=COUNTER_NAME)
+    field = 'hits' if hit else 'misses'
+    CacheCounter.objects.filter(pk=counter.pk).update(**{field: F(field) + 1})
+
+
+def lookup(audio_hash):
+    """Buscar los stems cacheados de un audio; registra el acierto o fallo"""
+    entry = StemCacheEntry.objects.filter(audio_hash=audio_hash).first()
+    if entry is None or not all(default_storage.exists(f['name']) for f in entry.files):
+        _record(hit=False)
+        return None
+
+    StemCacheEntry.objects.filter(pk=entry.pk).update(
+        hit_count=F('hit_count') + 1,
+        last_used_at=timezone.now(),
+    )
+    _record(hit=True)
+    logger.info(f"♻️ Stems encontrados en caché para el audio {audio_hash[:12]}")
+    return entry
+
+
+def store_file(audio_hash, order, stem_type, path):
+    """Mover a la caché el fichero de un stem recién separado; devuelve su descripción para store()"""
+    content_hash = sha256_path(path)
+    name = f"stem_cache/{audio_hash[:2]}/{audio_hash}/{order}_{stem_type}.wav"
+    # Los ficheros devueltos por el cliente son temporales: se mueven sin copiarlos
+    name = store_local_file(name, path, move=True)
+    return {
+        'order': order,
+        'stem_type': stem_type,
+        'name': name,
+        'content_hash': content_hash,
+    }
+
+
+def store(audio_hash, files):
+    """Registrar en la caché los ficheros guardados con store_file() para un audio"""
+    size_bytes = sum(default_storage.size(f['name']) for f in files)
+    try:
+        with transaction.atomic():
+            entry = StemCacheEntry.objects.create(
+                audio_hash=audio_hash,
+                files=files,
+                size_bytes=size_bytes,
+            )
+    except IntegrityError:
+        # Otro worker cacheó el mismo audio a la vez: se conserva su entrada (los ficheros
+        # propios no se borran, ya los usan los Stem de esta canción)
+        entry = StemCacheEntry.objects.get(audio_hash=audio_hash)
+        if not all(default_storage.exists(f['name']) for f in entry.files):
+            entry.files = files
+            entry.size_bytes = size_bytes
+            entry.save(update_fields=['files', 'size_bytes'])
+
+    evict()
+    return entry
+
+
+def create_stem(song, f):
+    """Crear el Stem de una canción apuntando a un fichero de la caché"""
+    stem = Stem(
+        song=song,
+        stem_type=f['stem_type'],
+        order=f['order'],
+        content_hash=f.get('content_hash', ''),
+    )
+    stem.file.name = f['name']
+    stem.save()
+    return stem
+
+
+def create_stems(song, entry):
+    """Crear los Stem de una canción apuntando a los ficheros de una entrada de la caché"""
+    stems = []
+    for f in sorted(entry.files, key=lambda f: f['order']):
+        stem = Stem(
+            song=song,
+            stem_type=f['stem_type'],
+            order=f['order'],
+            content_hash=f.get('content_hash', ''),
+        )
+        stem.file.name = f['name']
+        stems.append(stem)
+    return Stem.objects.bulk_create(stems)
+
+
+def _is_referenced(entry):
+    prefix = os.path.dirname(entry.files[0]['name']) + '/' if entry.files else None
+    return prefix is not None and Stem.objects.filter(file__startswith=prefix).exists()
+
+
+def evict(max_bytes=None):
+    """Expulsar entradas LRU no referenciadas hasta quedar por debajo del límite"""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'MUSIC_STEM_CACHE_MAX_BYTES', 5 * 1024 ** 3)
+
+    total = sum(StemCacheEntry.objects.values_list('size_bytes', flat=True))
+    evicted = 0
+    for entry in StemCacheEntry.objects.order_by('last_used_at'):
+        if total <= max_bytes:
+            break
+        if _is_referenced(entry):
+            continue
+        for f in entry.files:
+            default_storage.delete(f['name'])
+        total -= entry.size_bytes
+        entry.delete()
+        evicted += 1
+
+    if evicted:
+        logger.info(f"🧹 Caché de stems: {evicted} entradas expulsadas")
+    return evicted
+
+
+def get_stats():
+    """Estado de la caché: entradas, bytes ocupados y contadores de aciertos/fallos"""
+    counter = CacheCounter.objects.filter(name=COUNTER_NAME).first()
+    return {
+        'entries': StemCacheEntry.objects.count(),
+        'size_bytes': sum(StemCacheEntry.objects.values_list('size_bytes', flat=True)),
+        'hits': counter.hits if counter else 0,
+        'misses': counter.misses if counter else 0,
+    }
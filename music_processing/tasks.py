@@ -2,12 +2,15 @@ from celery import shared_task
 from django.core.files.base import ContentFile
 from django.utils import timezone
 from django.conf import settings
-from gradio_client import Client, handle_file
+from gradio_client import handle_file
 import tempfile
 import os
 import logging
 import requests
 import zipfile
+from .clients import client_pool, get_space
+from .fileio import save_local_file
+from .ingest import ingest_stem
 from .models import Song, Stem, MidiFile, GeneratedTrack, ProcessingTask
 
 logger = logging.getLogger(__name__)
@@ -51,7 +54,8 @@ def process_song_to_stems(self, song_id):
             # No requiere token ya que es un espacio público
             logger.info("Conectando con el espacio de Hugging Face...")
             
-            client = Client("SouniQ/Modulo1")
+            space = get_space('stems')
+            client_pool.get(space)
             logger.info("Cliente de Hugging Face creado exitosamente")
             
             self.update_state(state='PROGRESS', meta={'current': 20, 'total': 100, 'status': 'Preparando archivo de audio...'})
@@ -59,8 +63,9 @@ def process_song_to_stems(self, song_id):
             # Crear archivo temporal con el audio original
             with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
                 # Copiar el contenido del archivo original al temporal
-                song.original_file.seek(0)
-                temp_file.write(song.original_file.read())
+                song.original_file.open('rb')
+                for chunk in song.original_file.chunks():
+                    temp_file.write(chunk)
                 temp_audio_path = temp_file.name
             
             logger.info(f"Archivo temporal creado: {temp_audio_path} (tamaño: {os.path.getsize(temp_audio_path)} bytes)")
@@ -68,7 +73,8 @@ def process_song_to_stems(self, song_id):
             self.update_state(state='PROGRESS', meta={'current': 30, 'total': 100, 'status': 'Enviando a espacio público de Hugging Face...'})
             
             # Procesar con el espacio público de Hugging Face usando el parámetro correcto
-            result = client.predict(
+            result = client_pool.predict(
+                space,
                 input_wav_path=handle_file(temp_audio_path),
                 api_name="/predict"
             )
@@ -186,8 +192,8 @@ def process_stems_from_files(stem_files, song, task_instance):
             # Guardar el archivo del stem
             filename_clean = f"{song.title}_stem_{stems_created + 1}_{stem_type}.wav"
             
-            with open(stem_file_path, 'rb') as stem_file:
-                stem.file.save(filename_clean, ContentFile(stem_file.read()))
+            save_local_file(stem.file, filename_clean, stem_file_path, move=True)
+            ingest_stem(stem)
             
             # Crear el objeto MidiFile para futura conversión
             MidiFile.objects.create(stem=stem)
@@ -256,8 +262,8 @@ def process_stems_from_zip(zip_path, song, task_instance):
                         file_path = os.path.join(root, file)
                         filename = f"{song.title}_stem_{stems_created + 1}_{stem_type}.wav"
                         
-                        with open(file_path, 'rb') as stem_file:
-                            stem.file.save(filename, ContentFile(stem_file.read()))
+                        save_local_file(stem.file, filename, file_path, move=True)
+                        ingest_stem(stem)
                         
                         # Crear el objeto MidiFile para futura conversión
                         MidiFile.objects.create(stem=stem)
@@ -302,7 +308,8 @@ def convert_stem_to_midi(self, stem_id):
         task.save()
         
         # Conectar con la API de conversión a MIDI
-        client = Client("SouniQ/Modulo2")
+        space = get_space('midi')
+        client_pool.get(space)
         
         # Preparar el archivo de audio
         with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
@@ -314,7 +321,8 @@ def convert_stem_to_midi(self, stem_id):
             # Llamar a la API
             self.update_state(state='PROGRESS', meta={'current': 50, 'total': 100})
             
-            result = client.predict(
+            result = client_pool.predict(
+                space,
                 input_wav_path=handle_file(temp_file_path),
                 api_name="/predict"
             )
@@ -358,6 +366,66 @@ def convert_stem_to_midi(self, stem_id):
         raise
 
 
+@shared_task(bind=True)
+def convert_song_stems_to_midi(self, song_id):
+    """
+    Tarea para convertir a MIDI todos los stems de una canción en paralelo
+    """
+    from .jobs import run_task
+
+    task = ProcessingTask.objects.get(celery_task_id=self.request.id, song_id=song_id)
+    task.status = 'in_progress'
+    task.started_at = timezone.now()
+    task.save(update_fields=['status', 'started_at'])
+
+    return run_task(task)
+
+
+@shared_task(bind=True)
+def run_full_pipeline(self, song_id):
+    """
+    Tarea para ejecutar el pipeline completo de una canción (stems, MIDI y generación)
+    """
+    from .jobs import run_task
+
+    task = ProcessingTask.objects.get(celery_task_id=self.request.id, song_id=song_id)
+    task.status = 'in_progress'
+    task.started_at = timezone.now()
+    task.save(update_fields=['status', 'started_at'])
+
+    return run_task(task)
+
+
+@shared_task(bind=True)
+def generate_waveforms(self, song_id):
+    """
+    Tarea para calcular las formas de onda de una canción, sus stems y sus tracks
+    """
+    from .jobs import run_task
+
+    task = ProcessingTask.objects.get(celery_task_id=self.request.id, song_id=song_id)
+    task.status = 'in_progress'
+    task.started_at = timezone.now()
+    task.save(update_fields=['status', 'started_at'])
+
+    return run_task(task)
+
+
+@shared_task(bind=True)
+def generate_previews(self, song_id):
+    """
+    Tarea para crear las versiones de escucha comprimidas de los stems y tracks de una canción
+    """
+    from .jobs import run_task
+
+    task = ProcessingTask.objects.get(celery_task_id=self.request.id, song_id=song_id)
+    task.status = 'in_progress'
+    task.started_at = timezone.now()
+    task.save(update_fields=['status', 'started_at'])
+
+    return run_task(task)
+
+
 @shared_task(bind=True)
 def generate_new_track(self, generated_track_id):
     """
@@ -376,7 +444,8 @@ def generate_new_track(self, generated_track_id):
         task.save()
         
         # Conectar con la API de generación de música
-        client = Client("asigalov61/Giant-Music-Transformer")
+        space = "asigalov61/Giant-Music-Transformer"
+        client_pool.get(space)
         
         # Preparar el archivo MIDI
         with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as temp_file:
@@ -388,7 +457,8 @@ def generate_new_track(self, generated_track_id):
             # Llamar a la API con los parámetros configurados
             self.update_state(state='PROGRESS', meta={'current': 50, 'total': 100})
             
-            result = client.predict(
+            result = client_pool.predict(
+                space,
                 input_midi=handle_file(temp_file_path),
                 num_prime_tokens=generated_track.num_prime_tokens,
                 num_gen_tokens=generated_track.num_gen_tokens,
@@ -402,11 +472,8 @@ def generate_new_track(self, generated_track_id):
             
             # El resultado debería contener 8 versiones, tomamos la primera
             if result and len(result) > 0 and os.path.exists(result[0]):
-                with open(result[0], 'rb') as f:
-                    track_content = f.read()
-                
                 filename = f"{generated_track.title}_generated.mid"
-                generated_track.generated_file.save(filename, ContentFile(track_content))
+                save_local_file(generated_track.generated_file, filename, result[0], move=True, save=False)
                 generated_track.status = 'completed'
                 generated_track.completed_at = timezone.now()
                 generated_track.save()
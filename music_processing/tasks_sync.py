@@ -1,110 +1,181 @@
 # Versión síncrona de las tareas para PythonAnywhere gratuito
 import os
-import tempfile
 import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.core.files.base import ContentFile
+from django.db import connections, transaction
 from django.utils import timezone
-from gradio_client import Client, handle_file
-from .models import Song, Stem, MidiFile, GeneratedTrack
+from django.utils.text import get_valid_filename
+from gradio_client import handle_file
+from . import midi_cache, previews, profiling, separation, singleflight, stem_cache
+from .clients import client_pool, get_space, get_space_concurrency
+from .fileio import local_path, save_local_file, sha256_field_file, sha256_path, store_local_file
+from .ingest import ingest_stem
+from .jobs import enqueue_preview_generation, enqueue_waveform_generation
+from .models import Song, Stem, MidiFile, GeneratedTrack, GeneratedVersion
 
 logger = logging.getLogger(__name__)
 
-def process_song_to_stems_sync(song_id):
-    """Procesar canción a stems de forma síncrona"""
-    from django.db import transaction
-    
+GENERATION_AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg')
+VERSION_SAVE_WORKERS = 4
+
+def _report(progress, percentage, detail=''):
+    """Notificar el progreso al ejecutor de la tarea (worker de jobs.py), si lo hay"""
+    if progress is not None:
+        progress(percentage, detail)
+
+
+def _schedule_derived_audio(song):
+    """Encolar formas de onda y versiones de escucha de los audios nuevos (sin hacer fallar la etapa)"""
     try:
-        with transaction.atomic():
-            logger.info(f"🎵 Iniciando procesamiento de stems para canción ID: {song_id}")
-            
-            song = Song.objects.get(id=song_id)
-            logger.info(f"📁 Canción encontrada: {song.title}")
-            logger.info(f"📄 Archivo original: {song.original_file.name}")
-            
-            song.status = 'processing_stems'
-            song.save()
-            logger.info("📊 Estado actualizado a 'processing_stems'")
+        enqueue_waveform_generation(song)
+        if previews.get_mode() == 'eager' and previews.is_available():
+            enqueue_preview_generation(song)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron encolar las tareas derivadas de '{song.title}': {e}")
 
-            # Crear cliente de Hugging Face
-            logger.info("🔗 Conectando con SouniQ/Modulo1...")
-            client = Client("SouniQ/Modulo1")
-            logger.info("✅ Cliente conectado exitosamente")
-            
-            # Crear archivo temporal
-            logger.info("📂 Creando archivo temporal...")
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-                # Leer el contenido del archivo
-                song.original_file.seek(0)
-                content = song.original_file.read()
-                logger.info(f"📏 Tamaño del archivo: {len(content)} bytes")
-                temp_file.write(content)
-                temp_file_path = temp_file.name
-                logger.info(f"💾 Archivo temporal creado: {temp_file_path}")
 
-            try:
-                # Llamar a la API
-                logger.info("🚀 Enviando archivo a la API de Hugging Face...")
-                result = client.predict(
-                    input_wav_path=handle_file(temp_file_path),
-                    api_name="/predict"
-                )
-                logger.info(f"📥 Resultado recibido: {type(result)}, longitud: {len(result) if result else 'None'}")
-                
-                if result and len(result) >= 7:
-                    # Tipos de stems según la API: vocals, drums, bass, guitar, piano, other, instrumental
-                    # Mapear instrumental a Clean para que coincida con el modelo
-                    api_stem_types = ['vocals', 'drums', 'bass', 'guitar', 'piano', 'other', 'instrumental']
-                    model_stem_types = ['vocals', 'drums', 'bass', 'guitar', 'piano', 'other', 'Clean']
-                    logger.info(f"🎼 Procesando {len(result[:7])} stems...")
-                    
-                    stems_created = 0
-                    for i, stem_file_path in enumerate(result[:7]):
-                        try:
-                            if os.path.exists(stem_file_path) and i < len(model_stem_types):
-                                stem_type = model_stem_types[i]  # Usar el tipo del modelo
-                                logger.info(f"🎹 Procesando stem {i+1}/{len(model_stem_types)}: {stem_type}")
-                                logger.info(f"📁 Archivo del stem: {stem_file_path}")
-                                
-                                # Crear objeto Stem
-                                stem = Stem.objects.create(
-                                    song=song,
-                                    stem_type=stem_type,
-                                    order=i
-                                )
-                                logger.info(f"✨ Modelo Stem creado: ID {stem.id}")
-                                
-                                # Guardar archivo
-                                with open(stem_file_path, 'rb') as f:
-                                    stem_content = f.read()
-                                
-                                filename = f"{song.title}_{stem_type}.wav"
-                                stem.file.save(filename, ContentFile(stem_content))
-                                stem.save()
-                                stems_created += 1
-                                logger.info(f"💾 Stem {stem_type} guardado exitosamente")
-                            else:
-                                logger.warning(f"⚠️ Archivo de stem no encontrado o índice fuera de rango: {i}, archivo: {stem_file_path if i < len(result) else 'N/A'}")
-                        except Exception as stem_error:
-                            logger.error(f"❌ Error procesando stem {i}: {stem_error}", exc_info=True)
-                            continue
-
-                    song.status = 'stems_completed'
-                    song.save()
-                    logger.info(f"🎉 Procesamiento completado. {stems_created} stems creados exitosamente")
-                    
-                    # Verificar que los stems se guardaron
-                    final_stem_count = song.stems.count()
-                    logger.info(f"🔍 Verificación final: {final_stem_count} stems en la DB")
-                    
-                    return {'status': 'success', 'stems_created': stems_created}
+def _reuse_cached_stems(song, entry, on_stem=None):
+    """Crear los stems de la canción desde una entrada de la caché de stems"""
+    with transaction.atomic():
+        stems = stem_cache.create_stems(song, entry)
+        song.status = 'stems_completed'
+        song.save()
+    logger.info(f"♻️ {len(stems)} stems reutilizados desde la caché")
+    for stem in stems:
+        ingest_stem(stem)
+        if on_stem is not None:
+            on_stem(stem)
+    _schedule_derived_audio(song)
+    return {'status': 'success', 'stems_created': len(stems), 'cached': True}
+
+
+def _separate_stems(song, space, progress=None, on_stem=None):
+    """Separar la canción en el Space de stems y guardar el resultado"""
+    # Crear cliente de Hugging Face
+    _report(progress, 10, 'Conectando con Hugging Face...')
+    logger.info(f"🔗 Conectando con {space}...")
+    client_pool.get(space)
+    logger.info("✅ Cliente conectado exitosamente")
+
+    # Preparar el audio: se reutiliza la ruta del storage o se copia por bloques
+    _report(progress, 20, 'Preparando archivo de audio...')
+    logger.info(f"📏 Tamaño del archivo: {song.original_file.size} bytes")
+
+    with local_path(song.original_file) as input_path, \
+            tempfile.TemporaryDirectory(prefix='separation_') as work_dir:
+        # Llamar a la API (por segmentos en paralelo si la canción es larga)
+        _report(progress, 30, 'Separando stems en Hugging Face...')
+        logger.info("🚀 Enviando archivo a la API de Hugging Face...")
+        result = separation.separate(space, input_path, work_dir, duration=song.duration, progress=progress)
+        logger.info(f"📥 Resultado recibido: {type(result)}, longitud: {len(result) if result else 'None'}")
+
+        if result and len(result) >= 7:
+            # Tipos de stems según la API: vocals, drums, bass, guitar, piano, other, instrumental
+            # Mapear instrumental a Clean para que coincida con el modelo
+            model_stem_types = ['vocals', 'drums', 'bass', 'guitar', 'piano', 'other', 'Clean']
+            logger.info(f"🎼 Procesando {len(result[:7])} stems...")
+
+            _report(progress, 70, 'Guardando stems...')
+            valid_stems = []
+            for i, stem_file_path in enumerate(result[:7]):
+                if stem_file_path and os.path.exists(stem_file_path):
+                    valid_stems.append((i, model_stem_types[i], stem_file_path))
                 else:
-                    raise Exception("No se pudieron generar los stems - resultado vacío o insuficiente")
+                    logger.warning(f"⚠️ Archivo de stem no encontrado: {i}, archivo: {stem_file_path}")
+
+            stems_created = 0
+            cached_files = []
+            for i, stem_type, stem_file_path in valid_stems:
+                try:
+                    logger.info(f"🎹 Procesando stem {i+1}/{len(model_stem_types)}: {stem_type}")
+                    logger.info(f"📁 Archivo del stem: {stem_file_path}")
+
+                    if stem_cache.is_enabled():
+                        # El fichero se guarda una sola vez en la caché y el Stem apunta a él
+                        cached = stem_cache.store_file(song.content_hash, i, stem_type, stem_file_path)
+                        cached_files.append(cached)
+                        stem = stem_cache.create_stem(song, cached)
+                    else:
+                        with transaction.atomic():
+                            stem = Stem.objects.create(
+                                song=song,
+                                stem_type=stem_type,
+                                order=i
+                            )
+                            # Guardar archivo (se mueve el temporal del cliente, sin copiarlo en memoria)
+                            filename = f"{song.title}_{stem_type}.wav"
+                            save_local_file(stem.file, filename, stem_file_path, move=True)
+                    logger.info(f"✨ Modelo Stem creado: ID {stem.id}")
+                    ingest_stem(stem)
+                    stems_created += 1
+                    logger.info(f"💾 Stem {stem_type} guardado exitosamente")
+                    # Cada stem se entrega ya guardado, sin esperar al resto: su MIDI puede empezar
+                    if on_stem is not None:
+                        on_stem(stem)
+                except Exception as stem_error:
+                    logger.error(f"❌ Error procesando stem {i}: {stem_error}", exc_info=True)
+                    continue
+
+            if cached_files:
+                stem_cache.store(song.content_hash, cached_files)
 
-            finally:
-                # Limpiar archivo temporal
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                    logger.info("🧹 Archivo temporal limpiado")
+            song.status = 'stems_completed'
+            song.save()
+            logger.info(f"🎉 Procesamiento completado. {stems_created} stems creados exitosamente")
+
+            # Verificar que los stems se guardaron
+            final_stem_count = song.stems.count()
+            logger.info(f"🔍 Verificación final: {final_stem_count} stems en la DB")
+            _schedule_derived_audio(song)
+
+            return {'status': 'success', 'stems_created': stems_created}
+        else:
+            raise Exception("No se pudieron generar los stems - resultado vacío o insuficiente")
+
+
+def process_song_to_stems_sync(song_id, progress=None, on_stem=None):
+    """Procesar canción a stems de forma síncrona.
+
+    `on_stem(stem)` se llama con cada Stem en cuanto su archivo está guardado, para que
+    las etapas siguientes (p. ej. la conversión a MIDI) puedan empezar sin esperar al resto.
+    """
+    # Sin transacción global: la llamada remota dura minutos y el estado y el
+    # progreso deben ser visibles para otras conexiones mientras tanto
+    try:
+        logger.info(f"🎵 Iniciando procesamiento de stems para canción ID: {song_id}")
+        
+        song = Song.objects.get(id=song_id)
+        logger.info(f"📁 Canción encontrada: {song.title}")
+        logger.info(f"📄 Archivo original: {song.original_file.name}")
+        
+        song.status = 'processing_stems'
+        song.save()
+        logger.info("📊 Estado actualizado a 'processing_stems'")
+
+        # Una subida con el mismo audio reutiliza los stems ya separados
+        if stem_cache.is_enabled():
+            _report(progress, 5, 'Buscando stems en caché...')
+            if not song.content_hash:
+                song.content_hash = sha256_field_file(song.original_file)
+                song.save(update_fields=['content_hash'])
+            
+            entry = stem_cache.lookup(song.content_hash)
+            if entry is not None:
+                return _reuse_cached_stems(song, entry, on_stem)
+
+        # Si otro worker ya está separando el mismo audio, se espera a su resultado
+        space = get_space('stems')
+        with singleflight.single_flight(space, song.content_hash, separation.get_params(),
+                                        enabled=stem_cache.is_enabled()) as leader:
+            if leader:
+                return _separate_stems(song, space, progress, on_stem)
+        entry = stem_cache.lookup(song.content_hash)
+        if entry is not None:
+            return _reuse_cached_stems(song, entry, on_stem)
+        return _separate_stems(song, space, progress, on_stem)
 
     except Exception as e:
         logger.error(f"❌ Error procesando canción {song_id}: {str(e)}", exc_info=True)
@@ -118,7 +189,54 @@ def process_song_to_stems_sync(song_id):
         raise
 
 
-def convert_stem_to_midi_sync(stem_id):
+def _save_midi_file(midi_file, stem, midi_content):
+    """Guardar el contenido MIDI en el MidiFile del stem y marcarlo como completado"""
+    filename = f"{stem.song.title}_{stem.get_stem_type_display()}.mid"
+    with profiling.timed('storage'):
+        midi_file.file.save(filename, ContentFile(midi_content))
+    midi_file.status = 'completed'
+    midi_file.completed_at = timezone.now()
+    midi_file.save()
+
+
+def _request_midi(space, stem):
+    """Convertir el audio del stem en el Space de MIDI y devolver los bytes del .mid"""
+    with local_path(stem.file) as input_path:
+        result = client_pool.predict(
+            space,
+            input_wav_path=handle_file(input_path),
+            api_name="/predict"
+        )
+    
+    # El resultado debería ser la ruta del archivo MIDI
+    if not result or not os.path.exists(result):
+        raise Exception("No se pudo generar el archivo MIDI")
+    with open(result, 'rb') as f:
+        return f.read()
+
+
+def _convert_midi(space, stem):
+    """MIDI del stem con una sola llamada por audio aunque otro worker lo esté convirtiendo.
+
+    Quien hace la llamada guarda el resultado en la caché MIDI, de donde lo leen los
+    que esperaban. Se usa también desde hilos, que cierran su conexión al terminar.
+    """
+    enabled = midi_cache.is_enabled() and bool(stem.content_hash)
+    try:
+        with singleflight.single_flight(space, stem.content_hash, enabled=enabled) as leader:
+            if leader:
+                midi_content = _request_midi(space, stem)
+                if enabled:
+                    midi_cache.store(stem.content_hash, midi_content)
+                return midi_content
+        midi_content = midi_cache.lookup(stem.content_hash)
+        return midi_content if midi_content is not None else _request_midi(space, stem)
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def convert_stem_to_midi_sync(stem_id, progress=None):
     """Convertir stem a MIDI de forma síncrona"""
     try:
         stem = Stem.objects.get(id=stem_id)
@@ -133,41 +251,29 @@ def convert_stem_to_midi_sync(stem_id):
             midi_file.status = 'processing'
             midi_file.save()
 
+        # Un stem con el mismo audio ya convertido se resuelve desde la caché
+        if midi_cache.is_enabled():
+            _report(progress, 5, 'Buscando MIDI en caché...')
+            if not stem.content_hash:
+                stem.content_hash = sha256_field_file(stem.file)
+                stem.save(update_fields=['content_hash'])
+            
+            midi_content = midi_cache.lookup(stem.content_hash)
+            if midi_content is not None:
+                _save_midi_file(midi_file, stem, midi_content)
+                return {'status': 'success', 'midi_file': midi_file.file.url, 'cached': True}
+
         # Crear cliente de Hugging Face
-        client = Client("SouniQ/Modulo2")
+        _report(progress, 10, 'Conectando con Hugging Face...')
+        space = get_space('midi')
+        client_pool.get(space)
         
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            stem.file.seek(0)
-            temp_file.write(stem.file.read())
-            temp_file_path = temp_file.name
-
-        try:
-            # Llamar a la API
-            result = client.predict(
-                input_wav_path=handle_file(temp_file_path),
-                api_name="/predict"
-            )
-            
-            # El resultado debería ser la ruta del archivo MIDI
-            if result and os.path.exists(result):
-                with open(result, 'rb') as f:
-                    midi_content = f.read()
-                
-                filename = f"{stem.song.title}_{stem.get_stem_type_display()}.mid"
-                midi_file.file.save(filename, ContentFile(midi_content))
-                midi_file.status = 'completed'
-                midi_file.completed_at = timezone.now()
-                midi_file.save()
-                
-                return {'status': 'success', 'midi_file': midi_file.file.url}
-            else:
-                raise Exception("No se pudo generar el archivo MIDI")
-                
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        _report(progress, 30, 'Convirtiendo a MIDI en Hugging Face...')
+        midi_content = _convert_midi(space, stem)
+        
+        _save_midi_file(midi_file, stem, midi_content)
+        
+        return {'status': 'success', 'midi_file': midi_file.file.url}
 
     except Exception as e:
         logger.error(f"Error convirtiendo stem {stem_id} a MIDI: {str(e)}")
@@ -177,76 +283,197 @@ def convert_stem_to_midi_sync(stem_id):
         raise
 
 
-def generate_new_track_sync(generated_track_id):
+def _prepare_midi_conversion(stem):
+    """Marcar el MidiFile del stem como en proceso; devuelve el MIDI si ya está en caché"""
+    midi_file, _ = MidiFile.objects.update_or_create(
+        stem=stem,
+        defaults={'status': 'processing', 'error_message': ''}
+    )
+    midi_content = None
+    if midi_cache.is_enabled():
+        if not stem.content_hash:
+            stem.content_hash = sha256_field_file(stem.file)
+            stem.save(update_fields=['content_hash'])
+        midi_content = midi_cache.lookup(stem.content_hash)
+    return midi_file, midi_content
+
+
+def convert_song_stems_to_midi_sync(song_id, progress=None):
+    """Convertir a MIDI todos los stems de una canción en paralelo.
+
+    Los hilos solo hacen las llamadas al Space (limitadas por MUSIC_SPACE_CONCURRENCY);
+    cada resultado se guarda desde este hilo en cuanto llega, así las escrituras en
+    la base de datos no compiten entre sí.
+    """
+    song = Song.objects.get(id=song_id)
+    stems = list(song.stems.exclude(midi_file__status='completed'))
+    if not stems:
+        _report(progress, 100, 'Todos los stems ya están convertidos')
+        return {'status': 'success', 'converted': 0, 'failed': 0}
+
+    total = len(stems)
+    converted, failed = 0, 0
+    pending = {}
+
+    _report(progress, 5, 'Buscando MIDI en caché...')
+    for stem in stems:
+        midi_file, midi_content = _prepare_midi_conversion(stem)
+        if midi_content is not None:
+            _save_midi_file(midi_file, stem, midi_content)
+            converted += 1
+        else:
+            pending[stem.id] = (stem, midi_file)
+
+    if pending:
+        space = get_space('midi')
+        _report(progress, 10, 'Conectando con Hugging Face...')
+        client_pool.get(space)
+
+        max_workers = min(len(pending), get_space_concurrency(space))
+        _report(progress, 10 + 90 * converted // total, f'Convirtiendo {len(pending)} stems a MIDI...')
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='midi') as executor:
+            futures = {
+                executor.submit(profiling.bind(_convert_midi), space, stem): stem_id
+                for stem_id, (stem, _) in pending.items()
+            }
+            for future in as_completed(futures):
+                stem, midi_file = pending[futures[future]]
+                try:
+                    midi_content = future.result()
+                    _save_midi_file(midi_file, stem, midi_content)
+                    converted += 1
+                except Exception as e:
+                    logger.error(f"❌ Error convirtiendo stem {stem.id} a MIDI: {e}")
+                    midi_file.status = 'error'
+                    midi_file.error_message = str(e)
+                    midi_file.save()
+                    failed += 1
+
+                done = converted + failed
+                _report(progress, 10 + 90 * done // total, f'{done}/{total} stems convertidos')
+
+    logger.info(f"🎹 Canción {song_id}: {converted} stems convertidos a MIDI, {failed} con error")
+    if not converted:
+        raise Exception(f"No se pudo convertir ningún stem de la canción {song.title}")
+
+    return {
+        'status': 'success' if not failed else 'partial',
+        'converted': converted,
+        'failed': failed,
+    }
+
+
+def _request_generation(space, generated_track):
+    """Generar música en Orpheus a partir del MIDI del track; devuelve las rutas de audio"""
+    with local_path(generated_track.midi_file.file) as input_path:
+        # Llamar a la API con los parámetros correctos de Orpheus
+        result = client_pool.predict(
+            space,
+            input_midi=handle_file(input_path),
+            apply_sustains=True,
+            remove_duplicate_pitches=True,
+            remove_overlapping_durations=True,
+            prime_instruments=[],  # Sin instrumentos prime por defecto
+            num_prime_tokens=6656,
+            num_gen_tokens=512,
+            model_temperature=generated_track.model_temperature,
+            model_top_p=0.96,
+            add_drums=False,
+            add_outro=hasattr(generated_track, 'outro_type') and generated_track.outro_type != 'none',
+            api_name="/generate_music_and_state"
+        )
+    
+    # La API devuelve [audio0, plot0, audio1, plot1, ...]: se conservan todos los audios
+    audio_files = [
+        path for path in (result or [])
+        if isinstance(path, str) and path.lower().endswith(GENERATION_AUDIO_EXTENSIONS) and os.path.exists(path)
+    ]
+    if not audio_files:
+        raise Exception("No se encontraron archivos de audio válidos en el resultado")
+    return audio_files
+
+
+def _store_version_file(generated_track, version_number, path):
+    """Hash, tamaño y guardado en el storage del audio de una versión (sin tocar la base de datos)"""
+    content_hash = sha256_path(path)
+    size = os.path.getsize(path)
+    extension = os.path.splitext(path)[1].lower() or '.wav'
+    filename = GeneratedVersion._meta.get_field('file').generate_filename(
+        None, get_valid_filename(f'{generated_track.title}_v{version_number}{extension}')
+    )
+    name = store_local_file(filename, path, move=True)
+    return name, size, content_hash
+
+
+def _save_generated_audio(generated_track, audio_files):
+    """Guardar todas las versiones generadas como GeneratedVersion y marcar el track como completado"""
+    # Cada versión se hashea y se mueve al storage en paralelo; las filas se crean desde este hilo
+    stored = {}
+    with ThreadPoolExecutor(max_workers=min(len(audio_files), VERSION_SAVE_WORKERS),
+                            thread_name_prefix='version') as executor:
+        futures = {
+            executor.submit(profiling.bind(_store_version_file), generated_track, number, path): number
+            for number, path in enumerate(audio_files, start=1)
+        }
+        for future in as_completed(futures):
+            try:
+                stored[futures[future]] = future.result()
+            except OSError as e:
+                logger.error(f"❌ No se pudo guardar la versión {futures[future]} de '{generated_track.title}': {e}")
+    if not stored:
+        raise Exception("No se pudo guardar ninguna versión generada")
+
+    versions = [
+        GeneratedVersion(track=generated_track, version_number=number, file=name, file_size=size,
+                         content_hash=content_hash)
+        for number, (name, size, content_hash) in sorted(stored.items())
+    ]
+    with transaction.atomic():
+        # Una regeneración del mismo track sustituye a las versiones anteriores
+        for old_version in generated_track.generated_versions.exclude(file=''):
+            old_version.file.storage.delete(old_version.file.name)
+        generated_track.generated_versions.all().delete()
+        GeneratedVersion.objects.bulk_create(versions)
+
+        # generated_file (obsoleto) apunta al audio de la primera versión, sin duplicarlo
+        generated_track.generated_file.name = versions[0].file.name
+        generated_track.content_hash = versions[0].content_hash
+        generated_track.status = 'completed'
+        generated_track.completed_at = timezone.now()
+        generated_track.save()
+    logger.info(f"💾 {len(versions)} versiones guardadas de '{generated_track.title}'")
+    _schedule_derived_audio(generated_track.midi_file.stem.song)
+
+
+def _mark_generation_error(generated_track_id, error):
+    try:
+        generated_track = GeneratedTrack.objects.get(id=generated_track_id)
+        generated_track.status = 'error'
+        generated_track.error_message = str(error)
+        generated_track.save()
+    except Exception as save_error:
+        logger.error(f"❌ Error adicional al guardar estado: {save_error}")
+
+
+def generate_new_track_sync(generated_track_id, progress=None):
     """Generar nueva canción de forma síncrona"""
     try:
         generated_track = GeneratedTrack.objects.get(id=generated_track_id)
         
         # Crear cliente de Hugging Face
-        client = Client("asigalov61/Orpheus-Music-Transformer")
+        _report(progress, 10, 'Conectando con Hugging Face...')
+        space = get_space('orpheus')
+        client_pool.get(space)
         
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mid') as temp_file:
-            generated_track.midi_file.file.seek(0)
-            temp_file.write(generated_track.midi_file.file.read())
-            temp_file_path = temp_file.name
-
-        try:
-            # Llamar a la API con los parámetros correctos de Orpheus
-            result = client.predict(
-                input_midi=handle_file(temp_file_path),
-                apply_sustains=True,
-                remove_duplicate_pitches=True,
-                remove_overlapping_durations=True,
-                prime_instruments=[],  # Sin instrumentos prime por defecto
-                num_prime_tokens=6656,
-                num_gen_tokens=512,
-                model_temperature=generated_track.temperature if hasattr(generated_track, 'temperature') else 0.9,
-                model_top_p=0.96,
-                add_drums=False,
-                add_outro=hasattr(generated_track, 'outro_type') and generated_track.outro_type != 'none',
-                api_name="/generate_music_and_state"
-            )
-            
-            # La API devuelve 20 elementos: [audio0, plot0, audio1, plot1, ..., audio9, plot9]
-            # Solo usamos los 8 primeros audios como solicitas (índices 0, 2, 4, 6, 8, 10, 12, 14)
-            if result and len(result) >= 16:  # Al menos 8 audios disponibles
-                audio_files = []
-                for i in range(0, 16, 2):  # Índices 0, 2, 4, 6, 8, 10, 12, 14
-                    if i < len(result) and result[i] and os.path.exists(result[i]):
-                        audio_files.append(result[i])
-                
-                if audio_files:
-                    # Usar el primer audio generado como resultado principal
-                    first_audio_path = audio_files[0]
-                    with open(first_audio_path, 'rb') as f:
-                        generated_content = f.read()
-                    
-                    filename = f"{generated_track.title}_generated.wav"
-                    generated_track.generated_file.save(filename, ContentFile(generated_content))
-                    generated_track.status = 'completed'
-                    generated_track.completed_at = timezone.now()
-                    generated_track.save()
-                    
-                    logger.info(f"✅ Nueva canción generada exitosamente. {len(audio_files)} variaciones disponibles")
-                    return {'status': 'success', 'generated_track': generated_track.generated_file.url, 'total_variations': len(audio_files)}
-                else:
-                    raise Exception("No se encontraron archivos de audio válidos en el resultado")
-            else:
-                raise Exception("No se pudo generar la nueva canción - resultado insuficiente")
-                
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        _report(progress, 30, 'Generando música con Orpheus...')
+        audio_files = _request_generation(space, generated_track)
+        _save_generated_audio(generated_track, audio_files)
+        
+        logger.info(f"✅ Nueva canción generada exitosamente. {len(audio_files)} variaciones disponibles")
+        return {'status': 'success', 'generated_track': generated_track.generated_file.url, 'total_variations': len(audio_files)}
 
     except Exception as e:
         logger.error(f"❌ Error generando nueva canción: {str(e)}")
-        try:
-            generated_track = GeneratedTrack.objects.get(id=generated_track_id)
-            generated_track.status = 'error'
-            generated_track.error_message = str(e)
-            generated_track.save()
-        except Exception as save_error:
-            logger.error(f"❌ Error adicional al guardar estado: {save_error}")
+        _mark_generation_error(generated_track_id, e)
         raise
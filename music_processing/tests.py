@@ -1,3 +1,1020 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+import uuid
+import wave
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.pagination import InvalidCursor, KeysetPaginator, encode_cursor
+
+from .audio_probe import AudioProbeError, probe_file
+from .downloads import _parse_range
+from .jobs import (
+    SCHEDULER_WINDOW, claim_next_task, enqueue_stem_generation, enqueue_task, enqueue_waveform_generation,
+    get_lease_timeout, get_max_attempts, run_task,
+)
+from .models import (
+    AudioRendition, GeneratedTrack, GeneratedVersion, InflightCall, MidiCacheEntry, MidiFile, ProcessingTask,
+    Song, Stem, StemCacheEntry, UploadSession, WaveformPeaks,
+)
+from .tasks_sync import _prepare_midi_conversion, generate_new_track_sync
+from . import (
+    ingest, midi_cache, previews, progress, resilience, search, separation, singleflight, stem_cache, uploads,
+    waveform,
+)
+
+# Ficheros de las pruebas fuera de MEDIA_ROOT y MUSIC_UPLOAD_DIR
+TEST_DIR = tempfile.mkdtemp(prefix='music_processing_tests_')
+MEDIA_DIR = os.path.join(TEST_DIR, 'media')
+UPLOAD_DIR = os.path.join(TEST_DIR, 'uploads')
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+class ViewQueryCountTests(TestCase):
+    """Las vistas de la biblioteca hacen el mismo número de consultas sea cual sea su tamaño"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('queries', password='secret')
+        self.client.force_login(self.user)
+
+    def add_songs(self, count):
+        """Crear canciones con stems, MIDI, tareas activas y tracks con versiones"""
+        for _ in range(count):
+            n = Song.objects.count()
+            song = Song.objects.create(
+                user=self.user,
+                title=f'Canción {n}',
+                original_file=f'songs/song_{n}.wav',
+                status='stems_completed',
+            )
+            for order, stem_type in enumerate(['drums', 'bass', 'piano']):
+                stem = Stem.objects.create(
+                    song=song, stem_type=stem_type, order=order, file=f'stems/{n}_{stem_type}.wav'
+                )
+                midi_file = MidiFile.objects.create(stem=stem, status='completed', file=f'midi/{n}_{stem_type}.mid')
+
+            for task_type in ['song_midi_conversion', 'stem_generation']:
+                ProcessingTask.objects.create(
+                    user=self.user,
+                    task_type=task_type,
+                    status='in_progress',
+                    celery_task_id=str(uuid.uuid4()),
+                    song=song,
+                )
+
+            track = GeneratedTrack.objects.create(
+                user=self.user, midi_file=midi_file, title=f'Track {n}', status='completed'
+            )
+            for version_number in (1, 2):
+                GeneratedVersion.objects.create(
+                    track=track, version_number=version_number, file=f'generated_tracks/{n}_{version_number}.wav'
+                )
+
+    def assertConstantQueries(self, url_name, expected):
+        url = reverse(url_name)
+        self.add_songs(2)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.add_songs(5)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_stems_view(self):
+        self.assertConstantQueries('music_processing:stems', 6)
+
+    def test_midi_conversion_view(self):
+        self.assertConstantQueries('music_processing:midi_conversion', 6)
+
+    def test_track_generation_view(self):
+        self.assertConstantQueries('music_processing:track_generation', 7)
+
+    def test_tasks_status_api(self):
+        url = reverse('music_processing:tasks_status')
+        for count in (2, 5):
+            self.add_songs(count)
+            ProcessingTask.objects.filter(task_type='stem_generation').update(status='pending')
+            ids = list(ProcessingTask.objects.values_list('celery_task_id', flat=True))
+            with self.assertNumQueries(5):
+                response = self.client.get(url, {'ids': ','.join(ids + ['ajena'])})
+            self.assertEqual(set(response.json()['tasks']), set(ids))
+
+
+@override_settings(MUSIC_SSE_CHECK_INTERVAL=0, MUSIC_SSE_MAX_DURATION=60)
+class ProgressStreamTests(TestCase):
+    """El stream SSE emite solo los cambios avisados por los workers y termina con las tareas"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('stream')
+        song = Song.objects.create(user=self.user, title='Canción', original_file='songs/song.wav')
+        self.task = enqueue_task(self.user, 'stem_generation', song=song)
+
+    def test_stream_follows_published_changes(self):
+        events = progress.stream_events(self.user, [self.task.celery_task_id, 'ajena'])
+        self.assertIn('"status": "pending"', next(events))
+
+        ProcessingTask.objects.filter(pk=self.task.pk).update(status='in_progress', progress_percentage=40)
+        progress.publish(self.task.celery_task_id)
+        self.assertIn('"progress": 40', next(events))
+
+        ProcessingTask.objects.filter(pk=self.task.pk).update(status='completed', progress_percentage=100)
+        progress.publish(self.task.celery_task_id)
+        self.assertIn('"status": "completed"', next(events))
+        self.assertTrue(next(events).startswith('event: end'))
+        self.assertEqual(list(events), [])
+
+    @override_settings(MUSIC_SSE_MAX_DURATION=0)
+    def test_stream_times_out(self):
+        events = list(progress.stream_events(self.user, [self.task.celery_task_id]))
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[-1].startswith('event: timeout'))
+
+
+class TaskLeaseTests(TestCase):
+    """Las tareas de un worker que murió vuelven a la cola (o fallan tras agotar los intentos)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('lease')
+        self.song = Song.objects.create(
+            user=self.user, title='Canción', original_file='songs/song.wav', status='processing_stems'
+        )
+
+    def add_task(self, heartbeat_at, attempts=1):
+        return ProcessingTask.objects.create(
+            user=self.user,
+            task_type='stem_generation',
+            status='in_progress',
+            celery_task_id=str(uuid.uuid4()),
+            song=self.song,
+            started_at=heartbeat_at,
+            heartbeat_at=heartbeat_at,
+            worker_id='otro-host:1234',
+            attempts=attempts,
+        )
+
+    def test_expired_lease_is_claimed_again(self):
+        task = self.add_task(timezone.now() - timedelta(seconds=get_lease_timeout() + 1))
+        claimed = claim_next_task()
+        self.assertEqual(claimed.pk, task.pk)
+        self.assertEqual(claimed.status, 'in_progress')
+        self.assertEqual(claimed.attempts, 2)
+        self.assertNotEqual(claimed.worker_id, 'otro-host:1234')
+
+    def test_live_lease_is_kept(self):
+        task = self.add_task(timezone.now())
+        self.assertIsNone(claim_next_task())
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'in_progress')
+        self.assertEqual(task.worker_id, 'otro-host:1234')
+
+    def test_exhausted_attempts_fail_task(self):
+        task = self.add_task(timezone.now() - timedelta(seconds=get_lease_timeout() + 1), attempts=get_max_attempts())
+        self.assertIsNone(claim_next_task())
+        task.refresh_from_db()
+        self.song.refresh_from_db()
+        self.assertEqual(task.status, 'failed')
+        self.assertEqual(self.song.status, 'error')
+
+    def test_enqueue_recovers_abandoned_task(self):
+        expired = timezone.now() - timedelta(seconds=get_lease_timeout() + 1)
+        task = self.add_task(expired)
+        requeued = enqueue_stem_generation(self.song)
+        self.assertEqual(requeued.pk, task.pk)
+        self.assertEqual(requeued.status, 'pending')
+
+        ProcessingTask.objects.filter(pk=task.pk).update(
+            status='in_progress', heartbeat_at=expired, attempts=get_max_attempts()
+        )
+        new_task = enqueue_stem_generation(self.song)
+        self.assertNotEqual(new_task.pk, task.pk)
+        self.assertEqual(new_task.status, 'pending')
+        self.song.refresh_from_db()
+        self.assertEqual(self.song.status, 'processing_stems')
+
+    def test_result_of_lost_lease_is_dropped(self):
+        task = self.add_task(timezone.now())
+        # Mientras el handler corría, la tarea se devolvió a la cola y la reclamó otro worker
+        ProcessingTask.objects.filter(pk=task.pk).update(worker_id='tercer-host:99')
+        with mock.patch.dict('music_processing.jobs.TASK_HANDLERS', {'stem_generation': lambda t, p: 'ok'}):
+            self.assertIsNone(run_task(task))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'in_progress')
+        self.assertEqual(task.worker_id, 'tercer-host:99')
+
+
+class QueueWindowTests(TestCase):
+    """Una tarea de prioridad baja que lleva mucho esperando no se queda fuera de la ventana"""
+
+    def test_old_low_priority_task_is_claimed(self):
+        user = User.objects.create_user('queue')
+        song = Song.objects.create(user=user, title='Canción', original_file='songs/song.wav')
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(hours=1)):
+            waiting = enqueue_task(user, 'stem_generation', song=song)
+
+        now = timezone.now()
+        ProcessingTask.objects.bulk_create([
+            ProcessingTask(
+                user=user, task_type='waveform_generation', celery_task_id=str(uuid.uuid4()), song=song,
+                priority=0, created_at=now, queue_at=now,
+            )
+            for _ in range(SCHEDULER_WINDOW + 10)
+        ])
+        self.assertEqual(claim_next_task().pk, waiting.pk)
+
+
+class EnqueueTests(TestCase):
+    """Encolar dos veces la misma tarea devuelve la primera"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('enqueue')
+        self.song = Song.objects.create(user=self.user, title='Canción', original_file='songs/song.wav')
+
+    def test_active_task_is_reused(self):
+        first = enqueue_task(self.user, 'stem_generation', song=self.song)
+        self.assertEqual(enqueue_task(self.user, 'stem_generation', song=self.song).pk, first.pk)
+        self.assertEqual(ProcessingTask.objects.filter(song=self.song).count(), 1)
+
+    def test_running_waveform_task_is_not_reused(self):
+        running = enqueue_waveform_generation(self.song)
+        self.assertEqual(enqueue_waveform_generation(self.song).pk, running.pk)
+        ProcessingTask.objects.filter(pk=running.pk).update(
+            status='in_progress', started_at=timezone.now(), heartbeat_at=timezone.now()
+        )
+        self.assertNotEqual(enqueue_waveform_generation(self.song).pk, running.pk)
+
+
+@override_settings(MUSIC_UPLOAD_DIR=UPLOAD_DIR, MEDIA_ROOT=MEDIA_DIR)
+class UploadChunkTests(TestCase):
+    """Las partes de una subida solo se aceptan en el offset en el que termina lo recibido"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('upload')
+        self.session = uploads.create_session(self.user, 'Canción', 'song.wav', 8)
+
+    def test_chunks_and_offset_conflict(self):
+        self.assertEqual(uploads.write_chunk(self.session, 0, io.BytesIO(b'abcd'), 4), 4)
+        with self.assertRaises(uploads.OffsetMismatch) as cm:
+            uploads.write_chunk(self.session, 0, io.BytesIO(b'abcd'), 4)
+        self.assertEqual(cm.exception.offset, 4)
+        self.assertEqual(cm.exception.status, 409)
+
+        self.assertEqual(uploads.write_chunk(self.session, 4, io.BytesIO(b'efgh'), 4), 8)
+        self.session.refresh_from_db()
+        song, created = uploads.finalize(self.session)
+        self.assertTrue(created)
+        self.assertEqual(song.content_hash, hashlib.sha256(b'abcdefgh').hexdigest())
+
+    def test_offset_is_checked_again_under_lock(self):
+        session = self.session
+
+        class RacingStream(io.BytesIO):
+            # Otra petición avanza la subida mientras se lee el cuerpo de esta
+            def read(self, size=-1):
+                UploadSession.objects.filter(pk=session.pk).update(offset=2)
+                return super().read(size)
+
+        with self.assertRaises(uploads.OffsetMismatch) as cm:
+            uploads.write_chunk(session, 0, RacingStream(b'abcd'), 4)
+        self.assertEqual(cm.exception.offset, 2)
+        self.assertEqual(os.path.getsize(uploads.partial_path(session)), 0)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_DIR, MUSIC_PREVIEW_MODE='lazy')
+class PreviewTests(TestCase):
+    """En modo perezoso la conversión se encola y mientras tanto se sirve el original"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('preview', password='secret')
+        self.client.force_login(self.user)
+        self.song = Song.objects.create(user=self.user, title='Canción', original_file='songs/song.wav')
+        self.stem = Stem(song=self.song, stem_type='piano', order=0, content_hash='a' * 64)
+        self.stem.file.save('piano.wav', ContentFile(b'RIFF' + b'\0' * 60))
+
+    def test_missing_preview_serves_original(self):
+        url = reverse('music_processing:preview', args=['stem', self.stem.id])
+        with mock.patch('music_processing.previews.is_available', return_value=True):
+            response = self.client.get(url)
+            self.client.get(url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'RIFF' + b'\0' * 60)
+        self.assertEqual(
+            ProcessingTask.objects.filter(song=self.song, task_type='preview_generation').count(), 1
+        )
+
+    def test_evict_checks_references_in_bulk(self):
+        for i in range(5):
+            rendition = AudioRendition(content_hash=f'{i}' * 64, audio_format='opus', bitrate=64, file_size=10)
+            rendition.file.save(f'{i}.ogg', ContentFile(b'0' * 10))
+        AudioRendition.objects.create(content_hash='a' * 64, audio_format='opus', bitrate=64, file_size=10)
+
+        # Total, lista y una consulta por modelo; luego un DELETE por rendición expulsada
+        with self.assertNumQueries(5 + 3):
+            self.assertEqual(previews.evict(max_bytes=30), 3)
+        # La referenciada por el stem se conserva aunque sea la más reciente de expulsar
+        self.assertTrue(AudioRendition.objects.filter(content_hash='a' * 64).exists())
+
+
+class RangeParsingTests(TestCase):
+    """Cabeceras Range admitidas por las descargas"""
+
+    def test_parse_range(self):
+        cases = {
+            'bytes=0-99': (0, 99),
+            'bytes=10-': (10, 999),
+            'bytes=990-2000': (990, 999),  # el final se recorta al tamaño
+            'bytes=-100': (900, 999),  # sufijo: los últimos 100 bytes
+            'bytes=-5000': (0, 999),
+            ' bytes=5-5 ': (5, 5),
+            'bytes=0-1,5-9': None,  # multirango: fichero completo
+            'items=0-9': None,
+            'bytes=-': None,
+            'bytes=1000-': 'invalid',
+            'bytes=20-10': 'invalid',
+            'bytes=-0': 'invalid',
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(_parse_range(header, 1000), expected)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_DIR)
+class DownloadTests(TestCase):
+    """Descargas con Range, peticiones condicionales y la extensión real del fichero"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('download', password='secret')
+        self.client.force_login(self.user)
+        self.song = Song(user=self.user, title='Demo')
+        self.song.original_file.save('song.mp3', ContentFile(b'0123456789'))
+        self.url = reverse('music_processing:download_file', args=['song', self.song.id])
+
+    def test_full_download_keeps_extension(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('Demo_original.mp3', response['Content-Disposition'])
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_serves_full_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"otro"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+def write_temp_file(content, suffix='.wav'):
+    """Fichero temporal como los que devuelve el cliente de Gradio"""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=TEST_DIR)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    return path
+
+
+def wav_bytes(seconds, sample_rate=8000, channels=1, sample=b'\x00\x00'):
+    """WAV PCM de 16 bits con todas las muestras iguales a `sample`"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(sample * channels * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_DIR, MUSIC_STEM_CACHE_ENABLED=True)
+class StemCacheTests(TestCase):
+    """Los stems de un audio ya separado se reutilizan sin copiar sus ficheros"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('stemcache')
+        self.audio_hash = 'c' * 64
+
+    def add_song(self):
+        return Song.objects.create(
+            user=self.user, title='Canción', original_file='songs/song.wav', content_hash=self.audio_hash
+        )
+
+    def cache_stems(self, song):
+        files = [
+            stem_cache.store_file(self.audio_hash, i, stem_type, write_temp_file(stem_type.encode()))
+            for i, stem_type in enumerate(['vocals', 'drums'])
+        ]
+        for f in files:
+            stem_cache.create_stem(song, f)
+        return stem_cache.store(self.audio_hash, files)
+
+    def test_lookup_hit_and_miss(self):
+        self.assertIsNone(stem_cache.lookup(self.audio_hash))
+        entry = self.cache_stems(self.add_song())
+        self.assertEqual(entry.size_bytes, len(b'vocals') + len(b'drums'))
+
+        self.assertEqual(stem_cache.lookup(self.audio_hash).pk, entry.pk)
+        stats = stem_cache.get_stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses']), (1, 1, 1))
+
+    def test_duplicate_song_shares_files(self):
+        first = self.add_song()
+        entry = self.cache_stems(first)
+        second = self.add_song()
+        stems = stem_cache.create_stems(second, stem_cache.lookup(self.audio_hash))
+        self.assertEqual(
+            [stem.file.name for stem in stems],
+            [stem.file.name for stem in first.stems.order_by('order')],
+        )
+        self.assertEqual([f['order'] for f in entry.files], [0, 1])
+
+    def test_lookup_misses_when_a_file_is_gone(self):
+        entry = self.cache_stems(self.add_song())
+        default_storage.delete(entry.files[0]['name'])
+        self.assertIsNone(stem_cache.lookup(self.audio_hash))
+
+    def test_evict_keeps_referenced_entries(self):
+        referenced = self.cache_stems(self.add_song())
+        orphan = StemCacheEntry.objects.create(
+            audio_hash='d' * 64, files=[{'order': 0, 'stem_type': 'vocals', 'name': 'stem_cache/dd/x/0_vocals.wav'}],
+            size_bytes=100, last_used_at=timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(stem_cache.evict(max_bytes=0), 1)
+        self.assertTrue(StemCacheEntry.objects.filter(pk=referenced.pk).exists())
+        self.assertFalse(StemCacheEntry.objects.filter(pk=orphan.pk).exists())
+
+
+class MidiCacheTests(TestCase):
+    """Las conversiones a MIDI se reutilizan por hash del stem hasta que caducan"""
+
+    def test_store_and_lookup(self):
+        self.assertIsNone(midi_cache.lookup('e' * 64))
+        midi_cache.store('e' * 64, b'MThd')
+        self.assertEqual(midi_cache.lookup('e' * 64), b'MThd')
+
+        # Guardar otra vez el mismo stem renueva la entrada en lugar de duplicarla
+        midi_cache.store('e' * 64, b'MThd2')
+        self.assertEqual(midi_cache.lookup('e' * 64), b'MThd2')
+        stats = midi_cache.get_stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses']), (1, 2, 1))
+
+    def test_expired_entries(self):
+        midi_cache.store('f' * 64, b'MThd')
+        MidiCacheEntry.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(midi_cache.lookup('f' * 64))
+        self.assertEqual(midi_cache.get_stats()['expired'], 1)
+        self.assertEqual(midi_cache.purge(expired_only=True), 1)
+        self.assertEqual(MidiCacheEntry.objects.count(), 0)
+
+    @override_settings(MEDIA_ROOT=MEDIA_DIR, MUSIC_MIDI_CACHE_ENABLED=True)
+    def test_cached_stem_skips_the_space(self):
+        user = User.objects.create_user('midicache')
+        song = Song.objects.create(user=user, title='Canción', original_file='songs/song.wav')
+        stem = Stem(song=song, stem_type='piano', order=0)
+        stem.file.save('piano.wav', ContentFile(b'piano'))
+        midi_cache.store(hashlib.sha256(b'piano').hexdigest(), b'MThd')
+
+        midi_file, midi_content = _prepare_midi_conversion(stem)
+        self.assertEqual(midi_content, b'MThd')
+        self.assertEqual(midi_file.status, 'processing')
+        self.assertEqual(stem.content_hash, hashlib.sha256(b'piano').hexdigest())
+
+
+class KeysetPaginationTests(TestCase):
+    """Los cursores recorren el listado en ambos sentidos sin saltarse ni repetir filas"""
+
+    def setUp(self):
+        user = User.objects.create_user('pages')
+        now = timezone.now()
+        # Varias canciones comparten fecha: el id deshace los empates
+        Song.objects.bulk_create([
+            Song(user=user, title=f'Canción {i}', original_file='songs/song.wav',
+                 uploaded_at=now - timedelta(minutes=i // 3))
+            for i in range(11)
+        ])
+        self.expected = list(Song.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+        self.paginator = KeysetPaginator(Song.objects.all(), 4, ('-uploaded_at', '-id'), count_mode='exact')
+
+    def ids(self, page):
+        return [song.id for song in page]
+
+    def test_after_and_before_round_trip(self):
+        pages = [self.paginator.page()]
+        while pages[-1].has_next:
+            pages.append(self.paginator.page(after=pages[-1].next_cursor))
+        self.assertEqual([id_ for page in pages for id_ in self.ids(page)], self.expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertFalse(pages[0].has_previous)
+
+        # Hacia atrás desde la última página se vuelve exactamente a las mismas páginas
+        previous = self.paginator.page(before=pages[2].previous_cursor)
+        self.assertEqual(self.ids(previous), self.ids(pages[1]))
+        self.assertTrue(previous.has_previous)
+        first = self.paginator.page(before=previous.previous_cursor)
+        self.assertEqual(self.ids(first), self.ids(pages[0]))
+        self.assertFalse(first.has_previous)
+
+    def test_before_near_the_start_returns_full_first_page(self):
+        second = self.paginator.page(after=encode_cursor([
+            Song.objects.get(pk=self.expected[1]).uploaded_at, self.expected[1],
+        ]))
+        self.assertEqual(self.ids(second)[0], self.expected[2])
+        self.assertEqual(self.ids(self.paginator.page(before=second.previous_cursor)), self.expected[:4])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(after='no-es-un-cursor')
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(after=encode_cursor([1]))
+        self.assertEqual(self.ids(self.paginator.get_page(after='no-es-un-cursor')), self.expected[:4])
+
+    def test_counts(self):
+        self.assertEqual((self.paginator.count, self.paginator.count_is_exact), (11, True))
+        approximate = KeysetPaginator(Song.objects.all(), 4, ('-uploaded_at', '-id'),
+                                      count_mode='approximate', count_limit=5)
+        self.assertFalse(approximate.count_is_exact)
+        self.assertGreaterEqual(approximate.count, 5)
+
+
+class SearchTests(TestCase):
+    """Búsqueda por prefijo, sin acentos y limitada a la biblioteca del usuario"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('search')
+        other = User.objects.create_user('search-other')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ballad = Song.objects.create(user=self.user, title='Balada en Re menor',
+                                              original_file='songs/ultima_toma.wav')
+            self.rock = Song.objects.create(user=self.user, title='Rock del garaje',
+                                            original_file='songs/balada_demo.wav')
+            Stem.objects.create(song=self.rock, stem_type='piano', file='stems/piano.wav')
+            Song.objects.create(user=other, title='Balada ajena', original_file='songs/otra.wav')
+            # bm25 solo puntúa los términos que no aparecen en la mayoría de documentos
+            for i in range(6):
+                Song.objects.create(user=other, title=f'Tema {i}', original_file=f'songs/tema_{i}.wav')
+
+    def test_backend(self):
+        # El SQLite de los tests se compila con FTS5: la migración 0013 crea el índice
+        self.assertEqual(search.get_backend(), 'sqlite')
+
+    def test_prefix_terms_without_accents(self):
+        self.assertEqual(search.get_terms('  Canción—ÚLTIMA, toma!  '), ['cancion', 'ultima', 'toma'])
+        songs = Song.objects.filter(user=self.user)
+        self.assertEqual(list(search.filter_songs(songs, self.user, 'balá men')), [self.ballad])
+        self.assertEqual(list(search.filter_songs(songs, self.user, 'garaje pia')), [self.rock])
+        self.assertFalse(search.filter_songs(songs, self.user, '¿?').exists())
+
+    def test_title_ranks_above_filename(self):
+        results = search.search_songs(self.user, 'balada')
+        self.assertEqual(results, [self.ballad, self.rock])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_fallback_without_index(self):
+        with mock.patch.object(search, 'get_backend', return_value=None):
+            results = search.search_songs(self.user, 'balada')
+        self.assertCountEqual(results, [self.ballad, self.rock])
+        self.assertTrue(all(song.search_rank is None for song in results))
+
+    def test_document_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rock.title = 'Vals'
+            self.rock.save(update_fields=['title'])
+        self.assertEqual(search.search_songs(self.user, 'garaje'), [])
+        self.assertEqual(search.search_songs(self.user, 'vals'), [self.rock])
+
+
+# MPEG-1 capa III, 128 kbps, 44100 Hz, estéreo, sin padding: frames de 417 bytes
+MP3_FRAME = b'\xff\xfb\x90\x00' + bytes(413)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_DIR)
+class AudioProbeTests(TestCase):
+    """Metadatos leídos de las cabeceras, sin decodificar el audio"""
+
+    def test_wav(self):
+        info = probe_file(io.BytesIO(wav_bytes(2.5, sample_rate=22050, channels=2)))
+        self.assertEqual(info, {
+            'format': 'wav', 'duration': 2.5, 'sample_rate': 22050, 'channels': 2,
+            'bitrate': 22050 * 2 * 16, 'bits_per_sample': 16,
+        })
+
+    def test_wav_with_wrong_data_size(self):
+        # Grabadores que dejan el tamaño del chunk data a 0: se usa el resto del fichero
+        content = bytearray(wav_bytes(1))
+        content[40:44] = bytes(4)
+        self.assertEqual(probe_file(io.BytesIO(bytes(content)))['duration'], 1.0)
+
+    def test_cbr_mp3_after_id3_tag(self):
+        tag = b'ID3\x04\x00\x00\x00\x00\x00\x14' + bytes(20)
+        info = probe_file(io.BytesIO(tag + MP3_FRAME * 100))
+        self.assertEqual(info['format'], 'mp3')
+        self.assertEqual((info['sample_rate'], info['channels'], info['bitrate']), (44100, 2, 128000))
+        self.assertAlmostEqual(info['duration'], 417 * 100 * 8 / 128000, places=3)
+
+    def test_not_audio(self):
+        with self.assertRaises(AudioProbeError):
+            probe_file(io.BytesIO(b'esto no es audio' * 10))
+
+    def test_ingest_song(self):
+        user = User.objects.create_user('probe')
+        song = Song.objects.create(user=user, title='Canción', original_file='')
+        song.original_file.save('probe.wav', ContentFile(wav_bytes(3)))
+        ingest.ingest_song(song)
+        song.refresh_from_db()
+        self.assertEqual((song.duration, song.sample_rate, song.channels), (3.0, 8000, 1))
+        self.assertEqual(song.file_size, song.original_file.size)
+
+        broken = Song.objects.create(user=user, title='Rota', original_file='')
+        broken.original_file.save('broken.wav', ContentFile(b'RIFF' + bytes(20)))
+        with self.assertLogs('music_processing.ingest', 'WARNING'):
+            self.assertIsNone(ingest.ingest_song(broken))
+        broken.refresh_from_db()
+        self.assertEqual(broken.file_size, 24)
+        self.assertIsNone(broken.duration)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_DIR, MUSIC_WAVEFORM_POINTS=10)
+class WaveformTests(TestCase):
+    """Picos por bloques, una vez por hash, y su API"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('waveform')
+        self.client.force_login(self.user)
+
+    def wav_file(self, frames, channels=1):
+        """WAV de 8000 Hz con las muestras de `frames` (una tupla por frame)"""
+        path = write_temp_file(b'')
+        with wave.open(path, 'wb') as w:
+            w.setnchannels(channels)
+            w.setsampwidth(2)
+            w.setframerate(8000)
+            w.writeframes(b''.join(struct.pack(f'<{channels}h', *frame) for frame in frames))
+        return path
+
+    def add_song(self, content):
+        song = Song.objects.create(user=self.user, title='Canción', original_file='')
+        song.original_file.save('waveform.wav', ContentFile(content))
+        return song
+
+    def test_peaks_follow_the_audio(self):
+        # Silencio y luego -16384, en más de un bloque de lectura y con el cambio justo entre dos puntos
+        half = waveform.FINE_FRAMES * 160
+        self.assertGreater(half * 2, waveform.READ_FRAMES)
+        path = self.wav_file([(0,)] * half + [(-16384,)] * half)
+        data, duration = waveform.compute_peaks(path)
+        self.assertEqual(duration, half * 2 / 8000)
+        self.assertEqual(waveform.peaks_to_list(data), [0, 0] * 5 + [-64, -64] * 5)
+
+    def test_channels_are_combined(self):
+        path = self.wav_file([(0, 16384), (-8192, 0)] * 1000, channels=2)
+        data, duration = waveform.compute_peaks(path, points=4)
+        self.assertEqual(duration, 0.25)
+        self.assertEqual(waveform.peaks_to_list(data), [-32, 64] * 4)
+
+    def test_empty_audio(self):
+        self.assertEqual(waveform.compute_peaks(self.wav_file([])), (b'', 0.0))
+
+    def test_peaks_are_computed_once_per_hash(self):
+        content = wav_bytes(1, sample=struct.pack('<h', 16384))
+        songs = [self.add_song(content), self.add_song(content)]
+        with mock.patch.object(waveform, 'compute_peaks', wraps=waveform.compute_peaks) as compute:
+            results = [waveform.generate_song_waveforms(song.pk) for song in songs]
+        compute.assert_called_once()
+        self.assertEqual([r['computed'] for r in results], [1, 1])
+        self.assertEqual(WaveformPeaks.objects.count(), 1)
+        self.assertEqual(songs[1].content_hash, songs[0].content_hash)
+
+    def test_api(self):
+        song = self.add_song(wav_bytes(1, sample=struct.pack('<h', 16384)))
+        url = reverse('music_processing:waveform', args=['song', song.pk])
+
+        with self.captureOnCommitCallbacks():
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+        # Una tarea ya encolada no se vuelve a encolar
+        self.assertEqual(self.client.get(url).json()['task_id'], response.json()['task_id'])
+
+        waveform.generate_song_waveforms(song.pk)
+        response = self.client.get(url)
+        self.assertEqual(response.json()['peaks'], [64, 64] * 10)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        binary = self.client.get(url, {'format': 'bin'})
+        self.assertEqual((binary.content, binary['X-Waveform-Points']), (bytes([64]) * 20, '10'))
+
+
+@override_settings(MUSIC_SEGMENTED_SEPARATION=True, MUSIC_SEGMENT_SECONDS=4, MUSIC_SEGMENT_OVERLAP=0.5,
+                   MUSIC_SEGMENT_MIN_DURATION=5)
+class SegmentedSeparationTests(TestCase):
+    """Los segmentos cubren la canción y al unirlos se recupera su longitud exacta"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(dir=TEST_DIR)
+        # 10 s de una rampa en diente de sierra, estéreo, a 8000 Hz
+        self.input_path = os.path.join(self.work_dir, 'song.wav')
+        self.frames = [(i % 2000 - 1000, 1000 - i % 2000) for i in range(80000)]
+        with wave.open(self.input_path, 'wb') as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(8000)
+            w.writeframes(b''.join(struct.pack('<2h', *frame) for frame in self.frames))
+
+    def read_frames(self, path):
+        with wave.open(path, 'rb') as w:
+            raw = w.readframes(w.getnframes())
+        return list(struct.iter_unpack('<2h', raw))
+
+    def assertSameAudio(self, path):
+        frames = self.read_frames(path)
+        self.assertEqual(len(frames), len(self.frames))
+        # El fundido cruzado de dos copias de la misma señal solo puede diferir por redondeo
+        self.assertLessEqual(max(abs(a - b) for frame, expected in zip(frames, self.frames)
+                                 for a, b in zip(frame, expected)), 1)
+
+    def test_plan_segments(self):
+        self.assertEqual(separation.plan_segments(300, 120, 2), [(0.0, 120), (118.0, 120), (236.0, 64.0)])
+        # Un último trozo demasiado corto se suma al anterior
+        self.assertEqual(separation.plan_segments(245, 120, 2), [(0.0, 120), (118.0, 127.0)])
+        self.assertEqual(separation.plan_segments(60, 120, 2), [(0.0, 60)])
+        with self.assertRaises(separation.SeparationError):
+            separation.plan_segments(300, 4, 2)
+
+    def test_cut_and_stitch_keep_the_length(self):
+        segments = separation.plan_segments(10)
+        self.assertEqual(segments, [(0.0, 4), (3.5, 4), (7.0, 3.0)])
+        paths = [
+            separation.cut_segment(self.input_path, os.path.join(self.work_dir, f'segment_{i}.wav'), start, length)
+            for i, (start, length) in enumerate(segments)
+        ]
+        self.assertEqual([len(self.read_frames(path)) for path in paths], [32000, 32000, 24000])
+        output = separation.stitch(paths, os.path.join(self.work_dir, 'stitched.wav'), 0.5)
+        self.assertSameAudio(output)
+
+    def test_separate_by_segments(self):
+        calls = []
+
+        def fake_predict(space, segment_path):
+            # Separación "identidad": cada stem es una copia del segmento; el primero llega incompleto
+            calls.append(segment_path)
+            if len(calls) == 1:
+                return []
+            stems = []
+            for i in range(separation.STEM_COUNT):
+                stems.append(shutil.copy(segment_path, f'{segment_path}.stem{i}.wav'))
+            return stems
+
+        with mock.patch.object(separation, 'predict_whole', side_effect=fake_predict), \
+                mock.patch.object(separation.time, 'sleep'), \
+                override_settings(MUSIC_SPACE_CONCURRENCY={'stems': 1}), \
+                self.assertLogs('music_processing.separation', 'WARNING'):
+            stems = separation.separate('stems', self.input_path, self.work_dir)
+
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(len(stems), separation.STEM_COUNT)
+        for path in stems:
+            self.assertSameAudio(path)
+        self.assertFalse([name for name in os.listdir(self.work_dir) if name.startswith('segment_') and
+                          name.endswith('.wav') and '.stem' not in name])
+
+    def test_short_song_is_separated_whole(self):
+        with mock.patch.object(separation, 'predict_whole', return_value=['whole']) as predict:
+            self.assertEqual(separation.separate('stems', self.input_path, self.work_dir, duration=4), ['whole'])
+        predict.assert_called_once_with('stems', self.input_path)
+
+
+def http_error(status):
+    request = httpx.Request('POST', 'https://example.hf.space/run/predict')
+    return httpx.HTTPStatusError(f'HTTP {status}', request=request, response=httpx.Response(status, request=request))
+
+
+@override_settings(MUSIC_HF_MAX_RETRIES=2, MUSIC_HF_CIRCUIT_THRESHOLD=2, MUSIC_HF_CIRCUIT_RESET=60)
+class ResilienceTests(TestCase):
+    """Reintentos según el tipo de error y circuito cerrado → abierto → semiabierto"""
+
+    space = 'tests/space'
+
+    def setUp(self):
+        resilience.breaker.reset(self.space)
+        resilience.reset_metrics(self.space)
+        sleep = mock.patch.object(resilience.time, 'sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def call(self, *outcomes):
+        """Llamar al Space con una función que devuelve o lanza cada resultado por orden"""
+        func = mock.Mock(side_effect=list(outcomes))
+        return resilience.call(self.space, func), func
+
+    def expire_circuit(self):
+        """Simular que ya pasó MUSIC_HF_CIRCUIT_RESET desde que se abrió"""
+        resilience.cache.set(resilience._key(self.space, 'opened_until'), resilience.time.time() - 1, timeout=None)
+
+    def test_classify(self):
+        self.assertEqual(resilience.classify(http_error(503)), resilience.UNAVAILABLE)
+        self.assertEqual(resilience.classify(http_error(429)), resilience.THROTTLED)
+        self.assertEqual(resilience.classify(http_error(422)), resilience.PERMANENT)
+        self.assertEqual(resilience.classify(httpx.ConnectTimeout('timeout')), resilience.UNAVAILABLE)
+        self.assertEqual(resilience.classify(ValueError('You have exceeded your GPU quota')), resilience.THROTTLED)
+        self.assertEqual(resilience.classify(ValueError('Invalid file')), resilience.PERMANENT)
+        self.assertEqual(resilience.retry_hint(ValueError('Quota exceeded. Retry in 0:01:30')), 90)
+
+    def test_transient_errors_are_retried(self):
+        with self.assertLogs('music_processing.resilience', 'WARNING'):
+            result, func = self.call(TimeoutError('timed out'), http_error(429), 'ok')
+        self.assertEqual((result, func.call_count, self.sleep.call_count), ('ok', 3, 2))
+        metrics = resilience.get_metrics(self.space)
+        self.assertEqual((metrics['retries'], metrics['successes'], metrics['circuit']), (2, 1, 'closed'))
+        self.assertEqual(metrics['consecutive_failures'], 0)
+
+    def test_permanent_errors_fail_at_once(self):
+        with self.assertRaises(ValueError):
+            self.call(ValueError('Invalid file'), 'ok')
+        self.sleep.assert_not_called()
+
+    def test_long_quota_wait_is_not_retried(self):
+        with self.assertRaises(ValueError), override_settings(MUSIC_HF_BACKOFF_MAX=60):
+            self.call(ValueError('Quota exceeded. Retry in 0:05:00'), 'ok')
+        self.sleep.assert_not_called()
+
+    def test_circuit_opens_then_probes(self):
+        # Dos caídas seguidas abren el circuito y se deja de reintentar
+        with self.assertLogs('music_processing.resilience', 'WARNING'), self.assertRaises(ConnectionError):
+            self.call(ConnectionError('down'), ConnectionError('down'), 'ok')
+        self.assertEqual(resilience.breaker.state(self.space)[0], 'open')
+        with self.assertRaises(resilience.CircuitOpen):
+            self.call('ok')
+
+        # Pasada la espera, solo una llamada prueba el Space; si falla vuelve a abrirse
+        self.expire_circuit()
+        self.assertEqual(resilience.breaker.state(self.space)[0], 'half_open')
+        self.assertTrue(resilience.breaker.before_call(self.space))
+        with self.assertRaises(resilience.CircuitOpen):
+            resilience.breaker.before_call(self.space)
+        with self.assertLogs('music_processing.resilience', 'WARNING'):
+            self.assertTrue(resilience.breaker.record_failure(self.space, probing=True))
+        self.assertEqual(resilience.breaker.state(self.space)[0], 'open')
+
+        # Una prueba correcta lo cierra
+        self.expire_circuit()
+        result, func = self.call('ok')
+        self.assertEqual(result, 'ok')
+        metrics = resilience.get_metrics(self.space)
+        self.assertEqual((metrics['circuit'], metrics['consecutive_failures']), ('closed', 0))
+        self.assertEqual(metrics['rejected'], 2)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_circuit_is_disabled_on_local_caches(self):
+        with self.assertLogs('music_processing.resilience', 'WARNING'), self.assertRaises(ConnectionError):
+            self.call(*[ConnectionError('down')] * 3)
+        self.assertEqual(resilience.breaker.state(self.space)[0], 'disabled')
+        result, func = self.call('ok')
+        self.assertEqual(result, 'ok')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_DIR)
+class GeneratedVersionTests(TestCase):
+    """Cada audio que devuelve Orpheus se guarda como una GeneratedVersion"""
+
+    def setUp(self):
+        user = User.objects.create_user('versions')
+        song = Song.objects.create(user=user, title='Canción', original_file='songs/song.wav')
+        stem = Stem.objects.create(song=song, stem_type='piano', file='stems/piano.wav')
+        midi_file = MidiFile.objects.create(stem=stem, status='completed')
+        midi_file.file.save('piano.mid', ContentFile(b'MThd'))
+        self.track = GeneratedTrack.objects.create(user=user, midi_file=midi_file, title='Nueva',
+                                                   model_temperature=1.2)
+
+    def generate(self, *contents):
+        """Generar con un Orpheus falso que devuelve [audio, gráfico, audio, gráfico, ...]"""
+        result = []
+        for content in contents:
+            result += [write_temp_file(content), write_temp_file(b'PNG', suffix='.png')]
+        with mock.patch('music_processing.tasks_sync.client_pool') as pool:
+            pool.predict.return_value = result
+            generate_new_track_sync(self.track.pk)
+        self.track.refresh_from_db()
+        return pool.predict.call_args
+
+    def test_every_audio_is_a_version(self):
+        call = self.generate(b'uno', b'dos', b'tres')
+        self.assertEqual(call.kwargs['model_temperature'], 1.2)
+
+        versions = list(self.track.generated_versions.all())
+        self.assertEqual([v.version_number for v in versions], [1, 2, 3])
+        self.assertEqual([v.file.read() for v in versions], [b'uno', b'dos', b'tres'])
+        self.assertEqual([v.file_size for v in versions], [3, 3, 4])
+        self.assertEqual(versions[1].content_hash, hashlib.sha256(b'dos').hexdigest())
+        # generated_file es el audio de la primera versión, sin copiarlo
+        self.assertEqual(self.track.status, 'completed')
+        self.assertEqual(self.track.generated_file.name, versions[0].file.name)
+        self.assertEqual(self.track.content_hash, versions[0].content_hash)
+
+    def test_regeneration_replaces_versions(self):
+        self.generate(b'uno', b'dos')
+        old_names = [v.file.name for v in self.track.generated_versions.all()]
+        self.generate(b'otra')
+        self.assertEqual([v.file.read() for v in self.track.generated_versions.all()], [b'otra'])
+        self.assertFalse(any(default_storage.exists(name) for name in old_names))
+
+    def test_result_without_audio_fails_the_track(self):
+        with self.assertRaises(Exception), self.assertLogs('music_processing.tasks_sync', 'ERROR'):
+            self.generate()
+        self.track.refresh_from_db()
+        self.assertEqual(self.track.status, 'error')
+        self.assertFalse(self.track.generated_versions.exists())
+
+
+@override_settings(MUSIC_SINGLEFLIGHT_TIMEOUT=60)
+class SingleFlightTests(TestCase):
+    """Una sola llamada por Space, audio y parámetros; el resto espera su resultado"""
+
+    space = 'tests/stems'
+    input_hash = 'd' * 64
+
+    def other_process_call(self, **fields):
+        """Fila de una llamada que está haciendo otro proceso"""
+        return InflightCall.objects.create(
+            key=singleflight.flight_key(self.space, self.input_hash), space=self.space,
+            input_hash=self.input_hash, owner='otro-host:1', **fields
+        )
+
+    def enter(self, on_sleep=None):
+        with mock.patch.object(singleflight.time, 'sleep', side_effect=on_sleep) as sleep:
+            with singleflight.single_flight(self.space, self.input_hash) as leader:
+                pass
+        return leader, sleep.call_count
+
+    def test_flight_key(self):
+        self.assertEqual(singleflight.flight_key('a', 'h', {'x': 1, 'y': 2}),
+                         singleflight.flight_key('a', 'h', {'y': 2, 'x': 1}))
+        self.assertNotEqual(singleflight.flight_key('a', 'h', {'x': 1}), singleflight.flight_key('a', 'h'))
+
+    def test_leader_then_reuse_of_finished_row(self):
+        self.assertEqual(self.enter(), (True, 0))
+        self.assertEqual(InflightCall.objects.get().status, 'completed')
+        # La fila terminada la reclama la siguiente llamada con el mismo audio
+        self.assertEqual(self.enter(), (True, 0))
+        self.assertEqual(InflightCall.objects.count(), 1)
+
+    def test_waiter_uses_the_running_result(self):
+        call = self.other_process_call()
+
+        def finish(_):
+            InflightCall.objects.filter(pk=call.pk).update(status='completed')
+
+        with self.assertLogs('music_processing.singleflight', 'INFO'):
+            self.assertEqual(self.enter(finish), (False, 1))
+        self.assertEqual(InflightCall.objects.get().waiters, 1)
+
+    def test_waiter_gets_the_same_error(self):
+        call = self.other_process_call()
+
+        def fail(_):
+            InflightCall.objects.filter(pk=call.pk).update(status='failed', error_message='Space caído')
+
+        with self.assertLogs('music_processing.singleflight', 'INFO'), \
+                self.assertRaisesMessage(singleflight.InflightCallFailed, 'Space caído'):
+            self.enter(fail)
+
+    def test_stale_call_is_taken_over(self):
+        self.other_process_call(started_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.enter(), (True, 0))
+        self.assertEqual(InflightCall.objects.get().status, 'completed')
+
+    def test_error_in_leader_marks_the_row_failed(self):
+        with self.assertRaises(RuntimeError):
+            with singleflight.single_flight(self.space, self.input_hash):
+                raise RuntimeError('sin respuesta')
+        call = InflightCall.objects.get()
+        self.assertEqual((call.status, call.error_message), ('failed', 'sin respuesta'))
+
+    def test_disabled_or_without_hash(self):
+        with singleflight.single_flight(self.space, self.input_hash, enabled=False) as leader:
+            self.assertTrue(leader)
+        with singleflight.single_flight(self.space, '') as leader:
+            self.assertTrue(leader)
+        self.assertFalse(InflightCall.objects.exists())
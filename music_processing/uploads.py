@@ -0,0 +1,219 @@
+# Subidas por partes y reanudables (al estilo de tus): init → PATCH por offset → finalize
+#
+# Cada parte se lee por bloques del cuerpo de la petición a un temporal de
+# MUSIC_UPLOAD_DIR, así que la memoria por subida está acotada por UPLOAD_BUFFER_SIZE (y
+# nunca supera MUSIC_UPLOAD_CHUNK_SIZE). Solo después se bloquea la fila de la subida para
+# comprobar el offset y añadir la parte al fichero parcial: un cliente lento no retiene el
+# bloqueo (ni la conexión a la base de datos) mientras envía. El sha256 se calcula
+# al vuelo en el proceso que recibe las partes; si una parte llega a otro proceso (o
+# tras un reinicio) el hash se recalcula desde el disco al finalizar.
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .fileio import save_local_file, sha256_path
+from .ingest import ingest_song
+from .models import Song, UploadSession
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = ('mp3', 'wav', 'flac', 'aac', 'm4a')
+UPLOAD_BUFFER_SIZE = 64 * 1024
+
+_hashers = {}  # id de la subida -> (offset hasta el que se ha calculado, objeto sha256)
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Error de una subida; `status` es el código HTTP con el que responder"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class OffsetMismatch(UploadError):
+    """La parte no empieza donde termina lo ya recibido"""
+
+    def __init__(self, offset):
+        super().__init__(f'El offset esperado es {offset}', status=409)
+        self.offset = offset
+
+
+def get_upload_dir():
+    return str(getattr(settings, 'MUSIC_UPLOAD_DIR', os.path.join(settings.BASE_DIR, 'uploads_tmp')))
+
+
+def get_chunk_size():
+    return getattr(settings, 'MUSIC_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+
+
+def get_max_size():
+    return getattr(settings, 'MUSIC_UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+
+
+def partial_path(session):
+    return os.path.join(get_upload_dir(), f'{session.pk}.part')
+
+
+def _discard(session):
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    path = partial_path(session)
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def purge_expired(user=None):
+    """Eliminar las subidas sin terminar que han caducado; devuelve cuántas"""
+    expired = UploadSession.objects.filter(status='active', expires_at__lt=timezone.now())
+    if user is not None:
+        expired = expired.filter(user=user)
+    count = 0
+    for session in expired:
+        _discard(session)
+        session.delete()
+        count += 1
+    return count
+
+
+def create_session(user, title, filename, total_size, run_pipeline=False):
+    """Validar los datos de la subida y reservar su fichero parcial"""
+    title = (title or '').strip() or os.path.splitext(filename or '')[0]
+    filename = os.path.basename(filename or '')
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise UploadError(f'Formato no soportado. Usa: {", ".join(ALLOWED_EXTENSIONS).upper()}')
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise UploadError('Tamaño de archivo no válido')
+    if total_size <= 0:
+        raise UploadError('El archivo está vacío')
+    if total_size > get_max_size():
+        raise UploadError(f'El archivo no puede superar los {get_max_size() // (1024 * 1024)}MB', status=413)
+
+    purge_expired(user)
+    hours = getattr(settings, 'MUSIC_UPLOAD_EXPIRATION_HOURS', 24)
+    session = UploadSession.objects.create(
+        user=user,
+        title=title[:200],
+        filename=filename,
+        total_size=total_size,
+        run_pipeline=run_pipeline,
+        expires_at=timezone.now() + timedelta(hours=hours),
+    )
+    os.makedirs(get_upload_dir(), exist_ok=True)
+    open(partial_path(session), 'wb').close()
+    logger.info(f"📤 Subida {session.pk} iniciada: {filename} ({total_size} bytes)")
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """Escribir `length` bytes de `stream` en el offset indicado; devuelve el nuevo offset"""
+    if session.status != 'active':
+        raise UploadError('La subida ya está finalizada', status=409)
+    if length is None or length < 0:
+        raise UploadError('Falta Content-Length', status=411)
+    if length > get_chunk_size():
+        raise UploadError(f'Cada parte puede tener como mucho {get_chunk_size()} bytes', status=413)
+    if offset + length > session.total_size:
+        raise UploadError('La parte supera el tamaño declarado del archivo', status=413)
+
+    # Un offset que ya no cuadra se rechaza antes de leer el cuerpo
+    current = UploadSession.objects.filter(pk=session.pk).values_list('offset', flat=True).first()
+    if current is not None and offset != current:
+        raise OffsetMismatch(current)
+
+    os.makedirs(get_upload_dir(), exist_ok=True)
+    with tempfile.TemporaryFile(dir=get_upload_dir(), suffix='.chunk') as chunk:
+        received = 0
+        while received < length:
+            block = stream.read(min(UPLOAD_BUFFER_SIZE, length - received))
+            if not block:
+                break
+            chunk.write(block)
+            received += len(block)
+
+        with transaction.atomic():
+            # Bloqueo de la fila: dos PATCH simultáneos de la misma subida se serializan
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if session.status != 'active':
+                raise UploadError('La subida ya está finalizada', status=409)
+            if offset != session.offset:
+                raise OffsetMismatch(session.offset)
+
+            with _hashers_lock:
+                hashed_offset, digest = _hashers.pop(session.pk, (0, hashlib.sha256()))
+            if hashed_offset != offset:
+                digest = None
+
+            chunk.seek(0)
+            with open(partial_path(session), 'r+b') as f:
+                f.seek(offset)
+                for block in iter(lambda: chunk.read(UPLOAD_BUFFER_SIZE), b''):
+                    f.write(block)
+                    if digest is not None:
+                        digest.update(block)
+                # Lo que quede tras una parte cortada se sobrescribe al reanudar
+                f.truncate(offset + received)
+
+            session.offset = offset + received
+            session.save(update_fields=['offset', 'updated_at'])
+
+    if digest is not None:
+        with _hashers_lock:
+            _hashers[session.pk] = (session.offset, digest)
+    return session.offset
+
+
+def finalize(session):
+    """Crear la canción con el archivo completo; devuelve (song, creada)"""
+    if session.status == 'completed' and session.song_id:
+        return session.song, False
+    if not session.is_complete:
+        raise UploadError(f'Faltan {session.total_size - session.offset} bytes por subir', status=409)
+
+    path = partial_path(session)
+    if not os.path.exists(path) or os.path.getsize(path) != session.total_size:
+        raise UploadError('El fichero recibido no coincide con el tamaño declarado', status=409)
+
+    with _hashers_lock:
+        hashed_offset, digest = _hashers.pop(session.pk, (None, None))
+    content_hash = digest.hexdigest() if hashed_offset == session.total_size else sha256_path(path)
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status == 'completed' and session.song_id:
+            # Otra petición de finalize se adelantó
+            return session.song, False
+
+        song = Song(
+            user=session.user,
+            title=session.title,
+            file_size=session.total_size,
+            content_hash=content_hash,
+        )
+        save_local_file(song.original_file, session.filename, path, move=True, save=False)
+        song.save()
+        ingest_song(song)
+
+        session.status = 'completed'
+        session.song = song
+        session.save(update_fields=['status', 'song', 'updated_at'])
+
+    logger.info(f"✅ Subida {session.pk} completada: canción {song.id} ({content_hash[:12]})")
+    return song, True
+
+
+def cancel(session):
+    """Abortar una subida y borrar lo recibido"""
+    _discard(session)
+    session.delete()
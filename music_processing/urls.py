@@ -10,7 +10,11 @@ urlpatterns = [
     # Gestión de canciones
     path('songs/', views.song_list, name='song_list'),
     path('songs/upload/', views.upload_song, name='upload_song'),
+    path('uploads/', views.upload_init, name='upload_init'),
+    path('uploads/<uuid:upload_id>/', views.upload_session, name='upload_session'),
+    path('uploads/<uuid:upload_id>/finalize/', views.upload_finalize, name='upload_finalize'),
     path('songs/<int:song_id>/delete/', views.delete_song, name='delete_song'),
+    path('songs/<int:song_id>/pipeline/', views.run_pipeline, name='run_pipeline'),
     
     # Generación de stems
     path('stems/', views.stems_view, name='stems'),
@@ -19,6 +23,7 @@ urlpatterns = [
     # Conversión a MIDI
     path('midi/', views.midi_conversion_view, name='midi_conversion'),
     path('midi/convert/<int:stem_id>/', views.convert_to_midi, name='convert_to_midi'),
+    path('midi/convert-song/<int:song_id>/', views.convert_song_to_midi, name='convert_song_to_midi'),
     
     # Generación de tracks
     path('generate/', views.track_generation_view, name='track_generation'),
@@ -26,9 +31,16 @@ urlpatterns = [
     path('generate/delete/<int:track_id>/', views.delete_generated_track, name='delete_generated_track'),
     
     # Descargas
-    path('download/<str:file_type>/<int:file_id>/', views.download_file, name='download_file'),
+    # download/version/ va antes: si no, la ruta genérica la captura con file_type='version'
     path('download/version/<int:version_id>/', views.download_version, name='download_version'),
+    path('download/<str:file_type>/<int:file_id>/', views.download_file, name='download_file'),
+    path('preview/<str:file_type>/<int:file_id>/', views.preview_audio, name='preview'),
     
     # API para estado de tareas
     path('api/task/<str:task_id>/status/', views.task_status, name='task_status'),
+    path('api/tasks/events/', views.tasks_events, name='tasks_events'),
+    path('api/tasks/status/', views.tasks_status, name='tasks_status'),
+    path('api/songs/', views.song_list_api, name='song_list_api'),
+    path('api/songs/search/', views.song_search_api, name='song_search_api'),
+    path('api/waveform/<str:file_type>/<int:file_id>/', views.waveform_data, name='waveform'),
 ]
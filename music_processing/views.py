@@ -1,27 +1,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, Http404, FileResponse
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, Http404, StreamingHttpResponse
 from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Subquery
 from django.conf import settings
+from django.urls import reverse
+import logging
 import os
 import uuid
 
-from .models import Song, Stem, MidiFile, GeneratedTrack, ProcessingTask
+from core.pagination import KeysetPaginator
+from .models import Song, Stem, MidiFile, GeneratedTrack, GeneratedVersion, ProcessingTask, UploadSession
 from .forms import SongUploadForm, TrackGenerationForm
-from .tasks_sync import process_song_to_stems_sync, convert_stem_to_midi_sync, generate_new_track_sync
+from .jobs import (
+    JobRejected, enqueue_full_pipeline, enqueue_midi_conversion, enqueue_song_midi_conversion,
+    enqueue_preview_generation, enqueue_stem_generation, enqueue_track_generation_from_midi,
+    enqueue_waveform_generation,
+)
+from .downloads import serve_file
+from .ingest import ingest_song
+from .stats import get_user_stats
+from . import previews, progress, search, uploads, waveform
+
+logger = logging.getLogger(__name__)
 
 
 @login_required
 def dashboard(request):
     """Vista principal del dashboard"""
     # Estadísticas del usuario
-    songs_count = Song.objects.filter(user=request.user).count()
-    stems_count = Stem.objects.filter(song__user=request.user).count()
-    midi_count = MidiFile.objects.filter(stem__song__user=request.user, status='completed').count()
-    generated_count = GeneratedTrack.objects.filter(user=request.user).count()
+    stats = get_user_stats(request.user)
     
     # Canciones recientes
     recent_songs = Song.objects.filter(user=request.user)[:5]
@@ -33,10 +42,10 @@ def dashboard(request):
     )[:5]
     
     context = {
-        'songs_count': songs_count,
-        'stems_count': stems_count,
-        'midi_count': midi_count,
-        'generated_count': generated_count,
+        'songs_count': stats['total_songs'],
+        'stems_count': stats['total_stems'],
+        'midi_count': stats['total_midi'],
+        'generated_count': stats['total_generated'],
         'recent_songs': recent_songs,
         'active_tasks': active_tasks,
     }
@@ -44,28 +53,33 @@ def dashboard(request):
     return render(request, 'music_processing/dashboard.html', context)
 
 
-@login_required
-def song_list(request):
-    """Lista de canciones del usuario"""
+SONGS_PER_PAGE = 10
+SONG_ORDERING = ('-uploaded_at', '-id')
+
+
+def _song_list_page(request):
+    """Canciones del usuario filtradas por búsqueda y estado, paginadas por cursor"""
     songs = Song.objects.filter(user=request.user)
     
-    # Búsqueda
+    # Búsqueda (índice de texto completo, ver search.py)
     search_query = request.GET.get('search')
     if search_query:
-        songs = songs.filter(
-            Q(title__icontains=search_query) | 
-            Q(original_file__icontains=search_query)
-        )
+        songs = search.filter_songs(songs, request.user, search_query)
     
     # Filtro por estado
     status_filter = request.GET.get('status')
     if status_filter:
         songs = songs.filter(status=status_filter)
     
-    # Paginación
-    paginator = Paginator(songs, 10)
-    page_number = request.GET.get('page')
-    songs_page = paginator.get_page(page_number)
+    paginator = KeysetPaginator(songs, SONGS_PER_PAGE, SONG_ORDERING, count_mode=None)
+    songs_page = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+    return songs_page, search_query, status_filter
+
+
+@login_required
+def song_list(request):
+    """Lista de canciones del usuario"""
+    songs_page, search_query, status_filter = _song_list_page(request)
     
     # Formulario de subida
     upload_form = SongUploadForm()
@@ -73,6 +87,7 @@ def song_list(request):
     context = {
         'songs': songs_page,
         'upload_form': upload_form,
+        'max_upload_size': uploads.get_max_size(),
         'search_query': search_query,
         'status_filter': status_filter,
     }
@@ -80,6 +95,53 @@ def song_list(request):
     return render(request, 'music_processing/song_list.html', context)
 
 
+@login_required
+def song_list_api(request):
+    """Variante JSON de la lista de canciones (mismos filtros y cursores)"""
+    songs_page, _, _ = _song_list_page(request)
+    
+    return JsonResponse({
+        'results': [
+            {
+                'id': song.id,
+                'title': song.title,
+                'status': song.status,
+                'status_display': song.get_status_display(),
+                'uploaded_at': song.uploaded_at.isoformat(),
+                'file_size': song.file_size,
+                'duration': song.duration,
+            }
+            for song in songs_page
+        ],
+        **songs_page.to_dict(),
+    })
+
+
+@login_required
+def song_search_api(request):
+    """Canciones del usuario ordenadas por relevancia (búsqueda por prefijo)"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': song.id,
+                'title': song.title,
+                'status': song.status,
+                'status_display': song.get_status_display(),
+                'uploaded_at': song.uploaded_at.isoformat(),
+                'rank': song.search_rank,
+            }
+            for song in search.search_songs(request.user, query, limit=limit)
+        ],
+    })
+
+
 @login_required
 @require_POST
 def upload_song(request):
@@ -95,36 +157,171 @@ def upload_song(request):
             song.file_size = song.original_file.size
         
         song.save()
+        # Duración, frecuencia de muestreo, canales y bitrate desde las cabeceras
+        ingest_song(song)
+        enqueue_waveform_generation(song)
         
         messages.success(request, f'La canción "{song.title}" se ha subido correctamente.')
+        if form.cleaned_data.get('run_pipeline'):
+            try:
+                enqueue_full_pipeline(song)
+                messages.info(request, f'Pipeline completo de "{song.title}" en cola: stems → MIDI → nueva canción.')
+            except JobRejected as e:
+                messages.error(request, str(e))
         return redirect('music_processing:song_list')
     else:
         messages.error(request, 'Hubo un error al subir la canción. Por favor, revisa los datos.')
         return redirect('music_processing:song_list')
 
 
+def _upload_error(error):
+    response = JsonResponse({'error': str(error)}, status=error.status)
+    if isinstance(error, uploads.OffsetMismatch):
+        response['Upload-Offset'] = error.offset
+    return response
+
+
+def _upload_headers(response, session):
+    response['Upload-Offset'] = session.offset
+    response['Upload-Length'] = session.total_size
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@login_required
+@require_POST
+def upload_init(request):
+    """Iniciar una subida por partes; devuelve la URL a la que enviar las partes"""
+    try:
+        session = uploads.create_session(
+            request.user,
+            title=request.POST.get('title'),
+            filename=request.POST.get('filename'),
+            total_size=request.POST.get('size'),
+            run_pipeline=request.POST.get('run_pipeline') in ('1', 'true', 'on'),
+        )
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    
+    url = reverse('music_processing:upload_session', args=[session.pk])
+    response = JsonResponse({
+        'upload_id': str(session.pk),
+        'url': url,
+        'finalize_url': reverse('music_processing:upload_finalize', args=[session.pk]),
+        'offset': session.offset,
+        'chunk_size': uploads.get_chunk_size(),
+    }, status=201)
+    response['Location'] = url
+    return _upload_headers(response, session)
+
+
+@login_required
+def upload_session(request, upload_id):
+    """HEAD: offset actual; PATCH: añadir una parte en Upload-Offset; DELETE: cancelar"""
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    
+    if request.method == 'HEAD':
+        return _upload_headers(HttpResponse(), session)
+    
+    if request.method == 'DELETE':
+        uploads.cancel(session)
+        return HttpResponse(status=204)
+    
+    if request.method != 'PATCH':
+        return HttpResponseNotAllowed(['HEAD', 'PATCH', 'DELETE'])
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or -1)
+    except ValueError:
+        return JsonResponse({'error': 'Upload-Offset no válido'}, status=400)
+    
+    try:
+        # El cuerpo se lee de la petición por bloques, sin pasar por request.body
+        uploads.write_chunk(session, offset, request, length)
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    
+    session.refresh_from_db()
+    return _upload_headers(HttpResponse(status=204), session)
+
+
+@login_required
+@require_POST
+def upload_finalize(request, upload_id):
+    """Crear la canción a partir de una subida completa"""
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    try:
+        song, created = uploads.finalize(session)
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    
+    if created:
+        enqueue_waveform_generation(song)
+        messages.success(request, f'La canción "{song.title}" se ha subido correctamente.')
+        if session.run_pipeline:
+            try:
+                enqueue_full_pipeline(song)
+                messages.info(request, f'Pipeline completo de "{song.title}" en cola: stems → MIDI → nueva canción.')
+            except JobRejected as e:
+                messages.error(request, str(e))
+    
+    return JsonResponse({
+        'song_id': song.id,
+        'title': song.title,
+        'file_size': song.file_size,
+        'duration': song.duration,
+        'redirect_url': reverse('music_processing:song_list'),
+    }, status=201 if created else 200)
+
+
+def _job_rejected(request, error, redirect_to):
+    """Respuesta cuando jobs.py rechaza encolar una tarea"""
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'error': str(error)}, status=400)
+    messages.error(request, str(error))
+    return redirect(redirect_to)
+
+
+def _active_tasks_prefetch(task_types):
+    """Prefetch de las tareas pendientes o en curso de cada canción en `song.active_tasks`"""
+    return Prefetch(
+        'processing_tasks',
+        queryset=ProcessingTask.objects.filter(
+            task_type__in=task_types,
+            status__in=['pending', 'in_progress']
+        ).order_by('-created_at'),
+        to_attr='active_tasks'
+    )
+
+
+def _stems_prefetch():
+    """Prefetch de los stems de cada canción con su MidiFile y sus metadatos"""
+    return Prefetch('stems', queryset=Stem.objects.select_related('midi_file', 'metadata'))
+
+
 @login_required
 def stems_view(request):
     """Vista de generación y gestión de stems"""
-    songs = Song.objects.filter(user=request.user).prefetch_related(
-        'stems', 
-        'processing_tasks'
-    ).select_related()
+    last_error = ProcessingTask.objects.filter(
+        song=OuterRef('pk')
+    ).exclude(error_message='').order_by('-created_at').values('error_message')[:1]
+    
+    songs = Song.objects.filter(user=request.user).annotate(
+        last_error=Subquery(last_error)
+    ).prefetch_related(
+        _stems_prefetch(),
+        _active_tasks_prefetch(['stem_generation', 'full_pipeline']),
+    )
     
     # Filtros
     status_filter = request.GET.get('status')
     if status_filter:
         songs = songs.filter(status=status_filter)
     
-    # Agregar información de tareas activas para cada canción
+    # Tarea activa de generación de stems de cada canción (ya precargada)
     for song in songs:
-        if song.status == 'processing_stems':
-            # Buscar la tarea activa de generación de stems
-            active_task = song.processing_tasks.filter(
-                task_type='stem_generation',
-                status__in=['pending', 'in_progress']
-            ).first()
-            song.active_task = active_task
+        song.active_task = song.active_tasks[0] if song.active_tasks else None
     
     context = {
         'songs': songs,
@@ -144,54 +341,39 @@ def generate_stems(request, song_id):
         messages.error(request, 'Esta canción ya está siendo procesada o ya tiene stems generados.')
         return redirect('music_processing:stems')
     
-    # Verificar si ya hay una tarea pendiente o en progreso para esta canción
-    existing_task = ProcessingTask.objects.filter(
-        song=song,
-        task_type='stem_generation',
-        status__in=['pending', 'in_progress']
-    ).first()
-    
-    if existing_task:
-        messages.warning(request, f'Ya hay una tarea de generación de stems en progreso para "{song.title}".')
-        return redirect('music_processing:stems')
-
+    # Encolar la tarea: un worker de `run_job_workers` la procesará en segundo plano
     try:
-        # Procesar de forma síncrona
-        messages.info(request, f'Procesando stems para "{song.title}". Por favor espere...')
-        result = process_song_to_stems_sync(song.id)
-        
-        if result['status'] == 'success':
-            messages.success(request, f'Se han generado {result["stems_created"]} stems para "{song.title}".')
-        else:
-            messages.error(request, f'Error al generar stems para "{song.title}".')
-        
-    except Exception as e:
-        messages.error(request, f'Error al procesar la canción: {str(e)}')
-    
+        task = enqueue_stem_generation(song)
+    except JobRejected as e:
+        return _job_rejected(request, e, 'music_processing:stems')
+    
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({
+            'task_id': task.celery_task_id,
+            'status': task.status,
+            'status_url': reverse('music_processing:task_status', args=[task.celery_task_id]),
+        }, status=202)
+    
+    messages.info(request, f'Generación de stems para "{song.title}" en cola. El progreso se actualizará automáticamente.')
     return redirect('music_processing:stems')
 
 
-@login_required
 @login_required
 def midi_conversion_view(request):
     """Vista de conversión de stems a MIDI"""
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"🌐 [MIDI VIEW] User: {request.user.username}")
-    
-    stems = Stem.objects.filter(song__user=request.user).select_related('song', 'midi_file')
-    logger.info(f"🌐 [MIDI VIEW] Found {stems.count()} stems for user")
+    songs = Song.objects.filter(user=request.user).annotate(
+        has_stems=Exists(Stem.objects.filter(song=OuterRef('pk')))
+    ).filter(has_stems=True).prefetch_related(
+        _stems_prefetch(),
+        # Conversiones por canción en curso (su progreso se consulta con tasks_status)
+        _active_tasks_prefetch(['song_midi_conversion', 'full_pipeline']),
+    )
     
-    # Agrupar por canción
-    songs_with_stems = {}
-    for stem in stems:
-        if stem.song not in songs_with_stems:
-            songs_with_stems[stem.song] = []
-        songs_with_stems[stem.song].append(stem)
-        logger.info(f"🌐 [MIDI VIEW] Stem: {stem.stem_type} from {stem.song.title}")
+    for song in songs:
+        song.active_task = song.active_tasks[0] if song.active_tasks else None
     
     context = {
-        'songs_with_stems': songs_with_stems,
+        'songs': songs,
     }
     
     return render(request, 'music_processing/midi_conversion.html', context)
@@ -200,68 +382,86 @@ def midi_conversion_view(request):
 @login_required
 @require_POST
 def convert_to_midi(request, stem_id):
-    """Convertir un stem específico a MIDI"""
-    import logging
-    logger = logging.getLogger(__name__)
+    """Encolar la conversión a MIDI de un stem específico"""
+    stem = get_object_or_404(Stem, id=stem_id, song__user=request.user)
     
-    print(f"\n🌐 [WEB CONVERT] =========== INICIO ===========")
-    print(f"🌐 [WEB CONVERT] Usuario: {request.user.username}")
-    print(f"🌐 [WEB CONVERT] Stem ID: {stem_id}")
-    print(f"🌐 [WEB CONVERT] Método: {request.method}")
+    # Verificar si ya existe un MIDI
+    try:
+        midi_file = stem.midi_file
+        if midi_file.status == 'processing':
+            messages.error(request, f'El stem "{stem.get_stem_type_display()}" ya está siendo procesado.')
+            return redirect('music_processing:midi_conversion')
+        if midi_file.status == 'completed':
+            # Permitir reconversión pero avisar al usuario
+            messages.info(request, f'Reconvirtiendo el stem "{stem.get_stem_type_display()}" que ya tenía un MIDI.')
+        midi_file.status = 'processing'
+        midi_file.error_message = ''
+        midi_file.save(update_fields=['status', 'error_message'])
+    except MidiFile.DoesNotExist:
+        midi_file = MidiFile.objects.create(stem=stem, status='processing')
+    
+    task = enqueue_midi_conversion(stem)
+    
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({
+            'task_id': task.celery_task_id,
+            'status': task.status,
+            'status_url': reverse('music_processing:task_status', args=[task.celery_task_id]),
+        }, status=202)
+    
+    messages.info(request, f'Conversión a MIDI del stem "{stem.get_stem_type_display()}" en cola.')
+    return redirect('music_processing:midi_conversion')
+
+
+@login_required
+@require_POST
+def run_pipeline(request, song_id):
+    """Ejecutar el pipeline completo (stems → MIDI → generación) de una canción"""
+    song = get_object_or_404(Song, id=song_id, user=request.user)
     
-    logger.info(f"🌐 [WEB] Función convert_to_midi llamada - User: {request.user.username}, Stem ID: {stem_id}")
+    if song.status not in ('uploaded', 'stems_completed'):
+        messages.error(request, f'"{song.title}" se está procesando o tuvo un error.')
+        return redirect('music_processing:song_list')
     
-    stem = get_object_or_404(Stem, id=stem_id, song__user=request.user)
-    logger.info(f"🌐 [WEB] Stem encontrado: {stem.stem_type} de '{stem.song.title}'")
+    try:
+        task = enqueue_full_pipeline(song)
+    except JobRejected as e:
+        return _job_rejected(request, e, 'music_processing:song_list')
+    
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({
+            'task_id': task.celery_task_id,
+            'status': task.status,
+            'status_url': reverse('music_processing:task_status', args=[task.celery_task_id]),
+        }, status=202)
+    
+    messages.info(request, f'Pipeline completo de "{song.title}" en cola: stems → MIDI → nueva canción.')
+    return redirect('music_processing:song_list')
+
+
+@login_required
+@require_POST
+def convert_song_to_midi(request, song_id):
+    """Convertir a MIDI todos los stems de una canción en paralelo"""
+    song = get_object_or_404(Song, id=song_id, user=request.user)
+    
+    if not song.stems.exists():
+        messages.error(request, f'"{song.title}" no tiene stems para convertir.')
+        return redirect('music_processing:midi_conversion')
     
     try:
-        # Verificar si ya existe un MIDI
-        try:
-            midi_file = stem.midi_file
-            if midi_file.status == 'processing':
-                messages.error(request, f'El stem "{stem.get_stem_type_display()}" ya está siendo procesado.')
-                return redirect('music_processing:midi_conversion')
-            elif midi_file.status == 'completed':
-                # Permitir reconversión pero avisar al usuario
-                messages.info(request, f'Reconvirtiendo el stem "{stem.get_stem_type_display()}" que ya tenía un MIDI.')
-                midi_file.status = 'processing'
-                midi_file.save()
-        except MidiFile.DoesNotExist:
-            # Crear objeto MidiFile si no existe
-            midi_file = MidiFile.objects.create(stem=stem, status='processing')
-
-        # Procesar de forma síncrona con logging
-        messages.info(request, f'Convirtiendo a MIDI el stem "{stem.get_stem_type_display()}". Por favor espere...')
-        
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"Vista web: Iniciando conversión MIDI para stem {stem_id}")
-        
-        result = convert_stem_to_midi_sync(stem.id)
-        logger.info(f"Vista web: Resultado conversión MIDI: {result}")
-        
-        if result['status'] == 'success':
-            messages.success(request, f'✅ Conversión exitosa: "{stem.get_stem_type_display()}" → MIDI')
-        else:
-            messages.error(request, f'❌ Error en la conversión del stem "{stem.get_stem_type_display()}".')
-        
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error en vista convert_to_midi: {str(e)}", exc_info=True)
-        
-        # Actualizar estado a error si existe el MIDI
-        try:
-            midi_file = stem.midi_file
-            midi_file.status = 'error'
-            midi_file.error_message = str(e)
-            midi_file.save()
-        except:
-            pass
-            
-        messages.error(request, f'❌ Error al convertir el stem: {str(e)}')
-    
-    print(f"🌐 [WEB CONVERT] =========== FIN ===========\n")
+        task = enqueue_song_midi_conversion(song)
+    except JobRejected as e:
+        return _job_rejected(request, e, 'music_processing:midi_conversion')
+    
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({
+            'task_id': task.celery_task_id,
+            'status': task.status,
+            'status_url': reverse('music_processing:task_status', args=[task.celery_task_id]),
+        }, status=202)
+    
+    messages.info(request, f'Conversión a MIDI de todos los stems de "{song.title}" en cola.')
     return redirect('music_processing:midi_conversion')
 
 
@@ -275,15 +475,25 @@ def track_generation_view(request):
     
     form = TrackGenerationForm()
     
-    # Tracks generados del usuario con sus versiones
+    # Tracks generados del usuario con sus versiones y el número de versiones con archivo
     generated_tracks = GeneratedTrack.objects.filter(
         user=request.user
+    ).select_related('midi_file__stem__song').annotate(
+        num_versions=Count('generated_versions', filter=Q(generated_versions__file__isnull=False))
     ).prefetch_related('generated_versions').order_by('-created_at')
     
+    # Generaciones en curso (su progreso se consulta con tasks_status)
+    active_tasks = ProcessingTask.objects.filter(
+        user=request.user,
+        task_type__in=['track_generation', 'full_pipeline'],
+        status__in=['pending', 'in_progress']
+    ).select_related('song', 'generated_track')
+    
     context = {
         'midi_files': midi_files,
         'form': form,
         'generated_tracks': generated_tracks,
+        'active_tasks': active_tasks,
     }
     
     return render(request, 'music_processing/track_generation.html', context)
@@ -300,28 +510,24 @@ def generate_track(request, midi_id):
         status='completed'
     )
     
-    # Crear track con valores por defecto
-    generated_track = GeneratedTrack.objects.create(
-        user=request.user,
-        midi_file=midi_file,
+    # Crear track con valores por defecto (un doble envío se une a la generación en curso del MIDI)
+    task = enqueue_track_generation_from_midi(
+        midi_file,
+        request.user,
         title=f"Nueva canción basada en {midi_file.stem.song.title}_{midi_file.stem.get_stem_type_display()}",
         model_temperature=1.0,  # Valor por defecto
         add_drums=True  # Con batería por defecto
     )
+    generated_track = task.generated_track
     
-    try:
-        # Procesar de forma síncrona
-        messages.info(request, f'Generando la canción "{generated_track.title}". Por favor espere...')
-        result = generate_new_track_sync(generated_track.id)
-        
-        if result['status'] == 'success':
-            messages.success(request, f'Se ha generado exitosamente la canción "{generated_track.title}".')
-        else:
-            messages.error(request, f'Error al generar la canción "{generated_track.title}".')
-            
-    except Exception as e:
-        messages.error(request, f'Error al generar la canción: {str(e)}')
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({
+            'task_id': task.celery_task_id,
+            'status': task.status,
+            'status_url': reverse('music_processing:task_status', args=[task.celery_task_id]),
+        }, status=202)
     
+    messages.info(request, f'Generación de "{generated_track.title}" en cola. El progreso se actualizará automáticamente.')
     return redirect('music_processing:track_generation')
 
 
@@ -331,7 +537,7 @@ def download_file(request, file_type, file_id):
     if file_type == 'song':
         obj = get_object_or_404(Song, id=file_id, user=request.user)
         file_field = obj.original_file
-        filename = f"{obj.title}_original.wav"
+        filename = f"{obj.title}_original{os.path.splitext(file_field.name or '')[1] or '.wav'}"
     elif file_type == 'stem':
         obj = get_object_or_404(Stem, id=file_id, song__user=request.user)
         file_field = obj.file
@@ -343,42 +549,48 @@ def download_file(request, file_type, file_id):
     elif file_type == 'generated':
         obj = get_object_or_404(GeneratedTrack, id=file_id, user=request.user)
         file_field = obj.generated_file
-        filename = f"{obj.title}_generated.mp3"
+        filename = f"{obj.title}_generated{os.path.splitext(file_field.name or '')[1] or '.wav'}"
     else:
         raise Http404("Tipo de archivo no válido")
     
-    if not file_field or not os.path.exists(file_field.path):
+    if not file_field or not file_field.storage.exists(file_field.name):
         raise Http404("Archivo no encontrado")
     
-    with open(file_field.path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+    # ?inline=1 lo usan los reproductores de audio: mismo fichero, sin forzar descarga
+    if request.GET.get('inline'):
+        return serve_file(request, file_field, filename, as_attachment=False)
+    return serve_file(request, file_field, filename, content_type='application/octet-stream')
 
 
 @login_required
 def task_status(request, task_id):
     """API para obtener el estado de una tarea"""
-    task = get_object_or_404(ProcessingTask, celery_task_id=task_id, user=request.user)
-    
-    # Intentar obtener información adicional del estado de Celery
-    detailed_status = None
-    try:
-        from celery.result import AsyncResult
-        result = AsyncResult(task_id)
-        if result.state == 'PROGRESS' and result.info:
-            detailed_status = result.info.get('status', '')
-    except Exception:
-        pass
-    
-    return JsonResponse({
-        'status': task.status,
-        'progress': task.progress_percentage,
-        'error_message': task.error_message,
-        'completed_at': task.completed_at.isoformat() if task.completed_at else None,
-        'detailed_status': detailed_status,
-        'task_type': task.task_type,
-    })
+    # El worker (local o de Celery) guarda el progreso y el mensaje de la etapa en la fila
+    state = progress.get_states(request.user, [task_id]).get(task_id)
+    if state is None:
+        raise Http404("Tarea no encontrada")
+    return JsonResponse(state)
+
+
+def _task_ids(request):
+    return [task_id for task_id in request.GET.get('ids', '').split(',') if task_id]
+
+
+@login_required
+def tasks_events(request):
+    """Stream SSE con el progreso de varias tareas a la vez (?ids=a,b,c): uno por página"""
+    response = StreamingHttpResponse(
+        progress.stream_events(request.user, _task_ids(request)), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx no debe acumular el stream
+    return response
+
+
+@login_required
+def tasks_status(request):
+    """API con el estado de varias tareas a la vez (?ids=a,b,c): respaldo si se corta el stream"""
+    return JsonResponse({'tasks': progress.get_states(request.user, _task_ids(request))})
 
 
 @login_required
@@ -402,12 +614,13 @@ def delete_generated_track(request, track_id):
     
     if request.method == 'POST':
         title = track.title
-        # Eliminar el archivo físico si existe
+        # Eliminar los archivos de las versiones y el del track
+        for version in track.generated_versions.exclude(file=''):
+            version.file.storage.delete(version.file.name)
         if track.generated_file:
             try:
-                if os.path.exists(track.generated_file.path):
-                    os.remove(track.generated_file.path)
-            except:
+                track.generated_file.storage.delete(track.generated_file.name)
+            except OSError:
                 pass  # Si hay error eliminando el archivo, continuar
         
         track.delete()
@@ -420,8 +633,6 @@ def delete_generated_track(request, track_id):
 @login_required
 def download_version(request, version_id):
     """Descargar una versión específica de un track generado"""
-    from .models import GeneratedVersion
-    
     version = get_object_or_404(
         GeneratedVersion, 
         id=version_id, 
@@ -429,14 +640,103 @@ def download_version(request, version_id):
         file__isnull=False
     )
     
-    if not version.file:
+    if not version.file or not version.file.storage.exists(version.file.name):
         raise Http404("Archivo no encontrado")
     
-    response = FileResponse(
-        version.file.open(), 
-        as_attachment=True,
-        filename=f"{version.track.title}_v{version.version_number}.mp3"
-    )
-    response['Content-Type'] = 'audio/mpeg'
-    
+    # Las versiones conservan el formato que devolvió Orpheus (a menudo WAV)
+    extension = os.path.splitext(version.file.name)[1] or '.wav'
+    filename = f"{version.track.title}_v{version.version_number}{extension}"
+    return serve_file(request, version.file, filename, as_attachment=not request.GET.get('inline'))
+
+
+# Audios con forma de onda: modelo, relación con su canción y campo del propietario
+WAVEFORM_SOURCES = {
+    'song': (Song, [], 'user'),
+    'stem': (Stem, ['song'], 'song__user'),
+    'generated': (GeneratedTrack, ['midi_file__stem__song'], 'user'),
+    'version': (GeneratedVersion, ['track__midi_file__stem__song'], 'track__user'),
+}
+
+
+@login_required
+def waveform_data(request, file_type, file_id):
+    """Picos de la forma de onda de un audio en JSON (o en binario con ?format=bin)"""
+    if file_type not in WAVEFORM_SOURCES:
+        raise Http404("Tipo de archivo no válido")
+    model, related, owner = WAVEFORM_SOURCES[file_type]
+    obj = get_object_or_404(model.objects.select_related(*related), id=file_id, **{owner: request.user})
+    
+    peaks = waveform.get_peaks(obj.content_hash)
+    if peaks is None:
+        # Aún en cola o anterior a las formas de onda: se calcula en segundo plano una vez
+        song = waveform.source_song(obj)
+        last_task = ProcessingTask.objects.filter(
+            song=song,
+            task_type='waveform_generation',
+            created_at__gte=waveform.audio_created_at(obj),
+        ).order_by('-created_at').first()
+        if last_task is None:
+            last_task = enqueue_waveform_generation(song)
+        if last_task.status in ('completed', 'failed'):
+            return JsonResponse({'status': 'unavailable'}, status=404)
+        return JsonResponse({'status': 'pending', 'task_id': last_task.celery_task_id}, status=202)
+    
+    # Los picos dependen solo del contenido del audio
+    etag = f'"{peaks.content_hash[:32]}-{peaks.points}"'
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+    elif request.GET.get('format') == 'bin':
+        response = HttpResponse(bytes(peaks.data), content_type='application/octet-stream')
+        response['X-Waveform-Points'] = peaks.points
+        response['X-Waveform-Duration'] = peaks.duration
+    else:
+        response = JsonResponse({
+            'points': peaks.points,
+            'duration': peaks.duration,
+            'bits': 8,
+            'peaks': waveform.peaks_to_list(peaks.data),
+        })
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=86400'
     return response
+
+
+# Audios con versión de escucha: modelo, campo del propietario y tipo de download_file
+PREVIEW_SOURCES = {
+    'stem': (Stem, 'song__user'),
+    'generated': (GeneratedTrack, 'user'),
+    'version': (GeneratedVersion, 'track__user'),
+}
+
+
+@login_required
+def preview_audio(request, file_type, file_id):
+    """Versión de escucha comprimida para los reproductores (o el original si aún no existe)"""
+    if file_type not in PREVIEW_SOURCES:
+        raise Http404("Tipo de archivo no válido")
+    model, owner = PREVIEW_SOURCES[file_type]
+    obj = get_object_or_404(model, id=file_id, **{owner: request.user})
+    
+    # Las peticiones Range del resto de la pista no cuentan como un uso nuevo
+    first_request = request.headers.get('Range', 'bytes=0-').startswith('bytes=0-')
+    rendition = previews.get_rendition(obj.content_hash)
+    if rendition is not None and not rendition.file.storage.exists(rendition.file.name):
+        rendition = None
+    
+    if rendition is None:
+        if first_request and previews.get_mode() == 'lazy' and previews.is_available():
+            # Modo perezoso: la conversión se encola la primera vez que alguien lo escucha
+            try:
+                enqueue_preview_generation(waveform.source_song(obj))
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo encolar la versión de escucha de {obj}: {e}")
+        # Mientras tanto se sirve el original
+        field_file = waveform.audio_field(obj)
+        if not field_file or not field_file.storage.exists(field_file.name):
+            raise Http404("Archivo no encontrado")
+        return serve_file(request, field_file, os.path.basename(field_file.name), as_attachment=False)
+    
+    if first_request:
+        previews.touch(rendition)
+    extension, content_type, _ = previews.FORMATS[rendition.audio_format]
+    return serve_file(request, rendition.file, f'preview.{extension}', content_type=content_type, as_attachment=False)
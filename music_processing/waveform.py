@@ -0,0 +1,255 @@
+# Picos de forma de onda precalculados para los reproductores
+#
+# Para cada audio (canción, stem, track o versión generada) se guarda una vez por
+# sha256 un array compacto de MUSIC_WAVEFORM_POINTS pares (mínimo, máximo) en int8,
+# así la interfaz dibuja la onda sin descargar el WAV completo.
+#
+# El cálculo recorre el fichero por bloques: cada bloque se reduce con NumPy a picos
+# de FINE_FRAMES muestras y al final esos picos se agrupan en los puntos pedidos, de
+# modo que la memoria no depende de la duración ni hace falta conocerla de antemano.
+# Los WAV PCM se leen con el módulo wave; el resto de formatos se decodifica con
+# ffmpeg a PCM de 16 bits por una tubería.
+import logging
+import os
+import shutil
+import subprocess
+import wave
+from array import array
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .fileio import local_path, sha256_field_file
+from .models import GeneratedTrack, GeneratedVersion, Song, Stem, WaveformPeaks
+
+logger = logging.getLogger(__name__)
+
+FINE_FRAMES = 256  # muestras por pico intermedio
+READ_FRAMES = FINE_FRAMES * 256  # muestras leídas por bloque
+FFMPEG_SAMPLE_RATE = 22050
+
+
+class WaveformError(Exception):
+    pass
+
+
+def get_points():
+    return getattr(settings, 'MUSIC_WAVEFORM_POINTS', 2000)
+
+
+def _wav_blocks(path, np):
+    """Bloques (frames, canales) en escala int16 de un WAV PCM; devuelve la frecuencia"""
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        yield rate
+        while True:
+            raw = wav.readframes(READ_FRAMES)
+            if not raw:
+                break
+            if width == 1:
+                samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8
+            elif width == 2:
+                samples = np.frombuffer(raw, dtype='<i2')
+            elif width == 3:
+                # 24 bits: el byte más significativo de cada muestra basta para los picos
+                samples = np.frombuffer(raw, dtype=np.uint8)[2::3].view(np.int8).astype(np.int16) << 8
+            elif width == 4:
+                samples = (np.frombuffer(raw, dtype='<i4') >> 16).astype(np.int16)
+            else:
+                raise WaveformError(f'Ancho de muestra no soportado: {width} bytes')
+            frames = len(samples) // channels
+            yield samples[:frames * channels].reshape(frames, channels)
+
+
+def _ffmpeg_blocks(path, np):
+    """Bloques (frames, 1) decodificados por ffmpeg como PCM de 16 bits mono"""
+    ffmpeg = shutil.which(getattr(settings, 'MUSIC_FFMPEG_BINARY', 'ffmpeg'))
+    if ffmpeg is None:
+        raise WaveformError('ffmpeg no está disponible para decodificar el audio')
+
+    process = subprocess.Popen(
+        [ffmpeg, '-nostdin', '-v', 'error', '-i', path, '-ac', '1', '-ar', str(FFMPEG_SAMPLE_RATE),
+         '-f', 's16le', '-acodec', 'pcm_s16le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    try:
+        yield FFMPEG_SAMPLE_RATE
+        block_size = READ_FRAMES * 2
+        while True:
+            raw = process.stdout.read(block_size)
+            if not raw:
+                break
+            samples = np.frombuffer(raw[:len(raw) - len(raw) % 2], dtype='<i2')
+            yield samples.reshape(-1, 1)
+        process.stdout.close()
+        stderr = process.stderr.read().decode(errors='replace')
+        if process.wait() != 0:
+            raise WaveformError(f'ffmpeg no pudo decodificar el audio: {stderr.strip()[:200]}')
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _pcm_blocks(path, np):
+    try:
+        with wave.open(path, 'rb'):
+            pass
+    except (wave.Error, EOFError):
+        # No es un WAV PCM (MP3, FLAC, WAV en coma flotante...)
+        return _ffmpeg_blocks(path, np)
+    return _wav_blocks(path, np)
+
+
+def compute_peaks(path, points=None):
+    """Calcular los picos de un fichero local; devuelve (bytes int8 min/max, duración)"""
+    import numpy as np
+
+    points = points or get_points()
+    blocks = _pcm_blocks(path, np)
+    sample_rate = next(blocks)
+
+    fine_min, fine_max = [], []
+    pending_low = pending_high = np.empty((0,), dtype=np.int16)
+    total_frames = 0
+    for block in blocks:
+        total_frames += len(block)
+        # Los canales se combinan tomando el extremo de cada muestra
+        lows = np.concatenate((pending_low, block.min(axis=1)))
+        highs = np.concatenate((pending_high, block.max(axis=1)))
+        usable = len(lows) - len(lows) % FINE_FRAMES
+        if usable:
+            fine_min.append(lows[:usable].reshape(-1, FINE_FRAMES).min(axis=1))
+            fine_max.append(highs[:usable].reshape(-1, FINE_FRAMES).max(axis=1))
+        pending_low, pending_high = lows[usable:], highs[usable:]
+    if len(pending_low):
+        fine_min.append(pending_low.min(keepdims=True))
+        fine_max.append(pending_high.max(keepdims=True))
+
+    if not fine_min:
+        return b'', 0.0
+
+    lows = np.concatenate(fine_min).astype(np.int32)
+    highs = np.concatenate(fine_max).astype(np.int32)
+    if len(lows) > points:
+        # Agrupar los picos intermedios en `points` tramos de tamaño casi igual
+        edges = np.linspace(0, len(lows), points + 1).astype(np.int64)[:-1]
+        lows = np.minimum.reduceat(lows, edges)
+        highs = np.maximum.reduceat(highs, edges)
+
+    peaks = np.empty(len(lows) * 2, dtype=np.int8)
+    peaks[0::2] = lows >> 8
+    peaks[1::2] = highs >> 8
+    return peaks.tobytes(), total_frames / sample_rate
+
+
+def peaks_to_list(data):
+    """Bytes int8 de WaveformPeaks.data como lista [min, max, min, max, ...]"""
+    return array('b', data).tolist()
+
+
+def get_peaks(content_hash):
+    if not content_hash:
+        return None
+    return WaveformPeaks.objects.filter(content_hash=content_hash).first()
+
+
+def ensure_peaks(field_file, content_hash):
+    """WaveformPeaks del audio con ese hash, calculándolo si aún no existe"""
+    peaks = get_peaks(content_hash)
+    if peaks is not None:
+        return peaks
+
+    points = get_points()
+    with local_path(field_file) as path:
+        data, duration = compute_peaks(path, points)
+    try:
+        with transaction.atomic():
+            peaks = WaveformPeaks.objects.create(
+                content_hash=content_hash,
+                points=len(data) // 2,
+                duration=duration,
+                data=data,
+            )
+    except IntegrityError:
+        # Otro worker calculó el mismo audio a la vez
+        peaks = WaveformPeaks.objects.get(content_hash=content_hash)
+    logger.info(f"📈 Forma de onda de {os.path.basename(field_file.name)}: {peaks.points} puntos")
+    return peaks
+
+
+def audio_field(obj):
+    """FileField con el audio de una canción, stem, track o versión generada"""
+    if isinstance(obj, Song):
+        return obj.original_file
+    if isinstance(obj, GeneratedTrack):
+        return obj.generated_file
+    return obj.file
+
+
+def source_song(obj):
+    """Canción de la que procede el audio de `obj`"""
+    if isinstance(obj, Song):
+        return obj
+    if isinstance(obj, Stem):
+        return obj.song
+    if isinstance(obj, GeneratedVersion):
+        obj = obj.track
+    return obj.midi_file.stem.song
+
+
+def audio_created_at(obj):
+    """Momento en que se guardó el audio de `obj`"""
+    if isinstance(obj, Song):
+        return obj.uploaded_at
+    if isinstance(obj, GeneratedTrack):
+        return obj.completed_at or obj.created_at
+    return obj.created_at
+
+
+def ensure_object_peaks(obj):
+    """Calcular (una vez por hash) los picos del audio de `obj`; None si no tiene audio"""
+    field_file = audio_field(obj)
+    if not field_file or not field_file.storage.exists(field_file.name):
+        return None
+    if not obj.content_hash:
+        obj.content_hash = sha256_field_file(field_file)
+        obj.save(update_fields=['content_hash'])
+    return ensure_peaks(field_file, obj.content_hash)
+
+
+def song_audio_objects(song_id):
+    """Canción, stems, tracks generados y versiones con audio de una canción"""
+    objects = list(Song.objects.filter(pk=song_id))
+    objects += Stem.objects.filter(song_id=song_id).exclude(file='')
+    objects += GeneratedTrack.objects.filter(midi_file__stem__song_id=song_id).exclude(generated_file='')
+    objects += GeneratedVersion.objects.filter(track__midi_file__stem__song_id=song_id).exclude(file='')
+    return objects
+
+
+def generate_song_waveforms(song_id, progress=None):
+    """Calcular los picos que falten de todos los audios de una canción"""
+    objects = song_audio_objects(song_id)
+    known = set(
+        WaveformPeaks.objects.filter(
+            content_hash__in=[obj.content_hash for obj in objects if obj.content_hash]
+        ).values_list('content_hash', flat=True)
+    )
+    computed, failed = 0, 0
+    for i, obj in enumerate(objects):
+        if obj.content_hash in known:
+            continue
+        if progress is not None:
+            progress(int(i * 100 / len(objects)), f'Forma de onda {i + 1} de {len(objects)}...')
+        try:
+            peaks = ensure_object_peaks(obj)
+        except (WaveformError, OSError, wave.Error, EOFError) as e:
+            logger.warning(f"⚠️ No se pudo calcular la forma de onda de {obj}: {e}")
+            failed += 1
+            continue
+        if peaks is not None:
+            known.add(peaks.content_hash)
+            computed += 1
+    return {'computed': computed, 'failed': failed, 'total': len(objects)}
@@ -152,9 +152,13 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+# Los ficheros mayores que esto se vuelcan a un temporal en disco en vez de quedarse en memoria
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
 
+# Subidas, Spaces, cola de trabajos, cachés y descargas de music_processing
+from .settings_music import *  # noqa: E402,F401,F403
+
 # Celery Configuration (for background tasks)
 # Configuración por defecto usa Redis
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
@@ -0,0 +1,118 @@
+# Ajustes propios de music_processing compartidos por settings.py y settings_pythonanywhere.py
+# (que no importa settings.py): se leen del entorno o del .env con decouple
+
+from pathlib import Path
+
+from decouple import config
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Subidas por partes y reanudables (music_processing.uploads)
+MUSIC_UPLOAD_DIR = config('MUSIC_UPLOAD_DIR', default=str(BASE_DIR / 'uploads_tmp'))
+MUSIC_UPLOAD_CHUNK_SIZE = config('MUSIC_UPLOAD_CHUNK_SIZE', default=5 * 1024 * 1024, cast=int)  # 5MB
+MUSIC_UPLOAD_MAX_SIZE = config('MUSIC_UPLOAD_MAX_SIZE', default=500 * 1024 * 1024, cast=int)  # 500MB
+MUSIC_UPLOAD_EXPIRATION_HOURS = config('MUSIC_UPLOAD_EXPIRATION_HOURS', default=24, cast=int)
+
+# Audios más largos que esto (en segundos) no se envían a los Spaces de Hugging Face
+MUSIC_MAX_AUDIO_DURATION = config('MUSIC_MAX_AUDIO_DURATION', default=900, cast=int)  # 15 min
+
+# Formas de onda precalculadas (music_processing.waveform)
+MUSIC_WAVEFORM_POINTS = config('MUSIC_WAVEFORM_POINTS', default=2000, cast=int)
+MUSIC_FFMPEG_BINARY = config('MUSIC_FFMPEG_BINARY', default='ffmpeg')
+
+# Versiones de escucha comprimidas de stems y audios generados (music_processing.previews)
+MUSIC_PREVIEW_FORMAT = config('MUSIC_PREVIEW_FORMAT', default='opus')  # 'opus' o 'mp3'
+MUSIC_PREVIEW_BITRATE = config('MUSIC_PREVIEW_BITRATE', default=64, cast=int)  # kbps
+MUSIC_PREVIEW_MODE = config('MUSIC_PREVIEW_MODE', default='eager')  # 'eager' o 'lazy'
+MUSIC_PREVIEW_WORKERS = config('MUSIC_PREVIEW_WORKERS', default=2, cast=int)
+MUSIC_PREVIEW_CACHE_MAX_BYTES = config('MUSIC_PREVIEW_CACHE_MAX_BYTES', default=2 * 1024 ** 3, cast=int)  # 2GB
+
+# Separación por segmentos solapados para canciones largas (music_processing.separation)
+MUSIC_SEGMENTED_SEPARATION = config('MUSIC_SEGMENTED_SEPARATION', default=False, cast=bool)
+MUSIC_SEGMENT_SECONDS = config('MUSIC_SEGMENT_SECONDS', default=120, cast=int)
+MUSIC_SEGMENT_OVERLAP = config('MUSIC_SEGMENT_OVERLAP', default=2.0, cast=float)
+MUSIC_SEGMENT_MIN_DURATION = config('MUSIC_SEGMENT_MIN_DURATION', default=240, cast=int)
+MUSIC_SEGMENT_RETRIES = config('MUSIC_SEGMENT_RETRIES', default=2, cast=int)
+
+# Reintentos y circuit breaker de las llamadas a los Spaces (music_processing.resilience)
+MUSIC_HF_MAX_RETRIES = config('MUSIC_HF_MAX_RETRIES', default=3, cast=int)
+MUSIC_HF_BACKOFF_BASE = config('MUSIC_HF_BACKOFF_BASE', default=2.0, cast=float)
+MUSIC_HF_BACKOFF_MAX = config('MUSIC_HF_BACKOFF_MAX', default=60.0, cast=float)
+MUSIC_HF_CIRCUIT_THRESHOLD = config('MUSIC_HF_CIRCUIT_THRESHOLD', default=5, cast=int)
+MUSIC_HF_CIRCUIT_RESET = config('MUSIC_HF_CIRCUIT_RESET', default=120, cast=int)
+
+# Una sola llamada por Space y audio entre todos los workers (music_processing.singleflight)
+MUSIC_SINGLEFLIGHT_TIMEOUT = config('MUSIC_SINGLEFLIGHT_TIMEOUT', default=1800, cast=int)
+MUSIC_SINGLEFLIGHT_POLL_INTERVAL = config('MUSIC_SINGLEFLIGHT_POLL_INTERVAL', default=2.0, cast=float)
+
+# Cola de trabajos en segundo plano (music_processing.jobs)
+# 'local': workers propios arrancados con `python manage.py run_job_workers`
+# 'celery': las tareas encoladas se reenvían a music_processing/tasks.py
+MUSIC_JOB_BACKEND = config('MUSIC_JOB_BACKEND', default='local')
+MUSIC_JOB_WORKERS = config('MUSIC_JOB_WORKERS', default=2, cast=int)
+MUSIC_JOB_POLL_INTERVAL = config('MUSIC_JOB_POLL_INTERVAL', default=2.0, cast=float)
+# Tareas en curso por Space entre todos los workers y reparto de la cola
+MUSIC_SPACE_MAX_JOBS = {
+    'stems': config('MUSIC_STEMS_MAX_JOBS', default=2, cast=int),
+    'midi': config('MUSIC_MIDI_MAX_JOBS', default=4, cast=int),
+    'orpheus': config('MUSIC_ORPHEUS_MAX_JOBS', default=1, cast=int),
+}
+MUSIC_JOB_PRIORITY_AGING = config('MUSIC_JOB_PRIORITY_AGING', default=300, cast=int)
+MUSIC_JOB_STALE_AFTER = config('MUSIC_JOB_STALE_AFTER', default=2 * 3600, cast=int)
+# Concesión de las tareas en curso: el worker la renueva cada HEARTBEAT_INTERVAL segundos y
+# si pasan LEASE_TIMEOUT sin renovarla (el proceso murió) la tarea vuelve a la cola
+MUSIC_JOB_HEARTBEAT_INTERVAL = config('MUSIC_JOB_HEARTBEAT_INTERVAL', default=30, cast=int)
+MUSIC_JOB_LEASE_TIMEOUT = config('MUSIC_JOB_LEASE_TIMEOUT', default=120, cast=int)
+MUSIC_JOB_MAX_ATTEMPTS = config('MUSIC_JOB_MAX_ATTEMPTS', default=2, cast=int)
+
+# Pool de clientes de Gradio (music_processing.clients)
+# Con MUSIC_SPACES_URL las tres etapas usan las apps de ese servidor (/stems/, /midi/ y
+# /orpheus/) en lugar de Hugging Face, p. ej. las de `python manage.py fake_spaces`
+MUSIC_SPACES_URL = config('MUSIC_SPACES_URL', default='')
+MUSIC_CLIENT_WARMUP = config('MUSIC_CLIENT_WARMUP', default=False, cast=bool)
+MUSIC_CLIENT_HEALTH_CHECK_INTERVAL = config('MUSIC_CLIENT_HEALTH_CHECK_INTERVAL', default=300, cast=int)
+# Llamadas simultáneas por Space en cada proceso
+MUSIC_SPACE_CONCURRENCY = {
+    'stems': config('MUSIC_STEMS_CONCURRENCY', default=2, cast=int),
+    'midi': config('MUSIC_MIDI_CONCURRENCY', default=4, cast=int),
+    'orpheus': config('MUSIC_ORPHEUS_CONCURRENCY', default=1, cast=int),
+}
+
+# Pipeline completo (music_processing.pipeline): stems preferidos para la generación
+MUSIC_PIPELINE_GENERATION_STEMS = config(
+    'MUSIC_PIPELINE_GENERATION_STEMS',
+    default='piano,guitar,other,vocals,bass,Clean,drums',
+    cast=lambda v: [s.strip() for s in v.split(',')]
+)
+
+# Caché de stems por hash del audio original (music_processing.stem_cache)
+MUSIC_STEM_CACHE_ENABLED = config('MUSIC_STEM_CACHE_ENABLED', default=True, cast=bool)
+MUSIC_STEM_CACHE_MAX_BYTES = config('MUSIC_STEM_CACHE_MAX_BYTES', default=5 * 1024 ** 3, cast=int)  # 5GB
+
+# Caché de conversiones a MIDI por hash del stem (music_processing.midi_cache)
+MUSIC_MIDI_CACHE_ENABLED = config('MUSIC_MIDI_CACHE_ENABLED', default=True, cast=bool)
+MUSIC_MIDI_CACHE_TTL = config('MUSIC_MIDI_CACHE_TTL', default=30 * 24 * 3600, cast=int)  # 30 días
+
+# Descargas: delegar el envío de ficheros al proxy ('x-sendfile' para Apache,
+# 'x-accel-redirect' para nginx con una location interna en MUSIC_SENDFILE_URL_PREFIX)
+MUSIC_SENDFILE_BACKEND = config('MUSIC_SENDFILE_BACKEND', default=None)
+MUSIC_SENDFILE_URL_PREFIX = config('MUSIC_SENDFILE_URL_PREFIX', default='/protected-media/')
+
+# Stream SSE de progreso de tareas (music_processing.progress)
+MUSIC_SSE_CHECK_INTERVAL = config('MUSIC_SSE_CHECK_INTERVAL', default=1.0, cast=float)
+MUSIC_SSE_KEEPALIVE = config('MUSIC_SSE_KEEPALIVE', default=15, cast=int)
+MUSIC_SSE_MAX_DURATION = config('MUSIC_SSE_MAX_DURATION', default=300, cast=int)
+
+# Caché de Django (estadísticas por usuario en music_processing.stats, estado de los
+# circuitos en music_processing.resilience y avisos de progreso en music_processing.progress).
+# Tiene que ser compartida entre el servidor web y los workers para que las invalidaciones y
+# los avisos de unos lleguen a los otros: por defecto una tabla de la base de datos (la crea
+# `migrate`); con Redis, CACHE_BACKEND=django.core.cache.backends.redis.RedisCache y
+# CACHE_LOCATION=redis://localhost:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CACHE_LOCATION', default='souniq_cache'),
+    }
+}
+MUSIC_STATS_CACHE_TTL = config('MUSIC_STATS_CACHE_TTL', default=300, cast=int)
@@ -123,6 +123,9 @@ MEDIA_ROOT = BASE_DIR / "media"
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Ajustes de music_processing (subidas, cola de trabajos, cachés...) compartidos con settings.py
+from .settings_music import *  # noqa: E402,F401,F403
+
 # WhiteNoise para archivos estáticos
 STATICFILES_STORAGE = "whitenoise.storage.CompressedStaticFilesStorage"
 
@@ -10,12 +10,15 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize file upload drag & drop
     initFileUpload();
     
-    // Initialize task progress polling
+    // Initialize task progress updates (one stream for every task on the page, polling as fallback)
     initTaskPolling();
     
     // Initialize audio players
     initAudioPlayers();
     
+    // Draw precomputed waveforms above the players
+    initWaveforms();
+    
     // Auto-hide alerts after 5 seconds
     setTimeout(function() {
         var alerts = document.querySelectorAll('.alert');
@@ -103,9 +106,155 @@ function initFileUpload() {
                 area.classList.remove('file-selected');
             }
         });
+        
+        // Send the file in resumable chunks when the form supports it
+        const form = area.closest('form');
+        if (form && form.dataset.chunkedUploadUrl) {
+            initChunkedUpload(form, fileInput);
+        }
+    });
+}
+
+// Chunked, resumable uploads (init -> PATCH chunks at an offset -> finalize)
+const UPLOAD_CHUNK_RETRIES = 3;
+
+function initChunkedUpload(form, fileInput) {
+    if (!window.fetch || !window.Blob || !Blob.prototype.slice) {
+        return; // Fall back to the regular multipart form
+    }
+    
+    form.addEventListener('submit', function(e) {
+        const file = fileInput.files[0];
+        if (!file) {
+            return;
+        }
+        e.preventDefault();
+        
+        const submitButton = form.querySelector('[type="submit"]');
+        const progress = form.querySelector('.upload-progress');
+        const progressBar = progress ? progress.querySelector('.progress-bar') : null;
+        if (submitButton) {
+            submitButton.disabled = true;
+        }
+        if (progress) {
+            progress.classList.remove('d-none');
+        }
+        
+        chunkedUpload(form, file, function(offset, total) {
+            if (progressBar) {
+                const percentage = Math.floor(offset * 100 / total);
+                progressBar.style.width = percentage + '%';
+                progressBar.textContent = percentage + '%';
+            }
+        }).then(function(data) {
+            window.location.href = data.redirect_url;
+        }).catch(function(error) {
+            console.error('Chunked upload failed:', error);
+            alert(error.message || 'Error al subir el archivo. Vuelve a intentarlo para reanudar la subida.');
+            if (submitButton) {
+                submitButton.disabled = false;
+            }
+        });
     });
 }
 
+function uploadError(message, fatal) {
+    const error = new Error(message);
+    error.fatal = fatal;
+    return error;
+}
+
+async function chunkedUpload(form, file, onProgress) {
+    const csrfToken = form.querySelector('[name="csrfmiddlewaretoken"]').value;
+    // The upload URL is kept per file so a failed upload resumes where it stopped
+    const resumeKey = `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+    let session = JSON.parse(localStorage.getItem(resumeKey) || 'null');
+    let offset = 0;
+    
+    if (session) {
+        const response = await fetch(session.url, { method: 'HEAD', credentials: 'same-origin' });
+        if (response.ok) {
+            offset = parseInt(response.headers.get('Upload-Offset'), 10) || 0;
+        } else {
+            session = null;
+        }
+    }
+    
+    if (!session) {
+        const body = new FormData();
+        body.append('title', form.querySelector('[name="title"]').value);
+        body.append('filename', file.name);
+        body.append('size', file.size);
+        const runPipeline = form.querySelector('[name="run_pipeline"]');
+        if (runPipeline && runPipeline.checked) {
+            body.append('run_pipeline', '1');
+        }
+        
+        const response = await fetch(form.dataset.chunkedUploadUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: { 'X-CSRFToken': csrfToken },
+            body: body,
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw uploadError(data.error || 'No se pudo iniciar la subida', true);
+        }
+        session = { url: data.url, finalizeUrl: data.finalize_url, chunkSize: data.chunk_size };
+        localStorage.setItem(resumeKey, JSON.stringify(session));
+    }
+    
+    onProgress(offset, file.size);
+    while (offset < file.size) {
+        offset = await uploadChunk(session, file, offset, csrfToken);
+        onProgress(offset, file.size);
+    }
+    
+    const response = await fetch(session.finalizeUrl, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'X-CSRFToken': csrfToken },
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw uploadError(data.error || 'No se pudo completar la subida', true);
+    }
+    localStorage.removeItem(resumeKey);
+    return data;
+}
+
+async function uploadChunk(session, file, offset, csrfToken) {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(session.url, {
+                method: 'PATCH',
+                credentials: 'same-origin',
+                headers: {
+                    'X-CSRFToken': csrfToken,
+                    'Upload-Offset': offset,
+                    'Content-Type': 'application/offset+octet-stream',
+                },
+                body: file.slice(offset, offset + session.chunkSize),
+            });
+            // 409: the server is at another offset (e.g. a retried chunk had arrived)
+            if (response.ok || response.status === 409) {
+                return parseInt(response.headers.get('Upload-Offset'), 10);
+            }
+            if (response.status < 500) {
+                const data = await response.json().catch(function() { return {}; });
+                throw uploadError(data.error || 'La subida ha sido rechazada', true);
+            }
+            throw uploadError('Error del servidor al subir una parte del archivo', false);
+        } catch (error) {
+            if (error.fatal || attempt >= UPLOAD_CHUNK_RETRIES) {
+                throw error;
+            }
+        }
+        // Network error or 5xx: back off and retry the same chunk
+        await new Promise(function(resolve) { setTimeout(resolve, 1000 * 2 ** attempt); });
+    }
+}
+
 // Update file information display
 function updateFileInfo(input, file) {
     const uploadArea = input.closest('.file-upload-area') || 
@@ -143,51 +292,131 @@ function getFileIcon(typeOrName) {
     return 'fas fa-file';
 }
 
-// Task progress polling
+// Task progress: one Server-Sent Events stream for every task on the page; if it
+// disconnects, one batched request polled with backoff
+const TASK_POLL_MIN = 2000;
+const TASK_POLL_MAX = 15000;
+
 function initTaskPolling() {
-    const taskElements = document.querySelectorAll('[data-task-id]');
+    const elementsByTask = {};
     
-    taskElements.forEach(function(element) {
+    document.querySelectorAll('[data-task-id]').forEach(function(element) {
         const taskId = element.dataset.taskId;
         if (taskId) {
-            pollTaskStatus(taskId, element);
+            (elementsByTask[taskId] = elementsByTask[taskId] || []).push(element);
         }
     });
+    
+    if (Object.keys(elementsByTask).length > 0) {
+        if (window.EventSource) {
+            watchTasksProgress(elementsByTask, {});
+        } else {
+            pollTasksStatus(elementsByTask, TASK_POLL_MIN, {});
+        }
+    }
 }
 
-function pollTaskStatus(taskId, element) {
-    const pollInterval = setInterval(function() {
-        fetch(`/music/api/task/${taskId}/status/`)
+function reloadWhenTaskFinishes(data) {
+    if (data.status === 'completed') {
+        // Reload page after 2 seconds if task completed successfully
+        setTimeout(function() {
+            location.reload();
+        }, 2000);
+        return true;
+    } else if (data.status === 'failed') {
+        // Show error and reload after 3 seconds to show error state
+        setTimeout(function() {
+            location.reload();
+        }, 3000);
+        return true;
+    }
+    return false;
+}
+
+function taskIdsQuery(elementsByTask) {
+    return Object.keys(elementsByTask).map(encodeURIComponent).join(',');
+}
+
+function applyTaskStates(elementsByTask, tasks, lastStates) {
+    // Returns whether any task changed since the last update
+    let changed = false;
+    
+    Object.keys(tasks).forEach(function(taskId) {
+        const state = tasks[taskId];
+        if (!elementsByTask[taskId]) {
+            return;
+        }
+        const serialized = JSON.stringify(state);
+        if (serialized !== lastStates[taskId]) {
+            changed = true;
+            lastStates[taskId] = serialized;
+            elementsByTask[taskId].forEach(element => updateTaskProgress(element, state));
+        }
+        if (reloadWhenTaskFinishes(state)) {
+            delete elementsByTask[taskId];
+        }
+    });
+    return changed;
+}
+
+function watchTasksProgress(elementsByTask, lastStates) {
+    const source = new EventSource(`/music/api/tasks/events/?ids=${taskIdsQuery(elementsByTask)}`);
+    
+    source.addEventListener('progress', function(event) {
+        applyTaskStates(elementsByTask, JSON.parse(event.data).tasks, lastStates);
+    });
+    
+    source.addEventListener('end', function() {
+        source.close();
+    });
+    
+    source.addEventListener('timeout', function() {
+        // The server ends long streams so they don't hold a worker: open a new one
+        source.close();
+        if (Object.keys(elementsByTask).length > 0) {
+            watchTasksProgress(elementsByTask, lastStates);
+        }
+    });
+    
+    source.addEventListener('error', function() {
+        // The stream disconnected: fall back to the batched poll
+        source.close();
+        if (Object.keys(elementsByTask).length > 0) {
+            pollTasksStatus(elementsByTask, TASK_POLL_MIN, lastStates);
+        }
+    });
+}
+
+function pollTasksStatus(elementsByTask, delay, lastStates) {
+    setTimeout(function() {
+        // Hidden tabs don't poll; check again at the slowest rate
+        if (document.hidden) {
+            pollTasksStatus(elementsByTask, TASK_POLL_MAX, lastStates);
+            return;
+        }
+        
+        fetch(`/music/api/tasks/status/?ids=${taskIdsQuery(elementsByTask)}`)
             .then(response => response.json())
             .then(data => {
-                updateTaskProgress(element, data);
+                // Tasks that no longer exist stop being polled
+                Object.keys(elementsByTask).forEach(function(taskId) {
+                    if (!data.tasks[taskId]) {
+                        delete elementsByTask[taskId];
+                    }
+                });
+                const changed = applyTaskStates(elementsByTask, data.tasks, lastStates);
                 
-                if (data.status === 'completed') {
-                    clearInterval(pollInterval);
-                    
-                    // Reload page after 2 seconds if task completed successfully
-                    setTimeout(function() {
-                        location.reload();
-                    }, 2000);
-                } else if (data.status === 'failed') {
-                    clearInterval(pollInterval);
-                    
-                    // Show error and reload after 3 seconds to show error state
-                    setTimeout(function() {
-                        location.reload();
-                    }, 3000);
+                if (Object.keys(elementsByTask).length > 0) {
+                    // Back off while nothing changes; go back to the fast rate on any change
+                    const next = changed ? TASK_POLL_MIN : Math.min(delay * 1.5, TASK_POLL_MAX);
+                    pollTasksStatus(elementsByTask, next, lastStates);
                 }
             })
             .catch(error => {
                 console.error('Error polling task status:', error);
-                clearInterval(pollInterval);
-                
-                // Reload to show any error state
-                setTimeout(function() {
-                    location.reload();
-                }, 3000);
+                pollTasksStatus(elementsByTask, TASK_POLL_MAX, lastStates);
             });
-    }, 3000); // Poll every 3 seconds
+    }, delay);
 }
 
 function updateTaskProgress(element, data) {
@@ -293,6 +522,95 @@ function initAudioPlayers() {
     });
 }
 
+// Waveforms: peaks precomputed by the server (min/max int8 pairs)
+function initWaveforms() {
+    document.querySelectorAll('canvas[data-waveform-url]').forEach(function(canvas) {
+        loadWaveform(canvas, 0);
+    });
+}
+
+function loadWaveform(canvas, attempt) {
+    fetch(canvas.dataset.waveformUrl, { credentials: 'same-origin' })
+        .then(function(response) {
+            if (response.status === 202) {
+                // Still being computed in the background
+                if (attempt < 10) {
+                    setTimeout(function() { loadWaveform(canvas, attempt + 1); }, 3000 * (attempt + 1));
+                }
+                return null;
+            }
+            if (!response.ok) {
+                canvas.remove();
+                return null;
+            }
+            return response.json();
+        })
+        .then(function(data) {
+            if (data) {
+                setupWaveform(canvas, data);
+            }
+        })
+        .catch(function() {
+            canvas.remove();
+        });
+}
+
+function setupWaveform(canvas, data) {
+    const container = canvas.closest('.audio-player');
+    const audio = container ? container.querySelector('audio') : null;
+    let progress = 0;
+
+    function redraw() {
+        drawWaveform(canvas, data.peaks, progress);
+    }
+
+    if (audio) {
+        audio.addEventListener('timeupdate', function() {
+            if (audio.duration) {
+                progress = audio.currentTime / audio.duration;
+                redraw();
+            }
+        });
+        canvas.addEventListener('click', function(event) {
+            const rect = canvas.getBoundingClientRect();
+            const duration = audio.duration || data.duration;
+            if (duration) {
+                audio.currentTime = (event.clientX - rect.left) / rect.width * duration;
+            }
+        });
+    }
+    window.addEventListener('resize', redraw);
+    redraw();
+}
+
+function drawWaveform(canvas, peaks, progress) {
+    const ratio = window.devicePixelRatio || 1;
+    const width = canvas.clientWidth * ratio;
+    const height = canvas.clientHeight * ratio;
+    canvas.width = width;
+    canvas.height = height;
+
+    const ctx = canvas.getContext('2d');
+    const points = peaks.length / 2;
+    const middle = height / 2;
+    const scale = middle / 128;
+    const played = getComputedStyle(document.documentElement).getPropertyValue('--primary-color').trim() || '#0d6efd';
+
+    for (let x = 0; x < width; x++) {
+        // Each pixel column covers one or more peak pairs
+        const start = Math.floor(x * points / width);
+        const end = Math.max(start + 1, Math.floor((x + 1) * points / width));
+        let low = 0;
+        let high = 0;
+        for (let i = start; i < end && i < points; i++) {
+            low = Math.min(low, peaks[i * 2]);
+            high = Math.max(high, peaks[i * 2 + 1]);
+        }
+        ctx.fillStyle = x / width < progress ? played : '#adb5bd';
+        ctx.fillRect(x, middle - high * scale, 1, Math.max(1, (high - low) * scale));
+    }
+}
+
 // Confirmation dialogs
 function confirmAction(message, callback) {
     if (confirm(message)) {